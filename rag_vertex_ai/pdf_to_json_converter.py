@@ -3,32 +3,26 @@ import PyPDF2
 import textwrap
 import json
 import os
+import sys
+
+# the token-aware chunker is shared with the updated_api index builds
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "updated_api"))
+from libs.chunker import TokenChunker
 
 def pdf_to_json(pdf_path: str, json_path: str, chunk_size: int = 1000, chunk_overlap: int = 200):
     """
-    Extracts text from a PDF, splits it into chunks, and writes the result to a JSON file.
+    Extracts text from a PDF, splits it into chunks of chunk_size tokens (chunk_overlap shared between
+    consecutive chunks), and writes the result to a JSON file.
     """
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-    # Read PDF text
-    pdf_text = ""
+    # Read PDF text, page by page, straight into the chunker
+    chunker = TokenChunker(max_tokens=chunk_size, overlap_tokens=chunk_overlap)
     with open(pdf_path, "rb") as f:
         reader = PyPDF2.PdfReader(f)
-        for page_num, page in enumerate(reader.pages, start=1):
-            page_text = page.extract_text() or ""
-            pdf_text += f"\n[Page {page_num}]\n" + page_text
-
-    # Split into overlapping chunks
-    words = pdf_text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = min(start + chunk_size, len(words))
-        chunk_tokens = words[start:end]
-        chunk_text = " ".join(chunk_tokens)
-        chunks.append(chunk_text)
-        start += (chunk_size - chunk_overlap)
+        pages = (f"\n[Page {page_num}]\n" + (page.extract_text() or "") for page_num, page in enumerate(reader.pages, start=1))
+        chunks = chunker.chunk(pages)
 
     # Prepare JSON structure
     data = []
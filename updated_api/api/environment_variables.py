@@ -48,6 +48,51 @@ class EnvironmentVariables:
         self.industry_categories_blob_path = os.getenv('INDUSTRY_CATEGORIES_BLOB_PATH')
         self.client_demographics_blob_path = os.getenv('CLIENT_DEMOGRAPHICS_BLOB_PATH')
         self.job_description_sample_blob_path = os.getenv('JOB_DESCRIPTION_SAMPLE_BLOB_PATH')
+        self.extraction_mode = os.getenv('EXTRACTION_MODE', 'structured')
+        self.query_embedding_cache_size = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024'))
+        self.query_embedding_cache_ttl_seconds = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL_SECONDS', '3600'))
+        self.index_search_timeout_seconds = float(os.getenv('INDEX_SEARCH_TIMEOUT_SECONDS', '10'))
+        self.semantic_cache_enabled = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+        self.semantic_cache_threshold = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.95'))
+        self.semantic_cache_size = int(os.getenv('SEMANTIC_CACHE_SIZE', '2048'))
+        self.semantic_cache_ttl_seconds = int(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', '86400'))
+        self.semantic_cache_index_check_seconds = int(os.getenv('SEMANTIC_CACHE_INDEX_CHECK_SECONDS', '300'))
+        self.langsmith_dataset_id = os.getenv('LANGSMITH_DATASET_ID', '93570a3b-c2ed-41c3-b526-bd3cba38da80')
+        self.telemetry_queue_size = int(os.getenv('TELEMETRY_QUEUE_SIZE', '1000'))
+        self.telemetry_batch_size = int(os.getenv('TELEMETRY_BATCH_SIZE', '20'))
+        self.telemetry_flush_interval_seconds = float(os.getenv('TELEMETRY_FLUSH_INTERVAL_SECONDS', '2'))
+        self.telemetry_max_retries = int(os.getenv('TELEMETRY_MAX_RETRIES', '3'))
+        # local files derived from remote or configured data, never part of the source tree
+        self.cache_dir = os.getenv('CACHE_DIR', '.cache')
+        self.blob_cache_dir = os.getenv('BLOB_CACHE_DIR', os.path.join(self.cache_dir, 'blob'))
+        self.blob_cache_refresh_seconds = int(os.getenv('BLOB_CACHE_REFRESH_SECONDS', '300'))
+        self.run_db_migrations = os.getenv('RUN_DB_MIGRATIONS', 'true').lower() == 'true'
+        self.warm_up_on_startup = os.getenv('WARM_UP_ON_STARTUP', 'true').lower() == 'true'
+        self.checkpoint_retention_enabled = os.getenv('CHECKPOINT_RETENTION_ENABLED', 'true').lower() == 'true'
+        self.checkpoint_keep_latest = int(os.getenv('CHECKPOINT_KEEP_LATEST', '20'))
+        self.checkpoint_thread_ttl_hours = int(os.getenv('CHECKPOINT_THREAD_TTL_HOURS', '720'))
+        self.checkpoint_retention_batch_size = int(os.getenv('CHECKPOINT_RETENTION_BATCH_SIZE', '500'))
+        self.checkpoint_retention_interval_seconds = int(os.getenv('CHECKPOINT_RETENTION_INTERVAL_SECONDS', '3600'))
+        self.checkpoint_retention_lock_timeout_ms = int(os.getenv('CHECKPOINT_RETENTION_LOCK_TIMEOUT_MS', '2000'))
+        self.prompt_cache_enabled = os.getenv('PROMPT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.prompt_cache_size = int(os.getenv('PROMPT_CACHE_SIZE', '4096'))
+        self.prompt_cache_ttl_hours = int(os.getenv('PROMPT_CACHE_TTL_HOURS', '168'))
+        self.intent_classifier_enabled = os.getenv('INTENT_CLASSIFIER_ENABLED', 'true').lower() == 'true'
+        self.intent_examples_path = os.getenv('INTENT_EXAMPLES_PATH', 'configs/intent_examples.json')
+        self.intent_cache_dir = os.getenv('INTENT_CACHE_DIR', os.path.join(self.cache_dir, 'intent'))
+        self.intent_classifier_top_k = int(os.getenv('INTENT_CLASSIFIER_TOP_K', '5'))
+        self.intent_classifier_threshold = float(os.getenv('INTENT_CLASSIFIER_THRESHOLD', '0.82'))
+        self.intent_classifier_margin = float(os.getenv('INTENT_CLASSIFIER_MARGIN', '0.03'))
+        self.gazetteer_enabled = os.getenv('GAZETTEER_ENABLED', 'true').lower() == 'true'
+        self.industry_shortlist_enabled = os.getenv('INDUSTRY_SHORTLIST_ENABLED', 'true').lower() == 'true'
+        self.industry_shortlist_top_k = int(os.getenv('INDUSTRY_SHORTLIST_TOP_K', '5'))
+        self.context_packing_enabled = os.getenv('CONTEXT_PACKING_ENABLED', 'true').lower() == 'true'
+        self.context_token_budget = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))
+        self.context_max_document_tokens = int(os.getenv('CONTEXT_MAX_DOCUMENT_TOKENS', '1200'))
+        self.context_duplicate_threshold = float(os.getenv('CONTEXT_DUPLICATE_THRESHOLD', '0.8'))
+        self.context_token_encoding = os.getenv('CONTEXT_TOKEN_ENCODING', 'o200k_base')
+        self.embedding_store_enabled = os.getenv('EMBEDDING_STORE_ENABLED', 'true').lower() == 'true'
+        self.embedding_store_path = os.getenv('EMBEDDING_STORE_PATH', '.embedding_store')
 
         self.db_host = os.getenv("DB_HOST")
         self.db_name = os.getenv("DB_NAME")
@@ -74,6 +119,50 @@ class EnvironmentVariables:
         print(f"INDUSTRY_CATEGORIES_BLOB_PATH: {self.industry_categories_blob_path}")
         print(f"CLIENT_DEMOGRAPHICS_BLOB_PATH: {self.client_demographics_blob_path}")
         print(f"JOB_DESCRIPTION_SAMPLE_BLOB_PATH: {self.job_description_sample_blob_path}")
+        print(f"EXTRACTION_MODE: {self.extraction_mode}")
+        print(f"QUERY_EMBEDDING_CACHE_SIZE: {self.query_embedding_cache_size}")
+        print(f"QUERY_EMBEDDING_CACHE_TTL_SECONDS: {self.query_embedding_cache_ttl_seconds}")
+        print(f"INDEX_SEARCH_TIMEOUT_SECONDS: {self.index_search_timeout_seconds}")
+        print(f"SEMANTIC_CACHE_ENABLED: {self.semantic_cache_enabled}")
+        print(f"SEMANTIC_CACHE_THRESHOLD: {self.semantic_cache_threshold}")
+        print(f"SEMANTIC_CACHE_SIZE: {self.semantic_cache_size}")
+        print(f"SEMANTIC_CACHE_TTL_SECONDS: {self.semantic_cache_ttl_seconds}")
+        print(f"SEMANTIC_CACHE_INDEX_CHECK_SECONDS: {self.semantic_cache_index_check_seconds}")
+        print(f"LANGSMITH_DATASET_ID: {self.langsmith_dataset_id}")
+        print(f"TELEMETRY_QUEUE_SIZE: {self.telemetry_queue_size}")
+        print(f"TELEMETRY_BATCH_SIZE: {self.telemetry_batch_size}")
+        print(f"TELEMETRY_FLUSH_INTERVAL_SECONDS: {self.telemetry_flush_interval_seconds}")
+        print(f"TELEMETRY_MAX_RETRIES: {self.telemetry_max_retries}")
+        print(f"CACHE_DIR: {self.cache_dir}")
+        print(f"BLOB_CACHE_DIR: {self.blob_cache_dir}")
+        print(f"BLOB_CACHE_REFRESH_SECONDS: {self.blob_cache_refresh_seconds}")
+        print(f"RUN_DB_MIGRATIONS: {self.run_db_migrations}")
+        print(f"WARM_UP_ON_STARTUP: {self.warm_up_on_startup}")
+        print(f"CHECKPOINT_RETENTION_ENABLED: {self.checkpoint_retention_enabled}")
+        print(f"CHECKPOINT_KEEP_LATEST: {self.checkpoint_keep_latest}")
+        print(f"CHECKPOINT_THREAD_TTL_HOURS: {self.checkpoint_thread_ttl_hours}")
+        print(f"CHECKPOINT_RETENTION_BATCH_SIZE: {self.checkpoint_retention_batch_size}")
+        print(f"CHECKPOINT_RETENTION_INTERVAL_SECONDS: {self.checkpoint_retention_interval_seconds}")
+        print(f"CHECKPOINT_RETENTION_LOCK_TIMEOUT_MS: {self.checkpoint_retention_lock_timeout_ms}")
+        print(f"PROMPT_CACHE_ENABLED: {self.prompt_cache_enabled}")
+        print(f"PROMPT_CACHE_SIZE: {self.prompt_cache_size}")
+        print(f"PROMPT_CACHE_TTL_HOURS: {self.prompt_cache_ttl_hours}")
+        print(f"INTENT_CLASSIFIER_ENABLED: {self.intent_classifier_enabled}")
+        print(f"INTENT_EXAMPLES_PATH: {self.intent_examples_path}")
+        print(f"INTENT_CACHE_DIR: {self.intent_cache_dir}")
+        print(f"INTENT_CLASSIFIER_TOP_K: {self.intent_classifier_top_k}")
+        print(f"INTENT_CLASSIFIER_THRESHOLD: {self.intent_classifier_threshold}")
+        print(f"INTENT_CLASSIFIER_MARGIN: {self.intent_classifier_margin}")
+        print(f"GAZETTEER_ENABLED: {self.gazetteer_enabled}")
+        print(f"INDUSTRY_SHORTLIST_ENABLED: {self.industry_shortlist_enabled}")
+        print(f"INDUSTRY_SHORTLIST_TOP_K: {self.industry_shortlist_top_k}")
+        print(f"CONTEXT_PACKING_ENABLED: {self.context_packing_enabled}")
+        print(f"CONTEXT_TOKEN_BUDGET: {self.context_token_budget}")
+        print(f"CONTEXT_MAX_DOCUMENT_TOKENS: {self.context_max_document_tokens}")
+        print(f"CONTEXT_DUPLICATE_THRESHOLD: {self.context_duplicate_threshold}")
+        print(f"CONTEXT_TOKEN_ENCODING: {self.context_token_encoding}")
+        print(f"EMBEDDING_STORE_ENABLED: {self.embedding_store_enabled}")
+        print(f"EMBEDDING_STORE_PATH: {self.embedding_store_path}")
 
 
 
@@ -9,6 +9,7 @@ env = EnvironmentVariables.create_instance()
 
 from contextlib import asynccontextmanager
 from api.routes import router
+import asyncio
 # from api.health_router import router_health
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -32,9 +33,51 @@ app = FastAPI()
 async def lifespan(app: FastAPI):
     # Startup tasks
     logger.info("Starting up the application...")
+    # Heavy modules are imported here rather than when api.main is imported, see benchmarks/startup_benchmark.py
+    from libs.db_connections import pool, async_pool
+    from libs.components import ComponentRegistry
+    from libs.semantic_cache import SemanticAnswerCache
+    from libs.telemetry import DatasetWriter
+    from libs.blob_cache import BlobAssetCache
+    # The pools are opened here instead of at import; the async pool can only be opened inside the running event loop
+    pool.open()
+    await async_pool.open()
+    if env.run_db_migrations:
+        # deployments that run `python -m libs.migrations` once can set RUN_DB_MIGRATIONS=false
+        from libs.migrations import run_migrations
+        await asyncio.to_thread(run_migrations)
+    if env.checkpoint_retention_enabled:
+        # Old checkpoints and idle threads are pruned in the background so get_state stays fast
+        from libs.checkpoint_retention import CheckpointRetention
+        CheckpointRetention.get_instance().start()
+    # Cached answers are dropped whenever the curated or regulation index is rebuilt
+    SemanticAnswerCache.get_instance().start_index_watch()
+    # LangSmith dataset examples are written in the background, off the request path
+    DatasetWriter.get_instance().start()
+    if env.warm_up_on_startup:
+        from libs.input_graph import InputGraph
+        from libs.client_graph import ClientGraph
+        # Shared retriever, embedder and hrbot used by every graph turn
+        ComponentRegistry.get_instance()
+        # Compile the graphs once per process so /chat requests reuse the same app
+        InputGraph.get_instance().warm_up()
+        ClientGraph.get_instance().warm_up()
+        await InputGraph.get_instance().awarm_up()
+        await ClientGraph.get_instance().awarm_up()
+        logger.info("Graph apps compiled and warmed up")
     yield
     logger.info("Shutting down the application...")
     # Shutdown tasks
+    SemanticAnswerCache.get_instance().stop_index_watch()
+    if env.checkpoint_retention_enabled:
+        CheckpointRetention.get_instance().stop()
+    if BlobAssetCache._instance is not None:
+        BlobAssetCache.get_instance().stop_refresh()
+    await async_pool.close()
+    pool.close()
+    await asyncio.to_thread(DatasetWriter.get_instance().close, 30)
+    if ComponentRegistry._instance is not None:
+        await ComponentRegistry.get_instance().aclose()
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
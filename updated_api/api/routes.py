@@ -1,16 +1,15 @@
 # routes.py
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from api.models import ChatHistoryRequest, AdditionalInfoRequest, ChatFeedbackRequest, ChatRequest
 from api.jwt_utils import get_current_user
-from libs.hrbot import hrbot
-from prompts.prompt_templates import general_hr_prompt
 import logging
-from libs.retriever import CustomRetriever
-from libs.input_graph import InputGraph
-from libs.client_graph import ClientGraph
 from api.chat_response import ChatBot
 from api.environment_variables import EnvironmentVariables
+import asyncio
 import uuid
+import json
 
 router = APIRouter()
 
@@ -18,13 +17,27 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-def get_ai_assistant(thread_id: str, new_chat: bool):
-    logger.debug("Initializing AI assistant with thread_id: %s, new_chat: %s", thread_id, new_chat)
-    hr_general_prompt = general_hr_prompt()
-    hrcoplilot = hrbot(hr_general_prompt)
-    return hrcoplilot
+def build_input_graph():
+    # the graph modules pull in langgraph, langchain and the Azure SDKs, so they are imported on first use
+    from libs.input_graph import InputGraph
+    return InputGraph.get_instance()
 
-hrbot = get_ai_assistant("", True)
+def build_client_graph():
+    from libs.client_graph import ClientGraph
+    return ClientGraph.get_instance()
+
+async def input_graph():
+    # without the lifespan warm-up the first request imports and builds the graph (blob downloads, database
+    # setup); that runs in a worker thread so the other requests on the event loop are not held up
+    return await asyncio.to_thread(build_input_graph)
+
+async def client_graph():
+    return await asyncio.to_thread(build_client_graph)
+
+async def ndjson_frames(frames):
+    # one JSON object per line: node and token frames while the graph runs, then the answer with its sources
+    async for frame in frames:
+        yield json.dumps(jsonable_encoder(frame)) + "\n"
 
 @router.post("/chat")
 async def chat(request: ChatRequest):
@@ -32,14 +45,14 @@ async def chat(request: ChatRequest):
         logger.info("Received chat request: %s", request)
         logger.debug("user_message: %s, new_chat: %s, thread_id: %s", request.message, request.new_chat, request.thread_id)
         
-        workflow = InputGraph.get_instance()
+        workflow = await input_graph()
         
         if request.new_chat:
             request.thread_id = str(uuid.uuid4())
             logger.debug("Generated new thread_id: %s", request.thread_id)
         
-        logger.debug("Running workflow.get_answer with message: %s, user_answer: %s, thread_id: %s, client_state: %s, client_industry: %s, client_id: %s", request.message, request.user_answer, request.thread_id,request.client_state,request.client_industry,request.client_id)
-        answer = workflow.get_answer(request.message, request.user_answer, request.thread_id,)
+        logger.debug("Running workflow.aget_answer with message: %s, user_answer: %s, thread_id: %s, client_state: %s, client_industry: %s, client_id: %s", request.message, request.user_answer, request.thread_id,request.client_state,request.client_industry,request.client_id)
+        answer = await workflow.aget_answer(request.message, request.user_answer, request.thread_id,)
         logger.debug("Received response from workflow: %s", answer)
 
         logger.info("Responding back to client for thread_id: %s", request.thread_id)
@@ -56,14 +69,14 @@ async def chat(request: ChatRequest):
         logger.info("Received chat request: %s", request)
         logger.debug("user_message: %s, new_chat: %s, thread_id: %s", request.message, request.new_chat, request.thread_id)
         
-        workflow = ClientGraph.get_instance()
+        workflow = await client_graph()
         
         if request.new_chat:
             request.thread_id = str(uuid.uuid4())
             logger.debug("Generated new thread_id: %s", request.thread_id)
         
-        logger.debug("Running workflow.get_answer with message: %s, user_answer: %s, thread_id: %s, client_state: %s, client_industry: %s, client_id: %s", request.message, request.user_answer, request.thread_id,request.client_state,request.client_industry,request.client_id)
-        answer = workflow.get_answer(request.message, request.user_answer, request.thread_id,request.client_state,request.client_industry,request.client_id)
+        logger.debug("Running workflow.aget_answer with message: %s, user_answer: %s, thread_id: %s, client_state: %s, client_industry: %s, client_id: %s", request.message, request.user_answer, request.thread_id,request.client_state,request.client_industry,request.client_id)
+        answer = await workflow.aget_answer(request.message, request.user_answer, request.thread_id,request.client_state,request.client_industry,request.client_id)
         logger.debug("Received response from workflow: %s", answer)
 
         logger.info("Responding back to client for thread_id: %s", request.thread_id)
@@ -74,11 +87,47 @@ async def chat(request: ChatRequest):
         logger.error("Error processing chat request: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.post("/chat_stream")
+async def chat_stream(request: ChatRequest):
+    try:
+        logger.info("Received chat stream request: %s", request)
+        logger.debug("user_message: %s, new_chat: %s, thread_id: %s", request.message, request.new_chat, request.thread_id)
+
+        workflow = await input_graph()
+
+        if request.new_chat:
+            request.thread_id = str(uuid.uuid4())
+            logger.debug("Generated new thread_id: %s", request.thread_id)
+
+        frames = workflow.astream_answer(request.message, request.user_answer, request.thread_id)
+        return StreamingResponse(ndjson_frames(frames), media_type="application/x-ndjson")
+    except Exception as e:
+        logger.error("Error processing chat stream request: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.post("/chat_with_client_id_stream")
+async def chat_with_client_id_stream(request: ChatRequest):
+    try:
+        logger.info("Received chat stream request: %s", request)
+        logger.debug("user_message: %s, new_chat: %s, thread_id: %s", request.message, request.new_chat, request.thread_id)
+
+        workflow = await client_graph()
+
+        if request.new_chat:
+            request.thread_id = str(uuid.uuid4())
+            logger.debug("Generated new thread_id: %s", request.thread_id)
+
+        frames = workflow.astream_answer(request.message, request.user_answer, request.thread_id, request.client_state, request.client_industry, request.client_id)
+        return StreamingResponse(ndjson_frames(frames), media_type="application/x-ndjson")
+    except Exception as e:
+        logger.error("Error processing chat stream request: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
 @router.post("/verify_clientid")
 async def verify_clientid(request: ChatRequest):
     try:
         logger.debug("validating client id for %s",request)
-        workflow = InputGraph.get_instance()
+        workflow = await input_graph()
 
         answer = workflow.validate_clientid(request.client_id)
         logger.debug("Received response from workflow: %s", answer)
@@ -0,0 +1,73 @@
+# Measures /chat throughput and latency with N simultaneous chats against a running API.
+# Start the API first (uvicorn api.main:app), then from updated_api/:
+#   python -m benchmarks.chat_concurrency_benchmark --url http://localhost:8000 --concurrency 1 4 16 --requests 32
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from api.jwt_utils import create_jwt_token
+
+QUESTION = "Do I need to pay overtime to my employees in New York? We are in construction."
+
+
+def chat_payload():
+    return {
+        "message": QUESTION,
+        "new_chat": True,
+        "thread_id": "",
+        "scope": "",
+        "username": "benchmark",
+        "user_answer": "",
+        "client_state": "",
+        "client_industry": "",
+        "client_id": "",
+    }
+
+
+async def run_level(url, endpoint, concurrency, total_requests, timeout):
+    headers = {"Authorization": f"Bearer {create_jwt_token({'username': 'benchmark', 'scope': ''})}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=timeout) as client:
+        async def one_chat():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(endpoint, json=chat_payload())
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_chat() for _ in range(total_requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    mean = statistics.mean(latencies) if latencies else 0.0
+    print(f"concurrency {concurrency:>3}   throughput {len(latencies) / elapsed:6.2f} chats/s   "
+          f"mean {mean:6.2f} s   p95 {p95:6.2f} s   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/chat")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        asyncio.run(run_level(args.url, args.endpoint, concurrency, args.requests, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
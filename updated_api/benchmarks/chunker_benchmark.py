@@ -0,0 +1,85 @@
+# Chunking throughput on a multi-MB statute-like document: the sentence re-join chunk_text RegulationIndex
+# used to run (512 whitespace words, every sentence re-joining and re-splitting the whole chunk so far)
+# against TokenChunker (running token counts), at each chunk size; the re-join cost grows with the chunk
+# size, TokenChunker's does not. Pass --file to chunk a real document instead.
+# Run from updated_api/:
+#   python -m benchmarks.chunker_benchmark --megabytes 4 --max-tokens 512 2048
+import argparse
+import random
+import re
+import time
+
+from libs.chunker import TokenChunker
+
+HEADINGS = ["SECTION {n}. Definitions", "§ {n}.10 Hours worked", "ARTICLE {n}", "Subpart {n} General provisions"]
+WORDS = ("employer employee shall pay overtime compensation regular rate hours workweek exempt non-exempt "
+         "wage minimum record notice leave state federal regulation provision paragraph subsection").split()
+
+
+def statute(megabytes, seed=7):
+    rng = random.Random(seed)
+    parts, size, n = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        n += 1
+        lines = [rng.choice(HEADINGS).format(n=n)]
+        for _ in range(rng.randint(3, 8)):
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))).capitalize() + "."
+                         for _ in range(rng.randint(2, 6))]
+            lines.append(" ".join(sentences))
+        part = "\n\n".join(lines) + "\n\n"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def word_chunks(text, max_chunk_size=512):
+    sentences = re.split(r'(?<=[.!?]) +', text)
+    chunks = []
+    current_chunk = []
+    for sentence in sentences:
+        if len(" ".join(current_chunk + [sentence]).split()) <= max_chunk_size:
+            current_chunk.append(sentence)
+        else:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = [sentence]
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def timed(label, chunk, text):
+    start = time.perf_counter()
+    chunks = chunk(text)
+    seconds = time.perf_counter() - start
+    megabytes = len(text.encode("utf-8")) / 1024 / 1024
+    print(f"{label:<14} {megabytes:6.1f} MB  {len(chunks):7d} chunks  {seconds:8.2f}s  {megabytes / seconds:7.2f} MB/s")
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=4)
+    parser.add_argument("--file", help="chunk this text file instead of the generated statute")
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[512, 2048])
+    parser.add_argument("--overlap-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = statute(args.megabytes)
+    for max_tokens in args.max_tokens:
+        print(f"chunk size {max_tokens}")
+        chunker = TokenChunker(max_tokens=max_tokens, overlap_tokens=args.overlap_tokens)
+        timed("word re-join", lambda text: word_chunks(text, max_tokens), text)
+        chunks = timed("TokenChunker", chunker.chunk, text)
+        # streaming the same text in 64 KB pieces gives the same chunks without holding the document
+        pieces = (text[i:i + 65536] for i in range(0, len(text), 65536))
+        assert chunker.chunk(pieces) == chunks
+        largest = max(chunker.count_tokens(chunk) for chunk in chunks[:200])
+        print(f"largest of the first {min(len(chunks), 200)} chunks: {largest} tokens (limit {max_tokens})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Compares the DataFrame based client demographics lookup ClientGraph used to do with ClientDirectory,
+# on a synthetic demographics CSV. Reports load time, peak traced memory and lookup latency.
+# Run from updated_api/:
+#   python -m benchmarks.client_directory_benchmark --clients 1000000
+import argparse
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+import pandas as pd
+
+from libs.client_directory import ClientDirectory
+
+STATES = ["NY", "CA", "TX", "FL", "IL", "PA", "OH", "GA", "NC", "MI", "NJ", "VA", "WA", "AZ", "MA"]
+INDUSTRIES = ["Construction", "Retail Trade", "Manufacturing", "Health Care and Social Assistance",
+              "Accommodation and Food Services", "Professional, Scientific, and Technical Services", "Not Specified"]
+
+
+def demographics_csv(clients):
+    rows = ["CltNbr,LegalState,NAICSLevel01,CltName,Phone"]
+    for number in range(clients):
+        rows.append(f'{number:08d},{random.choice(STATES)},"{random.choice(INDUSTRIES)}",Client {number} LLC,555-{number % 10000:04d}')
+    return ("\n".join(rows) + "\n").encode("utf-8")
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded, elapsed, current / 2**20, peak / 2**20
+
+
+def time_lookups(lookup, client_ids):
+    timings = []
+    for client_id in client_ids:
+        start = time.perf_counter()
+        lookup(client_id)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def dataframe_lookup(frame):
+    def lookup(client_id):
+        if client_id in frame.CltNbr.to_list():
+            frame[frame['CltNbr'] == client_id]['LegalState'].iloc[0]
+            frame[frame['CltNbr'] == client_id]['NAICSLevel01'].iloc[0]
+            frame[frame['CltNbr'] == client_id]['CltName'].iloc[0]
+    return lookup
+
+
+def directory_lookup(directory):
+    def lookup(client_id):
+        if client_id in directory:
+            directory.get(client_id)
+    return lookup
+
+
+def report(label, load_seconds, retained_mb, peak_mb, timings):
+    print(f"{label:<18} load {load_seconds:7.2f} s   retained {retained_mb:8.1f} MB   peak {peak_mb:8.1f} MB   "
+          f"lookup mean {statistics.mean(timings):12.1f} us   p50 {statistics.median(timings):12.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--dataframe-lookups", type=int, default=20, help="the DataFrame lookup scans every row, keep this small")
+    args = parser.parse_args()
+
+    random.seed(7)
+    data = demographics_csv(args.clients)
+    print(f"{args.clients} clients, {len(data) / 2**20:.1f} MB CSV")
+    client_ids = [f"{random.randrange(args.clients):08d}" for _ in range(args.lookups)]
+
+    # the old loader kept the downloaded bytes, the decoded string and the StringIO alive at once
+    frame, seconds, retained, peak = measure(lambda: pd.read_csv(StringIO(data.decode('utf-8')), dtype={"CltNbr": str}))
+    report("DataFrame", seconds, retained, peak, time_lookups(dataframe_lookup(frame), client_ids[:args.dataframe_lookups]))
+    del frame
+
+    # ClientDirectory streams the local copy kept by the blob asset cache
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(cache_dir, "client_demographics")
+        with open(path, "wb") as f:
+            f.write(data)
+        directory, seconds, retained, peak = measure(lambda: ClientDirectory.from_csv(path))
+    report("ClientDirectory", seconds, retained, peak, time_lookups(directory_lookup(directory), client_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Measures the per-turn cost of constructing the retriever, embedder and hrbot objects, as the graph
+# nodes used to do on every turn, versus looking them up in the ComponentRegistry. No network calls are made.
+# Run from updated_api/:
+#   python -m benchmarks.component_construction_benchmark --iterations 50
+import argparse
+import statistics
+import time
+
+from api.environment_variables import EnvironmentVariables
+
+env = EnvironmentVariables.get_instance()
+
+from libs.components import ComponentRegistry
+from libs.embedder import EmbeddingModel
+from libs.hrbot import hrbot
+from libs.retriever import CustomRetriever
+from prompts.prompt_templates import general_hr_prompt
+
+
+def build_per_turn():
+    retriever = CustomRetriever(nr_top_docs=3, retrieval_type='all').get_retriever()
+    hrcoplilot = hrbot(general_hr_prompt())
+    hrcoplilot.get_rag_chain(retriever)
+    # each retriever used to create its own embedder (and HTTP client) per query
+    EmbeddingModel(type='openai')
+    EmbeddingModel(type='openai')
+
+
+def lookup_registry():
+    components = ComponentRegistry.get_instance()
+    components.hrbot.get_rag_chain(components.retriever)
+
+
+def time_calls(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    lookup_registry()
+    for label, fn in (("construct per turn", build_per_turn), ("component registry", lookup_registry)):
+        timings = time_calls(fn, args.iterations)
+        print(f"{label:<20} mean {statistics.mean(timings):9.3f} ms   p50 {statistics.median(timings):9.3f} ms   max {max(timings):9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
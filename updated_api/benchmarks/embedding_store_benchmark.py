@@ -0,0 +1,76 @@
+# Rebuild time of the index embedding stage with a cold and a warm EmbeddingStore. The embeddings API is
+# simulated (fixed latency per request, random vectors) so the numbers isolate what the store saves; a
+# third run changes --changed of the texts, as an incremental rebuild after an edit of the source data would.
+# Run from updated_api/:
+#   python -m benchmarks.embedding_store_benchmark --texts 20000 --dim 3072 --latency 0.3
+import argparse
+import shutil
+import tempfile
+import time
+import types
+
+import numpy as np
+
+from libs.aisearch_index import AISearchIndex
+from libs.embedding_store import EmbeddingStore
+
+
+class SimulatedEmbeddings:
+    def __init__(self, dim, latency):
+        self.dim = dim
+        self.latency = latency
+        self.requests = 0
+        self.inputs = 0
+
+    def create(self, input, model):
+        time.sleep(self.latency)
+        self.requests += 1
+        self.inputs += len(input)
+        vectors = np.random.default_rng(len(input)).random((len(input), self.dim), dtype=np.float32)
+        return types.SimpleNamespace(data=[types.SimpleNamespace(index=i, embedding=vector.tolist()) for i, vector in enumerate(vectors)])
+
+
+def offline_index(store_path, dim, latency):
+    index = AISearchIndex.__new__(AISearchIndex)
+    index.index_name = "benchmark"
+    index.embedding_model = "text-embedding-3-large"
+    index.openai_client = types.SimpleNamespace(embeddings=SimulatedEmbeddings(dim, latency))
+    index.embedding_store = EmbeddingStore(store_path, index.embedding_model)
+    return index
+
+
+def rebuild(label, store_path, texts, args):
+    index = offline_index(store_path, args.dim, args.latency)
+    start = time.perf_counter()
+    vectors = index.embed_texts(texts)
+    seconds = time.perf_counter() - start
+    embeddings = index.openai_client.embeddings
+    print(f"{label:<18} {seconds:8.2f}s  {embeddings.requests:5d} requests  {embeddings.inputs:7d} texts embedded  "
+          f"{len(texts) / seconds:9.0f} texts/s")
+    assert all(vector is not None for vector in vectors)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per simulated embeddings request")
+    parser.add_argument("--changed", type=float, default=0.02, help="share of texts edited before the third rebuild")
+    args = parser.parse_args()
+
+    texts = [f"Chunk {i}: employers must pay non-exempt employees overtime for hours over forty in a workweek." for i in range(args.texts)]
+    edited = [f"{text} (amended)" if i % int(1 / args.changed) == 0 else text for i, text in enumerate(texts)]
+    store_path = tempfile.mkdtemp(prefix="embedding-store-")
+    try:
+        rebuild("cold store", store_path, texts, args)
+        index = rebuild("warm store", store_path, texts, args)
+        rebuild(f"{args.changed:.0%} edited", store_path, edited, args)
+        stats = index.embedding_store.stats()
+        print(f"store: {stats['rows']} vectors of {stats['dim']} floats, {stats['bytes'] / 2**20:.1f} MB on disk")
+    finally:
+        shutil.rmtree(store_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Compares the per field classification/extraction prompts (run sequentially, and as parallel graph
+# branches) with the single structured extraction call against a local mock LLM that sleeps for a
+# fixed latency per round trip.
+# Run from updated_api/:
+#   python -m benchmarks.extraction_benchmark --latency 0.4 --questions 20
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+import uuid
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+
+from libs.input_graph import InputGraph
+from libs.prompt_cache import PromptResponseCache
+
+CATEGORIES = ["overtime", "sick leave", "wage", "exempt/not-exempt classification"]
+TOOLS = ["job descriptions"]
+# stop before the answer cache, retrieval or the human in the loop, so only classification and extraction run
+STOP_BEFORE = ["lookup_answer_cache", "handle_RAG_human_input", "get_client_dem"]
+INDUSTRIES = ["Construction", "Manufacturing", "Retail Trade", "Health Care and Social Assistance", "Accommodation and Food Services"]
+
+
+class MockLLM:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def respond(self, prompt):
+        if "state of the client" in prompt:
+            return AIMessage(content="New York")
+        if "industry of the client" in prompt:
+            return AIMessage(content="Construction")
+        return AIMessage(content="overtime")
+
+    def invoke(self, prompt):
+        self.count_call()
+        time.sleep(self.latency)
+        return self.respond(prompt)
+
+    async def ainvoke(self, prompt):
+        self.count_call()
+        await asyncio.sleep(self.latency)
+        return self.respond(prompt)
+
+    def with_structured_output(self, schema):
+        def respond(prompt_value):
+            self.count_call()
+            time.sleep(self.latency)
+            return schema(classification="overtime", state="New York", industry="Construction")
+        return RunnableLambda(respond)
+
+
+class OfflineInputGraph(InputGraph):
+    # the industry codes normally come from the blob asset cache
+    industry_codes = INDUSTRIES
+
+
+def build_graph(mode, llm):
+    graph = OfflineInputGraph.__new__(OfflineInputGraph)
+    graph.llm = llm
+    graph.categories_list = CATEGORIES
+    graph.tools_list = TOOLS
+    graph.categories = ', '.join(CATEGORIES + TOOLS)
+    graph.extraction_mode = mode
+    # every LLM round trip is counted, so neither the caches nor the local classifier and gazetteer may answer
+    graph.prompt_cache = PromptResponseCache.get_instance()
+    graph.prompt_cache.enabled = False
+    graph.intent_classifier = None
+    graph.use_gazetteer = False
+    graph.use_industry_shortlist = False
+    graph.question_extractor = graph.build_question_extractor()
+    return graph
+
+
+def run_nodes(graph):
+    def run_turn(question):
+        state = {"question": question, "client_state": "", "client_industry": ""}
+        state.update(graph.classify_input_node(state))
+        state.update(graph.extract_client_dem(state))
+        return state
+    return run_turn
+
+
+def run_compiled(graph):
+    app = graph.build_graph().compile(checkpointer=MemorySaver())
+
+    def run_turn(question):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        return app.invoke({"question": question, "client_state": "", "client_industry": ""}, config=config,
+                          interrupt_before=STOP_BEFORE)
+    return run_turn
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.4, help="simulated seconds per LLM round trip")
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    for label, mode, runner in (("per_field sequential", "per_field", run_nodes),
+                                ("per_field parallel graph", "per_field", run_compiled),
+                                ("structured graph", "structured", run_compiled)):
+        llm = MockLLM(args.latency)
+        run_turn = runner(build_graph(mode, llm))
+        timings = []
+        for i in range(args.questions):
+            start = time.perf_counter()
+            run_turn(f"Do I need to pay overtime to a construction worker in NY? ({i})")
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<25} mean {statistics.mean(timings):8.1f} ms/turn   LLM calls/turn {llm.calls / args.questions:.1f}")
+
+
+if __name__ == "__main__":
+    main()
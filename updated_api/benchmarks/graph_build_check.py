@@ -0,0 +1,52 @@
+# Builds and compiles the InputGraph app, sync and async, in both extraction modes, with the offline
+# graph of the extraction benchmark (mock LLM, no Azure or Postgres), then runs one turn through each up
+# to retrieval. In per_field mode the three parallel branches must meet in join_input exactly once,
+# before the intent routing. Fails on the first graph that does not.
+# Run from updated_api/:
+#   python -m benchmarks.graph_build_check
+import asyncio
+import uuid
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.extraction_benchmark import STOP_BEFORE, MockLLM, build_graph
+
+QUESTION = "Do I need to pay overtime to a construction worker in NY?"
+
+
+def traced_graph(mode, events):
+    graph = build_graph(mode, MockLLM(0))
+    join_input, decide_next_node = graph.join_input, graph.decide_next_node
+
+    def traced_join_input(state):
+        events.append("join_input")
+        return join_input(state)
+
+    def traced_decide_next_node(state):
+        events.append("decide_next_node")
+        return decide_next_node(state)
+
+    graph.join_input, graph.decide_next_node = traced_join_input, traced_decide_next_node
+    return graph
+
+
+def main():
+    for mode in ("structured", "per_field"):
+        for asynchronous in (False, True):
+            events = []
+            graph = traced_graph(mode, events)
+            app = graph.build_graph(asynchronous=asynchronous).compile(checkpointer=MemorySaver())
+            turn = {"question": QUESTION, "client_state": "", "client_industry": ""}
+            config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+            if asynchronous:
+                result = asyncio.run(app.ainvoke(turn, config=config, interrupt_before=STOP_BEFORE))
+            else:
+                result = app.invoke(turn, config=config, interrupt_before=STOP_BEFORE)
+            expected = ["join_input", "decide_next_node"] if mode == "per_field" else ["decide_next_node"]
+            assert events == expected, f"{mode} {asynchronous}: ran {events}, expected {expected}"
+            assert result["classification"] == "overtime" and result["client_state"] == "New York", result
+            print(f"{mode:<11} {'async' if asynchronous else 'sync':<5} graph compiled and ran: {' -> '.join(events)}")
+
+
+if __name__ == "__main__":
+    main()
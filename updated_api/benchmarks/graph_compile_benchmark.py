@@ -0,0 +1,51 @@
+# Measures the per-request overhead of compiling the graph apps versus reusing the cached app.
+# Run from updated_api/ with the same environment as the API:
+#   python -m benchmarks.graph_compile_benchmark --iterations 200
+import argparse
+import statistics
+import time
+
+from api.environment_variables import EnvironmentVariables
+
+env = EnvironmentVariables.get_instance()
+
+from libs.app_cache import CompiledAppCache
+from libs.input_graph import InputGraph
+from libs.client_graph import ClientGraph
+from libs.db_connections import pool
+
+
+def time_calls(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<34} mean {statistics.mean(timings):9.3f} ms   p50 {statistics.median(timings):9.3f} ms   p95 {p95:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    # the API lifespan opens the pool, importing the graph modules no longer does
+    pool.open(wait=True)
+    for name, graph in (("InputGraph", InputGraph.get_instance()), ("ClientGraph", ClientGraph.get_instance())):
+        CompiledAppCache.get_instance().invalidate()
+        per_request = time_calls(graph.initiate_graph, args.iterations)
+        graph.warm_up()
+        cached = time_calls(graph.get_app, args.iterations)
+        report(f"{name} compile per request", per_request)
+        report(f"{name} cached app", cached)
+        print(f"{name} overhead removed per request: {statistics.mean(per_request) - statistics.mean(cached):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
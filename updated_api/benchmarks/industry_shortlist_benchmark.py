@@ -0,0 +1,98 @@
+# Compares the client industry prompt, and the structured extraction prompt of the default extraction mode,
+# listing every industry category with the same prompts listing only the IndustryShortlist candidates, on
+# the labelled questions in benchmarks/industry_eval.json. Reports prompt tokens per call, how often the
+# labelled industry made the shortlist and, against the configured Azure OpenAI deployments, the LLM's
+# accuracy with either prompt.
+# Run from updated_api/:
+#   python -m benchmarks.industry_shortlist_benchmark --top-k 5
+# or offline (token counts and shortlist recall only), with a hashed bag of words embedder:
+#   python -m benchmarks.industry_shortlist_benchmark --offline
+import argparse
+import json
+import os
+import statistics
+
+import tiktoken
+
+from api.environment_variables import EnvironmentVariables
+from benchmarks.extraction_benchmark import CATEGORIES, TOOLS
+from benchmarks.intent_benchmark import HashingEmbedder
+from libs.industry_shortlist import IndustryShortlist
+from libs.input_graph import InputGraph
+from prompts.prompt_templates import question_extraction_prompt
+
+env = EnvironmentVariables.get_instance()
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "industry_eval.json")
+NAICS_SECTORS = [
+    "Agriculture, Forestry, Fishing and Hunting", "Mining, Quarrying, and Oil and Gas Extraction", "Utilities",
+    "Construction", "Manufacturing", "Wholesale Trade", "Retail Trade", "Transportation and Warehousing",
+    "Information", "Finance and Insurance", "Real Estate and Rental and Leasing",
+    "Professional, Scientific, and Technical Services", "Management of Companies and Enterprises",
+    "Administrative and Support and Waste Management and Remediation Services", "Educational Services",
+    "Health Care and Social Assistance", "Arts, Entertainment, and Recreation", "Accommodation and Food Services",
+    "Other Services (except Public Administration)", "Public Administration",
+]
+
+
+class OfflineInputGraph(InputGraph):
+    industry_codes = NAICS_SECTORS
+
+
+def structured_prompt(categories, industries, question):
+    return question_extraction_prompt().format(categories=categories, industries=industries) + "\n" + question
+
+
+def accuracy(graph, questions, gold, build_prompt):
+    predictions = [graph.invoke_text(build_prompt(question)) for question in questions]
+    return sum(p == g for p, g in zip(predictions, gold)) / len(gold)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offline", action="store_true", help="hashed embeddings and the NAICS sectors, no Azure calls")
+    parser.add_argument("--top-k", type=int, default=env.industry_shortlist_top_k)
+    args = parser.parse_args()
+
+    with open(EVAL_PATH) as f:
+        evaluation = json.load(f)
+    questions = [item["question"] for item in evaluation]
+    gold = [item["industry"] for item in evaluation]
+
+    if args.offline:
+        graph = OfflineInputGraph.__new__(OfflineInputGraph)
+        embedder = HashingEmbedder()
+    else:
+        graph = InputGraph.get_instance()
+        from libs.components import ComponentRegistry
+        embedder = ComponentRegistry.get_instance().query_embedder
+    shortlist = IndustryShortlist(embedder, graph.industry_codes, top_k=args.top_k)
+    candidates = [shortlist.shortlist(question) for question in questions]
+
+    encoding = tiktoken.encoding_for_model("gpt-4o")
+    full_tokens = [len(encoding.encode(graph.client_industry_prompt(question))) for question in questions]
+    short_tokens = [len(encoding.encode(graph.client_industry_prompt(question, shortlisted)))
+                    for question, shortlisted in zip(questions, candidates)]
+    full, short = statistics.mean(full_tokens), statistics.mean(short_tokens)
+    print(f"{len(graph.industry_codes)} industry categories, top {args.top_k} shortlist, {len(questions)} questions")
+    print(f"industry prompt tokens/call    full list {full:7.1f}   shortlist {short:7.1f}   saved {full - short:7.1f} ({1 - short / full:6.1%})")
+    categories = ', '.join(CATEGORIES + TOOLS)
+    full_tokens = [len(encoding.encode(structured_prompt(categories, graph.industry_codes, question))) for question in questions]
+    short_tokens = [len(encoding.encode(structured_prompt(categories, shortlisted, question)))
+                    for question, shortlisted in zip(questions, candidates)]
+    full, short = statistics.mean(full_tokens), statistics.mean(short_tokens)
+    print(f"structured prompt tokens/call  full list {full:7.1f}   shortlist {short:7.1f}   saved {full - short:7.1f} ({1 - short / full:6.1%})")
+
+    labelled = [(g, shortlisted) for g, shortlisted in zip(gold, candidates) if g in graph.industry_codes]
+    recall = sum(g in shortlisted for g, shortlisted in labelled) / len(labelled)
+    print(f"shortlist recall@{args.top_k}  {recall:6.1%} of {len(labelled)} questions naming an industry")
+
+    if not args.offline:
+        graph.prompt_cache.enabled = False
+        by_question = dict(zip(questions, candidates))
+        print(f"LLM accuracy        full list {accuracy(graph, questions, gold, graph.client_industry_prompt):6.1%}   "
+              f"shortlist {accuracy(graph, questions, gold, lambda q: graph.client_industry_prompt(q, by_question[q])):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Compares LLM intent classification with the nearest neighbour IntentClassifier (falling back to the LLM
+# when it abstains) on the labelled questions in benchmarks/intent_eval.json. Reports accuracy against the
+# labels, agreement with the LLM, how often the LLM is still called and latency per question.
+# Run from updated_api/ against the configured Azure OpenAI deployments:
+#   python -m benchmarks.intent_benchmark
+# or offline, with a hashed bag of words embedder and a mock LLM that answers the label after --latency:
+#   python -m benchmarks.intent_benchmark --offline --threshold 0.3 --margin 0.02
+import argparse
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+from api.environment_variables import EnvironmentVariables
+from libs.input_graph import InputGraph
+from libs.intent_classifier import IntentClassifier
+from libs.prompt_cache import PromptResponseCache
+
+env = EnvironmentVariables.get_instance()
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "intent_eval.json")
+CATEGORIES = ["overtime", "sick leave", "wage", "exempt/not-exempt classification"]
+TOOLS = ["job descriptions"]
+
+
+class HashingEmbedder:
+    embedding_model = "hashing-bow"
+
+    def __init__(self, dimensions=1024):
+        self.dimensions = dimensions
+
+    def generate_embeddings(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = re.findall(r"[a-z0-9']+", text.lower())
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            vector[zlib.crc32(token.encode("utf-8")) % self.dimensions] += 1.0
+        return vector
+
+    def generate_embeddings_batch(self, texts, persist=False):
+        return [self.generate_embeddings(text) for text in texts]
+
+
+class MockLLM:
+    def __init__(self, labels, latency):
+        self.labels = labels
+        self.latency = latency
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return AIMessage(content=self.labels[prompt.rsplit("Input: ", 1)[1]])
+
+
+class OfflineInputGraph(InputGraph):
+    industry_codes = []
+
+
+def build_offline_graph(llm):
+    graph = OfflineInputGraph.__new__(OfflineInputGraph)
+    graph.llm = llm
+    graph.categories_list = CATEGORIES
+    graph.tools_list = TOOLS
+    graph.categories = ', '.join(CATEGORIES + TOOLS)
+    graph.prompt_cache = PromptResponseCache.get_instance()
+    return graph
+
+
+def timed(function, question):
+    start = time.perf_counter()
+    result = function(question)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def report(label, predictions, timings, gold, reference=None):
+    accuracy = sum(p == g for p, g in zip(predictions, gold)) / len(gold)
+    line = f"{label:<24} accuracy {accuracy:6.1%}"
+    if reference is not None:
+        line += f"   agreement with LLM {sum(p == r for p, r in zip(predictions, reference)) / len(gold):6.1%}"
+    print(line + f"   mean {statistics.mean(timings):8.1f} ms   p95 {np.percentile(timings, 95):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offline", action="store_true", help="hashed embeddings and a mock LLM, no Azure calls")
+    parser.add_argument("--latency", type=float, default=0.6, help="simulated seconds per LLM round trip with --offline")
+    parser.add_argument("--threshold", type=float, default=env.intent_classifier_threshold)
+    parser.add_argument("--margin", type=float, default=env.intent_classifier_margin)
+    parser.add_argument("--top-k", type=int, default=env.intent_classifier_top_k)
+    args = parser.parse_args()
+
+    with open(EVAL_PATH) as f:
+        evaluation = json.load(f)
+    questions = [item["question"] for item in evaluation]
+    gold = [item["label"] for item in evaluation]
+
+    if args.offline:
+        graph = build_offline_graph(MockLLM(dict(zip(questions, gold)), args.latency))
+        embedder = HashingEmbedder()
+    else:
+        graph = InputGraph.get_instance()
+        from libs.components import ComponentRegistry
+        embedder = ComponentRegistry.get_instance().query_embedder
+    # every LLM classification is a real round trip, not a cached answer
+    graph.prompt_cache.enabled = False
+
+    # a scratch cache directory, so the example embeddings are computed (and timed) on every run
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        classifier = IntentClassifier(embedder, graph.categories_list + graph.tools_list, top_k=args.top_k,
+                                      threshold=args.threshold, margin=args.margin, cache_dir=scratch)
+        print(f"{len(questions)} questions, {len(classifier.example_labels)} examples embedded in {time.perf_counter() - start:.2f} s")
+
+    llm_results = [timed(graph.classify, question) for question in questions]
+    llm_predictions = [result for result, _ in llm_results]
+    report("LLM", llm_predictions, [ms for _, ms in llm_results], gold)
+
+    local_results = [timed(lambda q: classifier.predict(embedder.generate_embeddings(q)), question) for question in questions]
+    confident = [(label, g) for ((label, _, _), _), g in zip(local_results, gold) if label is not None]
+    local_ms = [ms for _, ms in local_results]
+    # the hybrid pays for the embedding always and for the LLM call only when the classifier abstained
+    hybrid_predictions = [label if label is not None else llm for ((label, _, _), _), llm in zip(local_results, llm_predictions)]
+    hybrid_ms = [ms if label is not None else ms + llm_ms for ((label, _, _), ms), (_, llm_ms) in zip(local_results, llm_results)]
+    report("kNN + LLM fallback", hybrid_predictions, hybrid_ms, gold, llm_predictions)
+    precision = sum(label == g for label, g in confident) / len(confident) if confident else 0.0
+    print(f"{'kNN confident answers':<24} {len(confident)}/{len(questions)} answered locally, precision {precision:6.1%}, "
+          f"LLM calls avoided {len(confident) / len(questions):6.1%}   mean {statistics.mean(local_ms):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Compares the per turn cost of turning retrieved documents into answer sources: the DataFrame based
+# get_case_ids + data_sources_mapping the graphs used to run, and Sources.from_document + source_fields.
+# Run from updated_api/:
+#   python -m benchmarks.source_mapping_benchmark --documents 6 --turns 2000
+import argparse
+import statistics
+import time
+
+import pandas as pd
+from langchain.docstore.document import Document
+
+from libs.answer import Sources
+from libs.uitls import source_fields
+
+
+def dataframe_sources(response):
+    sources = pd.DataFrame()
+    for i in range(len(response["context"])):
+        metas = pd.DataFrame()
+        metas["reference_id"] = pd.DataFrame.from_dict([response["context"][i].metadata])['document_id']
+        metas["title"] = pd.DataFrame.from_dict([response["context"][i].metadata])['title']
+        metas["reference_link"] = pd.DataFrame.from_dict([response["context"][i].metadata])['reference_link']
+        sources = pd.concat([sources, metas])
+    mapped = [Sources(reference_id=row['reference_id'], title=row['title'], url=row['reference_link'])
+              for _, row in sources.iterrows()]
+    return {"source_title": [source.title for source in mapped],
+            "source_metadata_id": [source.reference_id for source in mapped],
+            "source_url": [source.url for source in mapped]}
+
+
+def record_sources(response):
+    return source_fields([Sources.from_document(document) for document in response["context"]])
+
+
+def time_turns(map_sources, response, turns):
+    timings = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        map_sources(response)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=6, help="documents per answer, 3 per index by default")
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    response = {"context": [Document(page_content=f"content {i}", metadata={"document_id": f"doc-{i}", "title": f"Title {i}",
+                                                                            "reference_link": f"https://example.com/{i}"})
+                            for i in range(args.documents)]}
+    assert dataframe_sources(response) == record_sources(response)
+    for label, map_sources in (("DataFrame", dataframe_sources), ("slotted records", record_sources)):
+        timings = time_turns(map_sources, response, args.turns)
+        print(f"{label:<16} {args.documents} documents   mean {statistics.mean(timings):9.1f} us/turn   "
+              f"p50 {statistics.median(timings):9.1f} us   p99 {sorted(timings)[int(len(timings) * 0.99)]:9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
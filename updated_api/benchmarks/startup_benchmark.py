@@ -0,0 +1,82 @@
+# Tracks API startup cost: an import time breakdown of api.main from `python -X importtime` and the
+# time from launching uvicorn until the first request is served. Run from updated_api/ with the API environment:
+#   python -m benchmarks.startup_benchmark --top 15
+#   python -m benchmarks.startup_benchmark --json startup.json   # for CI to store and compare
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def import_times(module):
+    # -X importtime writes "import time: self [us] | cumulative | imported package" lines to stderr
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000,
+                        "top_level": not name.startswith("  ")})
+    return timings
+
+
+def time_to_first_request(port, timeout, path):
+    # lifespan warm up is part of startup, uvicorn only serves once it has finished
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy())
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"no response from {path} within {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="api.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/openapi.json")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--skip-server", action="store_true", help="only report import times")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    timings = import_times(args.module)
+    total_ms = sum(timing["self_ms"] for timing in timings)
+    print(f"import {args.module}: {total_ms:.0f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for timing in sorted((t for t in timings if t["top_level"]), key=lambda t: t["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"{timing['cumulative_ms']:14.1f} {timing['self_ms']:10.1f}  {timing['module']}")
+
+    results = {"module": args.module, "import_ms": total_ms,
+               "top_level_imports": {t["module"]: t["cumulative_ms"] for t in timings if t["top_level"]}}
+    if not args.skip_server:
+        seconds = time_to_first_request(args.port, args.timeout, args.path)
+        print(f"time to first request ({args.path}): {seconds:.2f} s")
+        results["time_to_first_request_s"] = seconds
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,62 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from azure.keyvault.secrets import SecretClient
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError, ServiceRequestError
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.indexes.models import SearchAlias
 import openai
+from libs.embedding_store import EmbeddingStore
+
+# inputs per embeddings request; Azure OpenAI accepts up to 2048, fewer keeps a request well under its token limit
+EMBEDDING_BATCH_SIZE = 256
+# embeddings requests in flight at once, bounded so a large run stays under the deployment's rate limit
+EMBEDDING_CONCURRENCY = 4
+# documents per upload_documents call, Azure AI Search accepts up to 1000 (and 16 MB) per batch
+UPLOAD_BATCH_SIZE = 500
+# vectors of every text embedded before, so a rebuild only pays for new or changed text
+EMBEDDING_STORE_PATH = ".embedding_store"
+# key of the document holding the index's content version, which the semantic answer cache watches
+INDEX_VERSION_KEY = "index_version"
+MAX_RETRIES = 5
+RETRY_BACKOFF_SECONDS = 2.0
+RETRYABLE_OPENAI_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+def create_alias(index_client, alias_name, index_name):
+    for attempt in range(MAX_RETRIES):
+        try:
+            index_client.create_or_update_alias(SearchAlias(name=alias_name, indexes=[index_name]))
+            print(f"Alias '{alias_name}' now points at '{index_name}'.")
+            return
+        except (HttpResponseError, ServiceRequestError) as e:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+            print(f"Creating alias '{alias_name}' failed ({e}), retrying in {delay:.0f}s.")
+            time.sleep(delay)
+
+
+def migrate_to_alias(index_client, alias_name, index_name):
+    # one time switch from an index named alias_name to an alias of that name over index_name; queries to
+    # alias_name fail from the delete until the alias is created, usually a few seconds
+    print(f"Deleting index '{alias_name}' to replace it with an alias, '{alias_name}' is unavailable until the alias is created.")
+    start = time.perf_counter()
+    try:
+        index_client.delete_index(alias_name)
+    except ResourceNotFoundError:
+        pass
+    create_alias(index_client, alias_name, index_name)
+    print(f"'{alias_name}' was unavailable for {time.perf_counter() - start:.1f}s.")
 
 
 class AISearchIndex:
     def __init__(self, index_name=None, service_name=None, azure_search_api_key=None,  
                  openai_api_key=None, openai_api_version=None, openai_api_endpoint=None,
-                   openai_embedding_model=None):
+                   openai_embedding_model=None, embedding_store_path=EMBEDDING_STORE_PATH):
         self.index_name = index_name
         self.service_name = service_name
         self.azure_search_api_key = azure_search_api_key
@@ -16,10 +64,14 @@ class AISearchIndex:
         self.credential = AzureKeyCredential(self.azure_search_api_key)
         self.index_client = SearchIndexClient(endpoint=self.endpoint, credential=self.credential)
         self.search_client = SearchClient(endpoint=self.endpoint, index_name=self.index_name, credential=self.credential)
+        # set by deploy_index; until then documents go to whatever index_name resolves to
+        self.physical_index_name = None
+        self.live_index_name = None
         self.openai_api_key = openai_api_key
         self.openai_api_version = openai_api_version
         self.openai_api_endpoint = openai_api_endpoint
         self.embedding_model = openai_embedding_model
+        self.embedding_store = EmbeddingStore(embedding_store_path, openai_embedding_model) if embedding_store_path else None
         self.openai_client = openai.AzureOpenAI(
                                     api_key=self.openai_api_key,
                                     api_version=self.openai_api_version,
@@ -31,11 +83,171 @@ class AISearchIndex:
     def create_index(self):
         pass
 
+    def schema_version(self, index):
+        # the index definition without its name, so any field, vector or semantic change gives a new version
+        definition = index.serialize()
+        definition.pop("name", None)
+        return hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+    def alias_target(self):
+        try:
+            return self.index_client.get_alias(self.index_name).indexes[0]
+        except ResourceNotFoundError:
+            return None
+
+    def deploy_index(self, index):
+        # index_name is an alias over versioned indexes "<index_name>-<schema version>". While the schema is
+        # unchanged the live index is updated in place; a new schema is built into a shadow index that
+        # populate_index fills and publish_index then swaps the alias to, so retrieval never sees an empty index
+        self.physical_index_name = f"{self.index_name}-{self.schema_version(index)}"
+        self.live_index_name = self.alias_target()
+        if self.live_index_name == self.physical_index_name:
+            print(f"Index '{self.index_name}' is up to date with the schema, updating '{self.physical_index_name}' incrementally.")
+        else:
+            try:
+                self.index_client.get_index(self.physical_index_name)
+                print(f"Resuming the build of shadow index '{self.physical_index_name}'.")
+            except ResourceNotFoundError:
+                index.name = self.physical_index_name
+                self.index_client.create_index(index)
+                print(f"Shadow index '{self.physical_index_name}' created for the new schema.")
+        self.search_client = SearchClient(endpoint=self.endpoint, index_name=self.physical_index_name, credential=self.credential)
+
+    def publish_index(self, migrate_legacy_index=False):
+        self.publish_version()
+        if self.physical_index_name is None or self.live_index_name == self.physical_index_name:
+            return
+        if self.live_index_name is None and self.legacy_index_exists():
+            # an index created before aliases were used holds the alias name. It has to be deleted before the
+            # alias can be created, and queries fail until the alias exists, so that is never done silently
+            if not migrate_legacy_index:
+                print(f"Index '{self.index_name}' predates the alias, '{self.physical_index_name}' is built but not published. "
+                      f"Run python -m libs.aisearch_index {self.service_name} {self.index_name} {self.physical_index_name} "
+                      f"--migrate-legacy-index, or publish_index(migrate_legacy_index=True), in a quiet period to switch.")
+                return
+            migrate_to_alias(self.index_client, self.index_name, self.physical_index_name)
+        else:
+            create_alias(self.index_client, self.index_name, self.physical_index_name)
+        if self.live_index_name is not None:
+            self.index_client.delete_index(self.live_index_name)
+            print(f"Previous index '{self.live_index_name}' deleted.")
+        self.live_index_name = self.physical_index_name
+
+    def legacy_index_exists(self):
+        try:
+            self.index_client.get_index(self.index_name)
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    def document_key(self, *parts):
+        # deterministic keys, so a rebuilt document replaces its previous version instead of adding a copy
+        return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    def content_hash(self, document):
+        # everything the index stores except the vectors, plus the model the vectors come from
+        fields = {name: value for name, value in document.items() if not name.endswith("_vector") and name != "content_hash"}
+        return hashlib.sha256(json.dumps([self.embedding_model, fields], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def existing_documents(self, fields=("id", "content_hash")):
+        return {document["id"]: document for document in self.search_client.search(search_text="*", select=list(fields))
+                if document["id"] != INDEX_VERSION_KEY}
+
+    def content_version(self):
+        # a hash of every document's content hash: unchanged content keeps its version, any upsert or delete changes it
+        hashes = sorted((key, document.get("content_hash") or "") for key, document in self.existing_documents().items())
+        return hashlib.sha256(json.dumps(hashes).encode("utf-8")).hexdigest()
+
+    def publish_version(self):
+        # merge_or_upload leaves the index etag and, for updates, the document count as they were, so the
+        # semantic answer cache reads this document to tell that the content changed
+        version = self.content_version()
+        self.upload_batch([{"id": INDEX_VERSION_KEY, "content_hash": version}])
+        print(f"Index '{self.physical_index_name or self.index_name}' content version {version[:12]}.")
+        return version
+
+    def delete_documents(self, ids, batch_size=UPLOAD_BATCH_SIZE):
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            self.search_client.delete_documents(documents=[{"id": key} for key in ids[start:start + batch_size]])
+        return len(ids)
+
     #unenforced abstract method
     def populate_index(self, data):
         pass
 
     def generate_embeddings_oai(self, text):
-        return self.openai_client.embeddings.create(input=[text], model=self.embedding_model).data[0].embedding
+        return self.embed_texts([text])[0]
+
+    def generate_embeddings_batch_oai(self, texts):
+        for attempt in range(MAX_RETRIES):
+            try:
+                response = self.openai_client.embeddings.create(input=texts, model=self.embedding_model)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except RETRYABLE_OPENAI_ERRORS as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+                print(f"Embeddings request failed ({e}), retrying in {delay:.0f}s.")
+                time.sleep(delay)
+
+    def embed_texts(self, texts, batch_size=EMBEDDING_BATCH_SIZE, max_concurrency=EMBEDDING_CONCURRENCY):
+        # empty texts are rejected by the embeddings API, they get no vector
+        positions = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+        vectors = [None] * len(texts)
+        if self.embedding_store is not None:
+            for i, vector in zip(positions, self.embedding_store.get_many([texts[i] for i in positions])):
+                vectors[i] = vector
+            positions = [i for i in positions if vectors[i] is None]
+        batches = [[texts[i] for i in positions[start:start + batch_size]] for start in range(0, len(positions), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            embedded = [vector for batch in executor.map(self.generate_embeddings_batch_oai, batches) for vector in batch]
+        for i, vector in zip(positions, embedded):
+            vectors[i] = vector
+        if self.embedding_store is not None:
+            self.embedding_store.put_many([texts[i] for i in positions], embedded)
+        return vectors
+
+    def upload_batch(self, documents):
+        pending = documents
+        for attempt in range(MAX_RETRIES):
+            try:
+                results = self.search_client.merge_or_upload_documents(documents=pending)
+                failed = {result.key for result in results if not result.succeeded}
+            except (HttpResponseError, ServiceRequestError) as e:
+                failed = None
+                error = e
+            else:
+                if not failed:
+                    return
+                # only the documents the service rejected (throttled, 503...) are sent again
+                pending = [document for document in pending if document["id"] in failed]
+                error = f"{len(failed)} documents failed"
+            if attempt == MAX_RETRIES - 1:
+                raise RuntimeError(f"Upload to '{self.index_name}' failed after {MAX_RETRIES} attempts: {error}")
+            delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+            print(f"Upload batch to '{self.index_name}' failed ({error}), retrying in {delay:.0f}s.")
+            time.sleep(delay)
+
+    def report(self, counts):
+        print(f"Index '{self.index_name}': {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['skipped']} unchanged and skipped, {counts['deleted']} deleted.")
 
 
+if __name__ == "__main__":
+    # python -m libs.aisearch_index <service name> <index name> <built index name> --migrate-legacy-index
+    # replaces an index created before aliases were used with an alias over the index a build left unpublished
+    import argparse
+    from api.environment_variables import EnvironmentVariables
+    parser = argparse.ArgumentParser()
+    parser.add_argument("service_name")
+    parser.add_argument("index_name")
+    parser.add_argument("physical_index_name")
+    parser.add_argument("--migrate-legacy-index", action="store_true")
+    args = parser.parse_args()
+    if not args.migrate_legacy_index:
+        parser.error(f"'{args.index_name}' is unavailable for a few seconds during the switch, pass --migrate-legacy-index to go ahead")
+    credential = AzureKeyCredential(EnvironmentVariables.get_instance().azure_hrcopilot_search_api_key)
+    index_client = SearchIndexClient(endpoint=f"https://{args.service_name}.search.windows.net", credential=credential)
+    index_client.get_index(args.physical_index_name)
+    migrate_to_alias(index_client, args.index_name, args.physical_index_name)
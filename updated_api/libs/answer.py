@@ -6,12 +6,17 @@ class InfoType(Enum):
     STATE = "state"
     ZIPCODE = "zipcode"
 
-@dataclass
+@dataclass(slots=True)
 class Sources:
     reference_id: str
     title: str
     url: str
 
+    @classmethod
+    def from_document(cls, document):
+        metadata = document.metadata
+        return cls(reference_id=metadata.get('document_id'), title=metadata.get('title'), url=metadata.get('reference_link'))
+
 @dataclass
 class Answer:
     question: str
@@ -0,0 +1,67 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class CompiledAppCache:
+    """Process wide cache of compiled LangGraph apps, keyed by graph name."""
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(CompiledAppCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._apps = {}
+            self._lock = threading.Lock()
+            self._initialized = True
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def get_app(self, key, compile_app):
+        app = self._apps.get(key)
+        if app is not None:
+            return app
+        with self._lock:
+            # another request may have compiled the app while we were waiting on the lock
+            app = self._apps.get(key)
+            if app is None:
+                logger.info("Compiling graph app: %s", key)
+                app = compile_app()
+                self._apps[key] = app
+            return app
+
+    def warm_up(self, key, compile_app):
+        logger.info("Warming up graph app: %s", key)
+        app = self.get_app(key, compile_app)
+        try:
+            # touches the checkpointer so the first request does not pay for opening a pool connection
+            app.get_state({"configurable": {"thread_id": f"warm-up-{key}"}})
+        except Exception as e:
+            logger.warning("Warm up of graph app %s could not reach the checkpointer: %s", key, e)
+        return app
+
+    async def awarm_up(self, key, compile_app):
+        logger.info("Warming up async graph app: %s", key)
+        app = self.get_app(key, compile_app)
+        try:
+            await app.aget_state({"configurable": {"thread_id": f"warm-up-{key}"}})
+        except Exception as e:
+            logger.warning("Warm up of graph app %s could not reach the checkpointer: %s", key, e)
+        return app
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._apps.clear()
+            else:
+                self._apps.pop(key, None)
@@ -0,0 +1,161 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotModifiedError
+from azure.identity import DefaultAzureCredential
+from azure.storage.blob import BlobServiceClient
+from api.environment_variables import EnvironmentVariables
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+
+class BlobAssetCache:
+    """Parsed Blob Storage assets served from memory, backed by a local disk copy and revalidated by ETag in the background."""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(BlobAssetCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            logger.debug("Initializing BlobAssetCache instance")
+            self.blob_service_client = BlobServiceClient(account_url=env.account_url, credential=DefaultAzureCredential())
+            self.container_name = env.container_name
+            self.cache_dir = env.blob_cache_dir
+            self.refresh_seconds = env.blob_cache_refresh_seconds
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.assets = {}
+            self._load_lock = threading.Lock()
+            self._refresh_lock = threading.Lock()
+            self._refresh_stop = threading.Event()
+            self._refresh_thread = None
+            self._initialized = True
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None or not cls._instance._initialized:
+            with cls._lock:
+                if cls._instance is None or not cls._instance._initialized:
+                    cls._instance = cls()
+        return cls._instance
+
+    def get(self, name, blob_path, parse):
+        # parse receives the path of the local copy and returns the artifact the graphs use
+        asset = self.assets.get(name)
+        if asset is not None:
+            return asset["value"]
+        with self._load_lock:
+            if name not in self.assets:
+                self.load(name, blob_path, parse)
+                self.start_refresh()
+        return self.assets[name]["value"]
+
+    def load(self, name, blob_path, parse):
+        path, etag = self.local_path(name), self.read_etag(name)
+        if etag is not None and os.path.exists(path):
+            logger.debug("Loading %s from local copy %s (etag %s)", name, path, etag)
+            self.assets[name] = {"blob_path": blob_path, "parse": parse, "etag": etag, "value": parse(path)}
+            # the local copy may be from an earlier run, check it against Blob Storage without holding up the caller
+            threading.Thread(target=self.revalidate, args=(name,), name=f"blob-asset-revalidate-{name}", daemon=True).start()
+        else:
+            value, etag = self.fetch(name, blob_path, parse)
+            self.assets[name] = {"blob_path": blob_path, "parse": parse, "etag": etag, "value": value}
+
+    def refresh(self, name):
+        asset = self.assets[name]
+        try:
+            value, etag = self.fetch(name, asset["blob_path"], asset["parse"], asset["etag"])
+        except ResourceNotModifiedError:
+            logger.debug("%s not modified (etag %s)", name, asset["etag"])
+            return False
+        self.assets[name] = {**asset, "etag": etag, "value": value}
+        logger.info("Refreshed %s (etag %s)", name, etag)
+        return True
+
+    def fetch(self, name, blob_path, parse, etag=None):
+        # the download is parsed before it replaces the local copy and its etag, on disk as in memory: a copy
+        # that does not parse is dropped, and the old copy and etag stay as they were for the next start
+        temp_path, etag = self.download(name, blob_path, etag)
+        try:
+            value = parse(temp_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.install(name, temp_path, etag)
+        return value, etag
+
+    def install(self, name, temp_path, etag):
+        path = self.local_path(name)
+        # the old etag goes first: a crash part way leaves a copy without an etag, which load() downloads
+        # again, never an old etag next to a new copy
+        try:
+            os.remove(path + ".etag")
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+        self.write_etag(name, etag)
+
+    def revalidate(self, name):
+        try:
+            with self._refresh_lock:
+                self.refresh(name)
+        except Exception as e:
+            logger.warning("Could not refresh %s, serving the cached copy: %s", name, e)
+
+    def download(self, name, blob_path, etag=None):
+        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_path)
+        if etag is None:
+            downloader = blob_client.download_blob()
+        else:
+            # conditional GET, raises ResourceNotModifiedError on 304
+            downloader = blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+        # a temp file of its own, API workers and index builds may share the cache directory
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=os.path.basename(self.local_path(name)) + ".", suffix=".tmp", delete=False) as f:
+            try:
+                downloader.readinto(f)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        etag = downloader.properties.etag
+        logger.debug("Downloaded %s to %s (etag %s)", blob_path, f.name, etag)
+        return f.name, etag
+
+    def local_path(self, name):
+        return os.path.join(self.cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", name))
+
+    def read_etag(self, name):
+        try:
+            with open(self.local_path(name) + ".etag") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def write_etag(self, name, etag):
+        path = self.local_path(name) + ".etag"
+        with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False) as f:
+            f.write(etag)
+        os.replace(f.name, path)
+
+    def start_refresh(self):
+        if self._refresh_thread is not None:
+            return
+        def refresh_all():
+            while not self._refresh_stop.wait(self.refresh_seconds):
+                for name in list(self.assets):
+                    self.revalidate(name)
+        self._refresh_thread = threading.Thread(target=refresh_all, name="blob-asset-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_refresh(self):
+        self._refresh_stop.set()
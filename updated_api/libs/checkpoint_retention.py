@@ -0,0 +1,222 @@
+# Prunes the LangGraph checkpoint tables written by the PostgresSaver in input_graph.py and client_graph.py.
+# Runs in the background from the API lifespan when CHECKPOINT_RETENTION_ENABLED is true, or once with:
+#   python -m libs.checkpoint_retention [--exact-counts]
+import logging
+import threading
+import time
+import uuid
+from psycopg.errors import LockNotAvailable, QueryCanceled
+from api.environment_variables import EnvironmentVariables
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+from libs.db_connections import pool
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+
+# checkpoint ids are uuid6, so ordering by id orders a thread's checkpoints by time
+PRUNE_OLD_CHECKPOINTS = """
+WITH doomed AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+        SELECT thread_id, checkpoint_ns, checkpoint_id,
+               row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position
+        FROM checkpoints
+    ) ranked
+    WHERE position > %(keep_latest)s
+    LIMIT %(batch_size)s
+), deleted_writes AS (
+    DELETE FROM checkpoint_writes w USING doomed d
+    WHERE w.thread_id = d.thread_id AND w.checkpoint_ns = d.checkpoint_ns AND w.checkpoint_id = d.checkpoint_id
+)
+DELETE FROM checkpoints c USING doomed d
+WHERE c.thread_id = d.thread_id AND c.checkpoint_ns = d.checkpoint_ns AND c.checkpoint_id = d.checkpoint_id
+RETURNING c.thread_id
+"""
+
+# checkpoint ids are uuid6, so a thread is idle when it has no checkpoint id at or above the uuid6 of the
+# cutoff time; both lookups use the checkpoint id index created in setup() instead of parsing each
+# checkpoint's ts. The thread ids are returned, one row per expired thread
+EXPIRE_IDLE_THREADS = """
+WITH idle AS (
+    SELECT DISTINCT thread_id FROM checkpoints c
+    WHERE checkpoint_id < %(cutoff_id)s
+      AND NOT EXISTS (SELECT 1 FROM checkpoints n WHERE n.thread_id = c.thread_id AND n.checkpoint_id >= %(cutoff_id)s)
+    LIMIT %(batch_size)s
+), deleted_writes AS (
+    DELETE FROM checkpoint_writes WHERE thread_id IN (SELECT thread_id FROM idle)
+), deleted_blobs AS (
+    DELETE FROM checkpoint_blobs WHERE thread_id IN (SELECT thread_id FROM idle)
+), deleted_checkpoints AS (
+    DELETE FROM checkpoints WHERE thread_id IN (SELECT thread_id FROM idle)
+)
+SELECT thread_id FROM idle
+"""
+
+# CONCURRENTLY, so creating it on a large table does not block the checkpoint writes of running requests
+CREATE_CHECKPOINT_ID_INDEX = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS checkpoints_checkpoint_id_idx ON checkpoints (checkpoint_id)
+"""
+
+# blobs hold channel values by version, one is orphaned once no remaining checkpoint points at its version.
+# PostgresSaver.put writes a checkpoint's blobs before its checkpoints row, in separate autocommit
+# statements, so an unreferenced blob may belong to a checkpoint still being written. Versions only grow,
+# so a blob is only deleted once a checkpoint of its thread refers to a newer version of its channel; and
+# only threads the prune just trimmed are looked at, not the whole table
+DELETE_ORPHANED_BLOBS = """
+DELETE FROM checkpoint_blobs WHERE ctid IN (
+    SELECT b.ctid FROM checkpoint_blobs b
+    WHERE b.thread_id = ANY(%(thread_ids)s)
+      AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+          AND c.checkpoint->'channel_versions'->>b.channel = b.version
+      )
+      AND EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+          AND c.checkpoint->'channel_versions'->>b.channel > b.version
+      )
+    LIMIT %(batch_size)s
+)
+RETURNING thread_id
+"""
+
+# 100 ns intervals between the uuid epoch (1582-10-15) and the unix epoch
+UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_id_at(unix_seconds):
+    # the smallest uuid6 of that instant (clock sequence and node zero), laid out as langgraph's uuid6 does
+    timestamp = int(unix_seconds * 10**7) + UUID_EPOCH_OFFSET
+    value = ((timestamp >> 12) & 0xFFFFFFFFFFFF) << 80 | 0x6 << 76 | (timestamp & 0x0FFF) << 64 | 0x8 << 60
+    return str(uuid.UUID(int=value))
+
+
+TABLE_SIZES = """
+SELECT relname, n_live_tup, pg_total_relation_size(relid), pg_relation_size(relid), pg_indexes_size(relid)
+FROM pg_stat_user_tables WHERE relname = ANY(%(tables)s)
+"""
+
+
+class CheckpointRetention:
+    """Keeps the latest checkpoints per thread and expires idle threads, deleting in short batches and reporting table sizes."""
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(CheckpointRetention, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            logger.debug("Initializing CheckpointRetention instance")
+            self.keep_latest = env.checkpoint_keep_latest
+            self.ttl_seconds = env.checkpoint_thread_ttl_hours * 3600
+            self.batch_size = env.checkpoint_retention_batch_size
+            self.interval_seconds = env.checkpoint_retention_interval_seconds
+            self.lock_timeout_ms = env.checkpoint_retention_lock_timeout_ms
+            # pause between batches so request traffic gets the tables in between
+            self.batch_pause_seconds = 0.1
+            self._stop = threading.Event()
+            self._thread = None
+            self._initialized = True
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def setup(self, conn):
+        conn.execute(CREATE_CHECKPOINT_ID_INDEX)
+
+    def table_sizes(self, exact_counts=False):
+        # n_live_tup is the statistics collector's estimate, free to read; an exact count scans each table,
+        # which only the one off CLI run asks for
+        sizes = {}
+        with pool.connection() as conn:
+            for name, rows, total, table, indexes in conn.execute(TABLE_SIZES, {"tables": list(CHECKPOINT_TABLES)}).fetchall():
+                if exact_counts:
+                    rows = conn.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+                sizes[name] = {"rows": rows, "total_bytes": total, "table_bytes": table, "index_bytes": indexes,
+                               "bytes_per_row": table // rows if rows else 0}
+        return sizes
+
+    def vacuum(self):
+        # plain VACUUM takes no exclusive lock; it makes the deleted space reusable so the tables stop growing
+        with pool.connection() as conn:
+            conn.execute(f"VACUUM (ANALYZE) {', '.join(CHECKPOINT_TABLES)}")
+
+    def delete_in_batches(self, label, query, params):
+        # returns the number of rows the query returned (deleted rows, or expired threads) and their thread ids
+        deleted, threads = 0, set()
+        while not self._stop.is_set():
+            try:
+                with pool.connection() as conn, conn.transaction():
+                    # a batch gives up rather than queue behind a request holding the rows
+                    conn.execute(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}")
+                    rows = conn.execute(query, {**params, "batch_size": self.batch_size}).fetchall()
+            except (LockNotAvailable, QueryCanceled) as e:
+                logger.warning("Checkpoint retention %s stopped on a lock timeout, continuing next run: %s", label, e)
+                break
+            batch = len(rows)
+            deleted += batch
+            threads.update(thread_id for thread_id, in rows)
+            if batch < self.batch_size:
+                break
+            time.sleep(self.batch_pause_seconds)
+        logger.debug("Checkpoint retention %s deleted %d rows", label, deleted)
+        return deleted, threads
+
+    def run_once(self, exact_counts=False):
+        before = self.table_sizes(exact_counts)
+        logger.info("Checkpoint tables before retention: %s", before)
+        expired, _ = self.delete_in_batches("idle threads", EXPIRE_IDLE_THREADS, {"cutoff_id": checkpoint_id_at(time.time() - self.ttl_seconds)})
+        pruned, pruned_threads = self.delete_in_batches("old checkpoints", PRUNE_OLD_CHECKPOINTS, {"keep_latest": self.keep_latest})
+        # an expired thread's blobs went with it, only threads that lost old checkpoints can hold orphaned blobs
+        orphaned = 0
+        if pruned_threads:
+            orphaned, _ = self.delete_in_batches("orphaned blobs", DELETE_ORPHANED_BLOBS, {"thread_ids": sorted(pruned_threads)})
+        deleted = {"idle_threads": expired, "old_checkpoints": pruned, "orphaned_blobs": orphaned}
+        if any(deleted.values()):
+            self.vacuum()
+        after = self.table_sizes(exact_counts)
+        logger.info("Checkpoint retention deleted %s, tables after retention: %s", deleted, after)
+        return {"deleted": deleted, "before": before, "after": after}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        def run():
+            while not self._stop.wait(self.interval_seconds):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error("Checkpoint retention run failed: %s", e)
+        self._thread = threading.Thread(target=run, name="checkpoint-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exact-counts", action="store_true", help="count the rows of each table instead of using the statistics estimate")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    pool.open(wait=True)
+    try:
+        report = CheckpointRetention.get_instance().run_once(exact_counts=args.exact_counts)
+        for name in CHECKPOINT_TABLES:
+            before, after = report["before"].get(name, {}), report["after"].get(name, {})
+            print(f"{name:<18} rows {before.get('rows', 0):>10} -> {after.get('rows', 0):<10} "
+                  f"total {before.get('total_bytes', 0) / 2**20:9.1f} MB -> {after.get('total_bytes', 0) / 2**20:9.1f} MB")
+        print(f"deleted: {report['deleted']}")
+    finally:
+        pool.close()
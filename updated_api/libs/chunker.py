@@ -0,0 +1,126 @@
+import re
+from collections import deque
+import tiktoken
+
+# the tokenizer of the text-embedding-3 / ada-002 models the chunks are embedded with
+DEFAULT_ENCODING = "cl100k_base"
+# a text run without sentence punctuation (a table, a list flattened by the scraper) is cut once it gets this long
+MAX_SENTENCE_CHARS = 2000
+# a heading closes the current chunk only when that chunk already holds this share of max_tokens
+HEADING_BREAK_FILL = 0.25
+SENTENCE_END = re.compile(r"(?<=[.!?;:])[\"')\]]*\s+")
+HEADING_PATTERN = re.compile(
+    r"^(?:#{1,6}\s+\S.*"
+    r"|(?:§+|Sec\.|Section|SECTION|Article|ARTICLE|Chapter|CHAPTER|Part|PART|Subpart|SUBPART|Title|TITLE)\s*[\dIVXLC]+[\w.\-()]*(?:\s.{0,120})?"
+    r"|[A-Z][A-Z0-9 ,'&()\-]{2,80})$"
+)
+
+
+class TokenChunker:
+    """Splits text into chunks of at most max_tokens model tokens, on sentence ends, starting a new chunk at headings.
+
+    Each sentence is encoded once and the chunk size is a running sum, so a document is chunked in
+    O(n); consecutive chunks share up to overlap_tokens of trailing sentences. The input can be a
+    string or an iterable of strings (pages, lines) and chunks are yielded as soon as they are full.
+    """
+
+    def __init__(self, max_tokens=512, overlap_tokens=64, encoding=DEFAULT_ENCODING):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def is_heading(self, line):
+        return len(line) <= 160 and HEADING_PATTERN.match(line) is not None
+
+    def lines(self, pieces):
+        if isinstance(pieces, str):
+            pieces = (pieces,)
+        remainder = ""
+        for piece in pieces:
+            lines = (remainder + piece).split("\n")
+            remainder = lines.pop()
+            yield from lines
+        if remainder:
+            yield remainder
+
+    def segments(self, pieces):
+        # yields (text, is_heading); sentences may span wrapped lines, a blank line or heading ends a paragraph
+        buffer = ""
+        for line in self.lines(pieces):
+            line = line.strip()
+            if not line or self.is_heading(line):
+                if buffer:
+                    yield buffer, False
+                    buffer = ""
+                if line:
+                    yield line, True
+                continue
+            buffer = f"{buffer} {line}" if buffer else line
+            # only the unfinished sentence at the end of the buffer is carried to the next line
+            start = 0
+            for match in SENTENCE_END.finditer(buffer):
+                yield buffer[start:match.start()].strip(), False
+                start = match.end()
+            buffer = buffer[start:]
+            while len(buffer) > MAX_SENTENCE_CHARS:
+                cut = buffer.rfind(" ", 0, MAX_SENTENCE_CHARS)
+                cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+                yield buffer[:cut], False
+                buffer = buffer[cut:].lstrip()
+        if buffer:
+            yield buffer, False
+
+    def split_long(self, tokens):
+        # a single sentence over max_tokens is cut into token windows
+        step = self.max_tokens - self.overlap_tokens
+        for start in range(0, len(tokens), step):
+            yield self.encoding.decode(tokens[start:start + self.max_tokens])
+            if start + self.max_tokens >= len(tokens):
+                break
+
+    def iter_chunks(self, pieces):
+        current = deque()
+        current_tokens = 0
+        fresh = 0  # sentences in current not carried over from the previous chunk
+        for text, heading in self.segments(pieces):
+            if not text:
+                continue
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if heading and current_tokens >= self.max_tokens * HEADING_BREAK_FILL:
+                if fresh:
+                    yield " ".join(sentence for sentence, _ in current)
+                # a new section starts without overlap from the previous one
+                current.clear()
+                current_tokens = fresh = 0
+            if len(tokens) > self.max_tokens:
+                if fresh:
+                    yield " ".join(sentence for sentence, _ in current)
+                yield from self.split_long(tokens)
+                current.clear()
+                current_tokens = fresh = 0
+                continue
+            if current_tokens + len(tokens) > self.max_tokens:
+                if fresh:
+                    yield " ".join(sentence for sentence, _ in current)
+                # keep trailing sentences as overlap; each chunk drops from the left only, so the total work stays linear
+                overlap = 0
+                for sentence, count in reversed(current):
+                    if overlap + count > self.overlap_tokens:
+                        break
+                    overlap += count
+                while current_tokens > overlap or current_tokens + len(tokens) > self.max_tokens:
+                    current_tokens -= current.popleft()[1]
+                fresh = 0
+            current.append((text, len(tokens)))
+            current_tokens += len(tokens)
+            fresh += 1
+        if fresh:
+            yield " ".join(sentence for sentence, _ in current)
+
+    def chunk(self, pieces):
+        return list(self.iter_chunks(pieces))
@@ -0,0 +1,94 @@
+import logging
+from typing import NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# rows parsed per chunk while the demographics CSV is streamed in from the local blob copy
+CSV_CHUNK_ROWS = 100_000
+DEMOGRAPHIC_COLUMNS = ["CltNbr", "LegalState", "NAICSLevel01", "CltName"]
+
+
+class ClientRecord(NamedTuple):
+    client_state: Optional[str]
+    client_industry: Optional[str]
+    client_name: Optional[str]
+
+
+class ClientDirectory:
+    """Client demographics keyed by CltNbr, with states and industries stored as categorical codes."""
+
+    def __init__(self, client_ids, states, industries, names):
+        # client numbers are normally fixed width digit strings, those are kept as an int64 index instead of one str per row
+        widths = np.fromiter(map(len, client_ids), dtype=np.int64, count=len(client_ids))
+        self.key_width = None
+        if len(client_ids) and widths.min() == widths.max() <= 18:
+            joined = "".join(client_ids)
+            if joined.isascii() and joined.isdigit():
+                self.key_width = int(widths[0])
+                client_ids = client_ids.astype(np.int64)
+        # a hash based index gives O(1) lookups without a Python int object per row, as a dict would need
+        self.client_index = pd.Index(client_ids)
+        if not self.client_index.is_unique:
+            # on duplicate client numbers the first row wins, as the DataFrame filter with iloc[0] did
+            first = ~self.client_index.duplicated()
+            self.client_index, states, industries, names = self.client_index[first], states[first], industries[first], names[first]
+        self.state_codes = states.codes
+        self.state_categories = states.categories.to_numpy()
+        self.industry_codes = industries.codes
+        self.industry_categories = industries.categories.to_numpy()
+        self.names = names
+
+    @classmethod
+    def from_csv(cls, source, chunksize=CSV_CHUNK_ROWS):
+        client_ids, states, industries, names = [], [], [], []
+        dropped = 0
+        dtypes = {"CltNbr": str, "LegalState": "category", "NAICSLevel01": "category", "CltName": str}
+        for chunk in pd.read_csv(source, usecols=DEMOGRAPHIC_COLUMNS, dtype=dtypes, chunksize=chunksize, encoding="utf-8"):
+            # a row without a client number can never be looked up, and would break the index below
+            ids = chunk["CltNbr"].str.strip()
+            valid = ids.notna() & (ids != "")
+            if not valid.all():
+                dropped += int((~valid).sum())
+                chunk, ids = chunk[valid], ids[valid]
+            client_ids.append(ids.to_numpy(dtype=object))
+            states.append(chunk["LegalState"].array)
+            industries.append(chunk["NAICSLevel01"].array)
+            names.append(chunk["CltName"].to_numpy(dtype=object))
+        if not client_ids:
+            empty = pd.Categorical([])
+            return cls(np.empty(0, dtype=object), empty, empty, np.empty(0, dtype=object))
+        directory = cls(np.concatenate(client_ids), union_categoricals(states), union_categoricals(industries), np.concatenate(names))
+        if dropped:
+            logger.warning("Skipped %d client demographics rows without a CltNbr", dropped)
+        logger.debug("Loaded %d clients into the client directory", len(directory))
+        return directory
+
+    def key(self, client_id):
+        if self.key_width is None:
+            return client_id
+        if len(client_id) == self.key_width and client_id.isascii() and client_id.isdigit():
+            return int(client_id)
+        return None
+
+    def __contains__(self, client_id):
+        key = self.key(client_id)
+        return key is not None and key in self.client_index
+
+    def __len__(self):
+        return len(self.client_index)
+
+    def get(self, client_id):
+        key = self.key(client_id)
+        if key is None or key not in self.client_index:
+            return None
+        row = self.client_index.get_loc(key)
+        return ClientRecord(self.category(self.state_categories, self.state_codes[row]),
+                            self.category(self.industry_categories, self.industry_codes[row]),
+                            self.names[row] if isinstance(self.names[row], str) else None)
+
+    def category(self, categories, code):
+        return None if code < 0 else categories[code]
@@ -1,4 +1,6 @@
 import os
+import asyncio
+import threading
 import logging
 import json
 from dotenv import load_dotenv
@@ -24,9 +26,16 @@ from langsmith import Client
 import pandas as pd
 from langchain_core.prompts import ChatPromptTemplate
 from libs.models import GraphState, User_Input
-from libs.uitls import map_response, map_client_id_response, data_sources_mapping, create_dataset
+from libs.uitls import map_response, map_client_id_response, source_fields, create_dataset, read_docx_paragraphs
+from libs.blob_cache import BlobAssetCache
 from langgraph.checkpoint.postgres import PostgresSaver
-from libs.db_connections import pool
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from libs.db_connections import pool, async_pool
+from libs.app_cache import CompiledAppCache
+from libs.components import ComponentRegistry
+from libs.semantic_cache import SemanticAnswerCache
+from libs.client_directory import ClientDirectory
+from libs.streaming import stream_frame
 from docx import Document
 from io import BytesIO
 
@@ -39,11 +48,12 @@ load_dotenv()
 env = EnvironmentVariables.get_instance()
 
 memory = PostgresSaver(pool)
-
-memory.setup()
+# same checkpoint tables as memory, used by the async request path
+async_memory = AsyncPostgresSaver(async_pool)
 
 class ClientGraph:
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -57,12 +67,16 @@ class ClientGraph:
             self.load_environment_variables()
             self.initialize_llm()
             self.load_client_demographics()
+            self.read_job_description_sample()
             self._initialized = True
             
     @classmethod
     def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = cls()
+        # requests build the graph in worker threads, the lock keeps two first requests from both building it
+        if cls._instance is None or not cls._instance._initialized:
+            with cls._lock:
+                if cls._instance is None or not cls._instance._initialized:
+                    cls._instance = cls()
         return cls._instance
 
     def load_environment_variables(self):
@@ -85,27 +99,31 @@ class ClientGraph:
 
     def initialize_llm(self):
         logger.debug("Initializing LLM")
+        components = ComponentRegistry.get_instance()
         self.llm = AzureChatOpenAI(
             temperature=0.0,
             deployment_name=self.openai_gpt_4o_model_name,
             azure_endpoint=self.openai_api_endpoint,
-            api_key=self.openai_api_key
+            api_key=self.openai_api_key,
+            http_client=components.http_client,
+            http_async_client=components.async_http_client
         )
         logger.debug("LLM initialized")
 
     def load_client_demographics(self):
         logger.debug("Loading client demographics")
-        blob_service_client = BlobServiceClient(account_url=self.account_url, credential=self.credential)
-        blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=self.blob_path)
-        blob_data = blob_client.download_blob().readall().decode('utf-8')
-        self.client_demographics = pd.read_csv(StringIO(blob_data))
-        #print(self.client_demographics.CltNbr.to_list())
-        logger.debug("Client demographics loaded")
+        BlobAssetCache.get_instance().get("client_demographics", self.blob_path, ClientDirectory.from_csv)
+        logger.debug("Client demographics loaded: %d clients", len(self.client_directory))
+
+    @property
+    def client_directory(self):
+        # served from memory, the blob cache swaps in a new directory when the blob changes
+        return BlobAssetCache.get_instance().get("client_demographics", self.blob_path, ClientDirectory.from_csv)
 
     def verify_client_id(self, state):
         client_id = state.get('client_id', '').strip()
         logger.debug("Verifying client ID: %s", client_id)
-        if client_id in self.client_demographics.CltNbr.to_list():
+        if client_id in self.client_directory:
             return {"client_id": client_id}
         else:
             return {"client_id": 'Not Found'}
@@ -114,25 +132,27 @@ class ClientGraph:
         logger.debug("Getting client ID")
         return {"human_ask": "Hello! The client id you provided cannot be found. Can you double check and input the correct client id?"}
 
+    def classify_prompt(self, question):
+        return f"classify intent of given input question in specific to one of the following categories: {self.categories}. Output just the category it fits or None if it fits none of the categories. Input: {question}"
+
     def classify(self, question):
         logger.debug("Classifying question: %s", question)
-        response = self.llm(f"classify intent of given input question in specific to one of the following categories: {self.categories}. Output just the category it fits or None if it fits none of the categories. Input: {question}")
+        response = self.llm(self.classify_prompt(question))
+        logger.debug("Classification result: %s", response.content.strip())
+        return response.content.strip()
+
+    async def aclassify(self, question):
+        logger.debug("Classifying question: %s", question)
+        response = await self.llm.ainvoke(self.classify_prompt(question))
         logger.debug("Classification result: %s", response.content.strip())
         return response.content.strip()
     
     def read_job_description_sample(self):
-        blob_service_client = BlobServiceClient(account_url=self.account_url, credential=self.credential)
-        blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=self.job_description_sample_blob_path)
-        blob_data = blob_client.download_blob().readall()
-        doc = Document(BytesIO(blob_data))
-        example=[]
-        for paragraph in doc.paragraphs:
-            example.append(paragraph.text)
-        return example
+        return BlobAssetCache.get_instance().get("job_description_sample", self.job_description_sample_blob_path, read_docx_paragraphs)
         
 
     
-    def produce_job_description(self,state):
+    def job_description_prompt(self, state, example):
         if state.get('job_title', '').strip()!='':
             input=state.get('question', '').strip() + " " + state.get('job_title', '').strip()
         else:
@@ -145,18 +165,23 @@ class ClientGraph:
         if state.get('client_name', '').strip()!='':
             input=input+ " client name: " + state.get('client_name', '').strip()
         print(input)
-      
+        return f"Produce a detailed job description using the job title and primary duties and client demographics provided in the input. Produce the job description if valid job titles or positions are found in the input. if not ask for the job title or position. Use the format and structure of the example: {example} ,Input:{input}"
+
+    def produce_job_description(self,state):
         example=self.read_job_description_sample()
-        response = self.llm.invoke(f"Produce a detailed job description using the job title and primary duties and client demographics provided in the input. Produce the job description if valid job titles or positions are found in the input. if not ask for the job title or position. Use the format and structure of the example: {example} ,Input:{input}")
+        response = self.llm.invoke(self.job_description_prompt(state, example))
+        return {"response": response.content.strip()}
+
+    async def aproduce_job_description(self, state):
+        example = self.read_job_description_sample()
+        response = await self.llm.ainvoke(self.job_description_prompt(state, example))
         return {"response": response.content.strip()}
 
     def extract_client_dem(self, state):
         question = state.get('question', '').strip()
         client_id = state.get('client_id', '').strip()
         logger.debug("Extracting client demographics for client ID: %s", client_id)
-        client_state = self.client_demographics[self.client_demographics['CltNbr'] == client_id]['LegalState'].iloc[0]
-        client_industry = self.client_demographics[self.client_demographics['CltNbr'] == client_id]['NAICSLevel01'].iloc[0]
-        client_name = self.client_demographics[self.client_demographics['CltNbr'] == client_id]['CltName'].iloc[0]
+        client_state, client_industry, client_name = self.client_directory.get(client_id)
         logger.debug("Extracted client state: %s, client industry: %s", client_state, client_industry)
         return {"client_state": client_state, "client_industry": client_industry,"client_name": client_name}
 
@@ -167,28 +192,74 @@ class ClientGraph:
         logger.debug("Input node classification result: %s", classification)
         return {"classification": classification}
 
+    async def aclassify_input_node(self, state):
+        question = state.get('question', '').strip()
+        logger.debug("Classifying input node for question: %s", question)
+        classification = await self.aclassify(question)
+        logger.debug("Input node classification result: %s", classification)
+        return {"classification": classification}
+
     def initial_greeting(self, *args, **kwargs):
         response = f"Hello! I am an HR AI Assistant. I can only answer questions about: {self.categories} for now but I am still learning."
         logger.debug("Initial greeting response: %s", response)
         return {"response": response}
 
+    def rag_query(self, state):
+        return state.get('question', '').strip() + " Client State: " + state.get('client_state', '').strip() + " Client Industry: " + state.get('client_industry', '').strip()
+
     def handle_RAG_human_input(self, state):
-        query = state.get('question', '').strip() + " Client State: " + state.get('client_state', '').strip() + " Client Industry: " + state.get('client_industry', '').strip()
+        query = self.rag_query(state)
         logger.debug("Handling RAG with human input for query: %s", query)
-        retriever = CustomRetriever(nr_top_docs=3, retrieval_type='all').get_retriever()
-        hr_general_prompt = general_hr_prompt()
-        hrcoplilot = hrbot(hr_general_prompt)
-        response = hrcoplilot.get_answer(query, retriever)
+        components = ComponentRegistry.get_instance()
+        response = components.hrbot.get_answer(query, components.retriever)
         logger.debug("RAG response: %s", response)
+        answer = self.map_rag_response(state, response)
+        # the retriever already embedded this query, so the vector comes from the query embedding cache
+        SemanticAnswerCache.get_instance().store(components.query_embedder.generate_embeddings(query), state, {**answer, "source_metadata_id": state['source_metadata_id']})
+        return answer
 
+    async def ahandle_RAG_human_input(self, state):
+        query = self.rag_query(state)
+        logger.debug("Handling RAG with human input for query: %s", query)
+        components = ComponentRegistry.get_instance()
+        response = await components.hrbot.aget_answer(query, components.retriever)
+        logger.debug("RAG response: %s", response)
+        answer = self.map_rag_response(state, response)
+        SemanticAnswerCache.get_instance().store(await components.query_embedder.agenerate_embeddings(query), state, {**answer, "source_metadata_id": state['source_metadata_id']})
+        return answer
+
+    def lookup_answer_cache(self, state):
+        answer_cache = SemanticAnswerCache.get_instance()
+        if not answer_cache.enabled:
+            return {"answer_cache_hit": False}
+        vector = ComponentRegistry.get_instance().query_embedder.generate_embeddings(self.rag_query(state))
+        cached = answer_cache.lookup(vector, state)
+        return {"answer_cache_hit": False} if cached is None else {**cached, "answer_cache_hit": True}
+
+    async def alookup_answer_cache(self, state):
+        answer_cache = SemanticAnswerCache.get_instance()
+        if not answer_cache.enabled:
+            return {"answer_cache_hit": False}
+        vector = await ComponentRegistry.get_instance().query_embedder.agenerate_embeddings(self.rag_query(state))
+        cached = answer_cache.lookup(vector, state)
+        return {"answer_cache_hit": False} if cached is None else {**cached, "answer_cache_hit": True}
+
+    def answer_cache_route(self, state):
+        # a cached answer ends the turn without retrieval or an LLM call
+        next_node = END if state.get('answer_cache_hit') else "handle_RAG_human_input"
+        logger.debug(f"Next node: {next_node}")
+        return next_node
 
-        sources = data_sources_mapping(response[1])
-        state['source_title'] = [source.title for source in sources]
-        state['source_metadata_id'] = [source.reference_id for source in sources]
-        state['source_url'] = [source.url for source in sources]
+    def map_rag_response(self, state, response):
+        sources = source_fields(response[1])
+        state.update(sources)
         logger.debug(f"RAG response with human input sources: {response[1]}")
-        return {"response": response[0],"sources":response[1],"source_title":state['source_title'],"source_url":state['source_url']}
+        return {"response": response[0], **sources}
     
+    def join_input(self, state):
+        logger.debug("Joining classification and demographics branches")
+        return {}
+
     def classify_knowledge_tool(self, state):
         classification = state.get('classification', '').strip()
         return {"classification": classification}
@@ -197,9 +268,9 @@ class ClientGraph:
     def decide_next_node(self, state):
         logger.debug(f"Deciding next node for state: {state}")
         if state.get('classification') in self.categories_list:
-            next_node = "extract_client_dem"
+            next_node = "classify_knowledge_tool"
         elif state.get('classification') in self.tools_list:
-            next_node = "extract_client_dem"
+            next_node = "classify_knowledge_tool"
         else:
             next_node = "initial_greeting"
         logger.debug(f"Next node: {next_node}")
@@ -207,7 +278,8 @@ class ClientGraph:
 
     def check_client_id_validity(self, state):
         logger.debug("Checking client ID validity for state: %s", state)
-        next_node = "get_client_id" if state.get('client_id') == 'Not Found' else "classify_input"
+        # classification and the demographics lookup are independent, so a valid client fans out to both
+        next_node = "get_client_id" if state.get('client_id') == 'Not Found' else ["classify_input", "extract_client_dem"]
         logger.debug(f"Next node: {next_node}")
         return next_node
     
@@ -220,27 +292,34 @@ class ClientGraph:
         return next_node
         
 
-    def build_graph(self):
-        logger.debug("Building graph")
+    def build_graph(self, asynchronous=False):
+        logger.debug("Building graph, asynchronous: %s", asynchronous)
+
+        def node(sync_node, async_node):
+            # nodes doing I/O have async variants so the async app never blocks the event loop
+            return async_node if asynchronous else sync_node
+
         workflow = StateGraph(GraphState)
-        workflow.add_node("classify_input", self.classify_input_node)
+        workflow.add_node("classify_input", node(self.classify_input_node, self.aclassify_input_node))
         workflow.add_node("extract_client_dem", self.extract_client_dem)
         workflow.add_node("verify_client_id", self.verify_client_id)
         workflow.add_node("get_client_id", self.get_client_id)
         workflow.add_node("initial_greeting", self.initial_greeting)
+        workflow.add_node("join_input", self.join_input)
         workflow.add_node("classify_knowledge_tool", self.classify_knowledge_tool)
         
-        workflow.add_node("handle_RAG_human_input", self.handle_RAG_human_input)
-        workflow.add_node("produce_job_description", self.produce_job_description)
+        workflow.add_node("lookup_answer_cache", node(self.lookup_answer_cache, self.alookup_answer_cache))
+        workflow.add_node("handle_RAG_human_input", node(self.handle_RAG_human_input, self.ahandle_RAG_human_input))
+        workflow.add_node("produce_job_description", node(self.produce_job_description, self.aproduce_job_description))
         workflow.set_entry_point("verify_client_id")
-        workflow.add_edge("extract_client_dem", "classify_knowledge_tool")
+        workflow.add_edge(["classify_input", "extract_client_dem"], "join_input")
         workflow.add_edge('handle_RAG_human_input', END)
         workflow.add_edge('produce_job_description', END)
         workflow.add_conditional_edges(
-            "classify_input",
+            "join_input",
             self.decide_next_node,
             {
-                "extract_client_dem": "extract_client_dem",
+                "classify_knowledge_tool": "classify_knowledge_tool",
                 "initial_greeting": "initial_greeting",
             }
         )
@@ -249,28 +328,48 @@ class ClientGraph:
             "classify_knowledge_tool",
             self.tool_knowledge_node,
             {
-                "handle_RAG_human_input": "handle_RAG_human_input",
+                "handle_RAG_human_input": "lookup_answer_cache",
                 "produce_job_description": "produce_job_description"
             }
         )
+        workflow.add_conditional_edges(
+            "lookup_answer_cache",
+            self.answer_cache_route,
+            {
+                END: END,
+                "handle_RAG_human_input": "handle_RAG_human_input"
+            }
+        )
         workflow.add_conditional_edges(
             "verify_client_id",
             self.check_client_id_validity,
             {
                 "get_client_id": "get_client_id",
-                "classify_input": "classify_input"
+                "classify_input": "classify_input",
+                "extract_client_dem": "extract_client_dem"
             }
         )
         logger.debug("Graph built successfully")
         return workflow
 
-    def initiate_graph(self):
+    def initiate_graph(self, asynchronous=False):
         logger.debug("Initiating graph")
-        workflow = self.build_graph()
-        app = workflow.compile(checkpointer=memory)
+        workflow = self.build_graph(asynchronous)
+        app = workflow.compile(checkpointer=async_memory if asynchronous else memory)
         logger.debug("Graph initiated successfully")
         return app
 
+    def get_app(self, asynchronous=False):
+        if asynchronous:
+            return CompiledAppCache.get_instance().get_app("client_graph_async", lambda: self.initiate_graph(asynchronous=True))
+        return CompiledAppCache.get_instance().get_app("client_graph", self.initiate_graph)
+
+    def warm_up(self):
+        return CompiledAppCache.get_instance().warm_up("client_graph", self.initiate_graph)
+
+    async def awarm_up(self):
+        return await CompiledAppCache.get_instance().awarm_up("client_graph_async", lambda: self.initiate_graph(asynchronous=True))
+
     def get_answer(self, query, user_answer, thread_id,client_state=None,client_industry=None,client_id=None):
         logger.info("Getting answer for query: %s", query)
         # input_graph = InputGraph.get_instance()
@@ -281,7 +380,7 @@ class ClientGraph:
 
         run_id = uuid.uuid4()
 
-        app = self.initiate_graph()
+        app = self.get_app()
 
         config = {"configurable": {"thread_id": thread_id}, "run_id": run_id, "metadata": {"user_id": "user name"}}
         logger.debug("Config: %s", config)
@@ -328,4 +427,81 @@ class ClientGraph:
             return answer
         except Exception as e:
             logger.error("Error getting answer: %s", e)
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    async def aprepare_turn(self, app, config, query, user_answer, client_state=None, client_industry=None, client_id=None):
+        # returns the graph input and breakpoint for this turn, shared by aget_answer and astream_answer
+        if user_answer == "":
+            current_state = await app.aget_state(config)
+            logger.debug("client_state: %s", client_state)
+            logger.debug("client_industry: %s", client_industry)
+            if(current_state.metadata):
+                logger.debug("Update state to clear response from previous interation")
+                await app.aupdate_state(config=config, values={"response": None,"source_title":None,"source_metadata_id":None,"source_url":None})
+            await app.aupdate_state(config, {"client_id": client_id})
+            logger.debug("updated state with client id %s",client_id)
+            return {"question": query, 'length': 0}, "check_client_id_validity"
+        logger.debug("Updating state to process humer input %s",user_answer)
+        await app.aupdate_state(config=config, values={"human_input": user_answer})
+        logger.debug("Getting answer to the question")
+        return None, "check_user_input"
+
+    async def aget_answer(self, query, user_answer, thread_id, client_state=None, client_industry=None, client_id=None):
+        logger.info("Getting answer asynchronously for query: %s", query)
+
+        run_id = uuid.uuid4()
+
+        app = self.get_app(asynchronous=True)
+
+        config = {"configurable": {"thread_id": thread_id}, "run_id": run_id, "metadata": {"user_id": "user name"}}
+        logger.debug("Config: %s", config)
+
+        try:
+            graph_input, breakpoint = await self.aprepare_turn(app, config, query, user_answer, client_state, client_industry, client_id)
+            with tracing_v2_enabled():
+                response = await app.ainvoke(graph_input, config=config, interrupt_before=[breakpoint])
+
+            logger.debug("Response: %s", response)
+
+            answer = map_response(response, query, thread_id, run_id)
+            logger.debug("Answer: %s", answer)
+
+            logger.debug("Writing to dataset: %s", answer)
+            create_dataset(answer)
+
+            return answer
+        except Exception as e:
+            logger.error("Error getting answer: %s", e)
+            return {"error": str(e)}
+
+    async def astream_answer(self, query, user_answer, thread_id, client_state=None, client_industry=None, client_id=None):
+        logger.info("Streaming answer for query: %s", query)
+
+        run_id = uuid.uuid4()
+
+        app = self.get_app(asynchronous=True)
+
+        config = {"configurable": {"thread_id": thread_id}, "run_id": run_id, "metadata": {"user_id": "user name"}}
+        logger.debug("Config: %s", config)
+
+        try:
+            graph_input, breakpoint = await self.aprepare_turn(app, config, query, user_answer, client_state, client_industry, client_id)
+            with tracing_v2_enabled():
+                async for event in app.astream_events(graph_input, config=config, interrupt_before=[breakpoint], version="v2"):
+                    frame = stream_frame(event)
+                    if frame:
+                        yield frame
+
+            response = (await app.aget_state(config)).values
+            logger.debug("Response: %s", response)
+
+            answer = map_response(response, query, thread_id, run_id)
+            logger.debug("Answer: %s", answer)
+
+            logger.debug("Writing to dataset: %s", answer)
+            create_dataset(answer)
+
+            yield {"type": "answer", "response": answer}
+        except Exception as e:
+            logger.error("Error streaming answer: %s", e)
+            yield {"type": "error", "error": str(e)}
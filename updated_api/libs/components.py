@@ -0,0 +1,64 @@
+import logging
+import threading
+import httpx
+from libs.embedder import EmbeddingModel
+from libs.hrbot import hrbot
+from libs.retriever import CustomRetriever, QueryEmbeddingCache
+from libs.context_packer import ContextPacker, PackedRetriever
+from api.environment_variables import EnvironmentVariables
+from prompts.prompt_templates import general_hr_prompt
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+# Connection pool limits shared by every Azure OpenAI client in the process
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_TIMEOUT_SECONDS = 120.0
+
+
+class ComponentRegistry:
+    """Builds the retriever, embedder and hrbot once per process and shares them across graph turns."""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(ComponentRegistry, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            logger.debug("Initializing ComponentRegistry instance")
+            limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS)
+            self.http_client = httpx.Client(limits=limits, timeout=HTTP_TIMEOUT_SECONDS)
+            self.async_http_client = httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT_SECONDS)
+            self.embedder = EmbeddingModel(type='openai', http_client=self.http_client, async_http_client=self.async_http_client)
+            # both retrievers embed the same query, the cache makes that a single embedding call
+            self.query_embedder = QueryEmbeddingCache(self.embedder, maxsize=env.query_embedding_cache_size, ttl_seconds=env.query_embedding_cache_ttl_seconds)
+            self.retriever = CustomRetriever(nr_top_docs=3, retrieval_type='all', embedder=self.query_embedder,
+                                             index_timeout_seconds=env.index_search_timeout_seconds).get_retriever()
+            if env.context_packing_enabled:
+                # the stuff chain gets a deduplicated, token budgeted context instead of every document in full
+                self.context_packer = ContextPacker()
+                self.retriever = PackedRetriever(retriever=self.retriever, packer=self.context_packer)
+            self.hrbot = hrbot(general_hr_prompt(), http_client=self.http_client, async_http_client=self.async_http_client)
+            self._initialized = True
+            logger.debug("ComponentRegistry initialized")
+
+    @classmethod
+    def get_instance(cls):
+        # graph nodes may run on several threads at once, only one of them should build the components
+        if cls._instance is None or not cls._instance._initialized:
+            with cls._lock:
+                if cls._instance is None or not cls._instance._initialized:
+                    cls._instance = cls()
+        return cls._instance
+
+    async def aclose(self):
+        logger.debug("Closing shared HTTP clients")
+        self.http_client.close()
+        await self.async_http_client.aclose()
@@ -0,0 +1,147 @@
+import logging
+import re
+import threading
+from typing import Any
+import tiktoken
+from langchain.docstore.document import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from api.environment_variables import EnvironmentVariables
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+# passages longer than this are cut at sentence ends before they are scored against the query
+PASSAGE_TOKENS = 160
+# a document that does not fit the remaining budget is trimmed into it, unless less than this is left
+MIN_TRIMMED_TOKENS = 80
+SHINGLE_WORDS = 5
+STOPWORDS = {"the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "her", "was", "one", "our", "out", "has",
+             "have", "what", "does", "with", "this", "that", "from", "they", "will", "would", "there", "their", "about",
+             "which", "when", "how", "who", "client", "state", "industry", "need", "must", "should", "under", "into"}
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+")
+
+
+class ContextPacker:
+    """Fits retrieved documents into a token budget: near duplicates dropped, long documents trimmed to the passages closest to the query."""
+
+    def __init__(self, budget_tokens=None, max_document_tokens=None, duplicate_threshold=None, encoding=None):
+        self.budget_tokens = budget_tokens or env.context_token_budget
+        self.max_document_tokens = max_document_tokens or env.context_max_document_tokens
+        self.duplicate_threshold = env.context_duplicate_threshold if duplicate_threshold is None else duplicate_threshold
+        self.encoding = tiktoken.get_encoding(encoding or env.context_token_encoding)
+        self.turns = 0
+        self.tokens_retrieved = 0
+        self.tokens_packed = 0
+        self._lock = threading.Lock()
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def shingles(self, text):
+        words = WORD_PATTERN.findall(text.lower())
+        return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+
+    def is_duplicate(self, shingles, kept):
+        for other in kept:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= self.duplicate_threshold:
+                return True
+        return False
+
+    def passages(self, text):
+        passages = []
+        for paragraph in PARAGRAPH_PATTERN.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if self.count_tokens(paragraph) <= PASSAGE_TOKENS:
+                passages.append(paragraph)
+                continue
+            current, current_tokens = [], 0
+            for sentence in SENTENCE_PATTERN.split(paragraph):
+                tokens = self.count_tokens(sentence)
+                if current and current_tokens + tokens > PASSAGE_TOKENS:
+                    passages.append(" ".join(current))
+                    current, current_tokens = [], 0
+                current.append(sentence)
+                current_tokens += tokens
+            if current:
+                passages.append(" ".join(current))
+        return passages
+
+    def trim(self, text, query_terms, budget):
+        # the passages sharing the most query terms are kept, in the order they appear in the document
+        passages = self.passages(text)
+        overlap = [len(query_terms & set(WORD_PATTERN.findall(passage.lower()))) for passage in passages]
+        scored = sorted(range(len(passages)), key=lambda i: (-overlap[i], i))
+        kept, used = [], 0
+        for i in scored:
+            if kept and not overlap[i]:
+                # passages sharing nothing with the query are only kept when nothing else matched
+                break
+            tokens = self.count_tokens(passages[i])
+            if used + tokens <= budget:
+                kept.append(i)
+                used += tokens
+        if not kept:
+            # a single passage over budget is cut at the token level
+            return self.encoding.decode(self.encoding.encode(passages[scored[0]], disallowed_special=())[:budget]) if passages else ""
+        return "\n...\n".join(passages[i] for i in sorted(kept))
+
+    def pack(self, query, documents):
+        # documents arrive ranked (reciprocal rank fusion), so a later near duplicate is the one dropped
+        query_terms = {word for word in WORD_PATTERN.findall(query.lower()) if len(word) > 2 and word not in STOPWORDS}
+        packed, kept_shingles, used = [], [], 0
+        report = {"documents": len(documents), "duplicates": 0, "trimmed": 0, "over_budget": 0}
+        tokens_retrieved = 0
+        for document in documents:
+            content = document.page_content or ""
+            tokens = self.count_tokens(content)
+            tokens_retrieved += tokens
+            shingles = self.shingles(content)
+            if self.is_duplicate(shingles, kept_shingles):
+                report["duplicates"] += 1
+                continue
+            remaining = self.budget_tokens - used
+            budget = min(self.max_document_tokens, remaining)
+            if tokens > budget:
+                if remaining < MIN_TRIMMED_TOKENS and packed:
+                    report["over_budget"] += 1
+                    continue
+                content = self.trim(content, query_terms, budget)
+                tokens = self.count_tokens(content)
+                report["trimmed"] += 1
+            kept_shingles.append(shingles)
+            packed.append(Document(page_content=content, metadata=document.metadata))
+            used += tokens
+        report.update(tokens_retrieved=tokens_retrieved, tokens_packed=used, tokens_saved=tokens_retrieved - used)
+        with self._lock:
+            self.turns += 1
+            self.tokens_retrieved += tokens_retrieved
+            self.tokens_packed += used
+        logger.debug("Packed context: %s, totals %s", report, self.stats())
+        return packed
+
+    def stats(self):
+        saved = self.tokens_retrieved - self.tokens_packed
+        return {"turns": self.turns, "tokens_retrieved": self.tokens_retrieved, "tokens_packed": self.tokens_packed,
+                "tokens_saved": saved, "tokens_saved_per_turn": saved / self.turns if self.turns else 0.0}
+
+
+class PackedRetriever(BaseRetriever):
+    """Runs the wrapped retriever and packs what it returns, so the stuff chain only sees the packed documents."""
+    retriever: BaseRetriever
+    packer: Any
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.packer.pack(query, documents)
+
+    async def _aget_relevant_documents(self, query, *, run_manager: AsyncCallbackManagerForRetrieverRun):
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self.packer.pack(query, documents)
@@ -1,7 +1,28 @@
 import pandas as pd
-from azure.core.exceptions import ResourceNotFoundError
-from azure.search.documents.indexes.models import SearchIndex, SearchableField, HnswAlgorithmConfiguration, VectorSearch, VectorSearchProfile, SearchFieldDataType, SearchField, SemanticConfiguration, SemanticPrioritizedFields, SemanticField, SemanticSearch
-from libs.aisearch_index import AISearchIndex
+from azure.search.documents.indexes.models import SearchIndex, SimpleField, SearchableField, HnswAlgorithmConfiguration, VectorSearch, VectorSearchProfile, SearchFieldDataType, SearchField, SemanticConfiguration, SemanticPrioritizedFields, SemanticField, SemanticSearch
+from libs.aisearch_index import AISearchIndex, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, UPLOAD_BATCH_SIZE
+
+# index field -> prep_data column
+FIELD_COLUMNS = {
+    "id": "id",
+    "industry": "industry",
+    "state": "state",
+    "number_active_employees": "number_active_employees",
+    "number_total_1099s": "number_total_1099s",
+    "question_text": "question",
+    "short_reason": "short_reason",
+    "topic": "topic",
+    "is_hr_matter": "is_hr_matter",
+    "hr_matter_detail": "hr_matter_details",
+    "case_resolution_guidance_text": "case_resolution_guidance",
+    "federal_regulations": "federal_regulations",
+    "state_regulations": "state_regulations",
+    "compliance_feedback": "compliance_feedback",
+    "legal_feedback": "legal_feedback",
+}
+INT_FIELDS = ["number_active_employees", "number_total_1099s"]
+# text field -> vector field embedded from it
+VECTOR_FIELDS = {"question_text": "question_vector", "case_resolution_guidance_text": "case_resolution_guidance_vector"}
 
 
 class CuratedIndex(AISearchIndex):
@@ -31,6 +52,7 @@ class CuratedIndex(AISearchIndex):
             SearchableField(name="state_regulations", type="Edm.String",searchable=True, retrievable=True, filterable=False),
             SearchableField(name="compliance_feedback", type="Edm.String",searchable=True, retrievable=True, filterable=False),
             SearchableField(name="legal_feedback", type="Edm.String", searchable=True, retrievable=True, filterable=False),
+            SimpleField(name="content_hash", type="Edm.String", retrievable=True, filterable=False),
             
             SearchField(name="question_vector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
                         searchable=True, vector_search_dimensions=self.vector_length, vector_search_profile_name="copilot-vector-config-Profile"),
@@ -76,21 +98,11 @@ class CuratedIndex(AISearchIndex):
 
         index = SearchIndex(name=self.index_name, fields=fields, vector_search=vector_search, semantic_search=semantic_search)
 
-        # Check if the index exists
-        try:
-            self.index_client.get_index(self.index_name)
-            # If the index exists, delete it
-            self.index_client.delete_index(self.index_name)
-            print(f"Index '{self.index_name}' deleted.")
-        except ResourceNotFoundError:
-            print(f"Index '{self.index_name}' does not exist. Creating a new one.")
-
-        # Create the index
-        self.index_client.create_index(index)
-        print(f"Index '{self.index_name}' created.")
+        self.deploy_index(index)
 
         
     def prep_data(self):
+        data = self.data
         data.columns = [col.strip() for col in data.columns]
         data.rename(columns={
                             "NAICSLevel01": "industry",
@@ -121,38 +133,39 @@ class CuratedIndex(AISearchIndex):
         return data
     
 
-    def populate_index(self, data):
-        all_rows = []
-        for i in range(len(data)):
-            try:
-                new_row = {}
-                #text fields
-                new_row["id"] = data.loc[i, "id"]
-                new_row["industry"] = data.loc[i, "industry"]
-                new_row["state"] = data.loc[i, "state"]
-                new_row["number_active_employees"] = data.loc[i, "number_active_employees"]
-                new_row["number_total_1099s"] = data.loc[i, "number_total_1099s"]
-                new_row["source"] = data.loc[i, "source"]
-                new_row["question_text"] = data.loc[i, "question"]
-                new_row["short_reason"] = data.loc[i, "short_reason"]
-                new_row["topic"] = data.loc[i, "topic"]
-                new_row["is_hr_matter"] = data.loc[i, "is_hr_matter"]
-                new_row["hr_matter_detail"] = data.loc[i, "hr_matter_detail"]
-                new_row["case_resolution_guidance_text"] = data.loc[i, "case_resolution_guidance"]
-                new_row["federal_regulations"] = data.loc[i, "federal_regulations"]
-                new_row["state_regulations"] = data.loc[i, "state_regulations"]
-                new_row["compliance_feedback"] = data.loc[i, "compliance_feedback"]
-                new_row["legal_feedback"] = data.loc[i, "legal_feedbac"]
-
-                #vector fields
-                new_row["question_vector"] = self.generate_embeddings_oai(data.loc[i, "question"])
-                new_row["case_resolution_guidance_vector"] = self.generate_embeddings_oai(data.loc[i, "case_resolution_guidance"])
-
-                all_rows.append(new_row)
-
-            except Exception as e:
-                print(f"An error occurred: {e}")
-        
-        self.search_client.upload_documents(all_rows)
-
-        
+    def prepare_rows(self, data):
+        # whole columns are converted at once instead of reading data.loc cell by cell
+        frame = data.reindex(columns=list(FIELD_COLUMNS.values()))
+        frame.columns = list(FIELD_COLUMNS.keys())
+        frame["id"] = frame["id"].astype(str)
+        for field in INT_FIELDS:
+            frame[field] = pd.to_numeric(frame[field], errors="coerce").astype("Int64")
+        frame = frame.astype(object).where(frame.notna(), None)
+        return frame.to_dict("records")
+
+    def populate_index(self, data, batch_size=UPLOAD_BATCH_SIZE, embedding_batch_size=EMBEDDING_BATCH_SIZE,
+                       max_concurrency=EMBEDDING_CONCURRENCY):
+        # only rows whose content changed since the last run are embedded and uploaded, rows no longer in
+        # the data are deleted; a run that failed part way resumes by skipping what it already uploaded
+        rows = self.prepare_rows(data)
+        for row in rows:
+            row["content_hash"] = self.content_hash(row)
+        existing = self.existing_documents()
+        changed = [row for row in rows if existing.get(row["id"], {}).get("content_hash") != row["content_hash"]]
+        added = sum(row["id"] not in existing for row in changed)
+        counts = {"added": added, "updated": len(changed) - added, "skipped": len(rows) - len(changed)}
+        print(f"Indexing {len(changed)} new or changed rows of {len(rows)} into '{self.index_name}' in batches of {batch_size}.")
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            # both text fields of the batch go out together, so the embeddings requests are full
+            texts = [row[field] for field in VECTOR_FIELDS for row in batch]
+            vectors = self.embed_texts(texts, batch_size=embedding_batch_size, max_concurrency=max_concurrency)
+            for offset, vector_field in enumerate(VECTOR_FIELDS.values()):
+                for row, vector in zip(batch, vectors[offset * len(batch):(offset + 1) * len(batch)]):
+                    row[vector_field] = vector
+            self.upload_batch(batch)
+            print(f"Uploaded {start + len(batch)}/{len(changed)} rows.")
+        counts["deleted"] = self.delete_documents(existing.keys() - {row["id"] for row in rows})
+        self.publish_index()
+        self.report(counts)
+        return counts
@@ -2,7 +2,7 @@
 
 import logging
 import urllib.parse
-from psycopg_pool import ConnectionPool  # psycopg is a PostgreSQL adapter
+from psycopg_pool import ConnectionPool, AsyncConnectionPool  # psycopg is a PostgreSQL adapter
 from api.environment_variables import EnvironmentVariables
 
 logger = logging.getLogger(__name__)
@@ -33,11 +33,20 @@ connection_kwargs = {
     "prepare_threshold": 0,
 }
 
-# Create a connection pool
+# Create a connection pool; it is opened by the API lifespan or the migrations CLI, not at import
 pool = ConnectionPool(
     conninfo=DB_URI,  # conninfo is the connection information string
     max_size=5,
     kwargs=connection_kwargs,
+    open=False,
 )
 
-logger.info("Database connection pool created")
\ No newline at end of file
+logger.info("Database connection pool created")
+
+# Async pool used by the async request path; it has to be opened inside the running event loop (see api/main.py lifespan)
+async_pool = AsyncConnectionPool(
+    conninfo=DB_URI,
+    max_size=5,
+    kwargs=connection_kwargs,
+    open=False,
+)
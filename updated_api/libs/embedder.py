@@ -1,11 +1,10 @@
-from sentence_transformers import util
-from sentence_transformers import SentenceTransformer
+import asyncio
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
-import torch
 import os
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from api.environment_variables import EnvironmentVariables
+from libs.embedding_store import EmbeddingStore
 
 import logging
 
@@ -14,23 +13,56 @@ logger = logging.getLogger(__name__)
 
 env = EnvironmentVariables.get_instance()
 
+# inputs per embeddings request, Azure OpenAI accepts up to 2048
+EMBEDDING_BATCH_SIZE = 256
+
 class EmbeddingModel():
-    def __init__(self,type,model_name=None):
+    def __init__(self,type,model_name=None,http_client=None,async_http_client=None):
     
         self.openai_api_key = env.openai_api_key
         self.openai_api_version = env.openai_api_version
         self.openai_api_endpoint = env.openai_api_endpoint
         self.embedding_model =env.embedding_model
-        self.client=AzureOpenAI(api_key=self.openai_api_key, api_version=self.openai_api_version, azure_endpoint=self.openai_api_endpoint)
+        self.client=AzureOpenAI(api_key=self.openai_api_key, api_version=self.openai_api_version, azure_endpoint=self.openai_api_endpoint, http_client=http_client)
+        self.async_client=AsyncAzureOpenAI(api_key=self.openai_api_key, api_version=self.openai_api_version, azure_endpoint=self.openai_api_endpoint, http_client=async_http_client)
         self.type=type
+        # shared with the index builds; queries only read it, user questions are never written to disk,
+        # only index builds and generate_embeddings_batch(persist=True) add to it
+        self.store = EmbeddingStore(env.embedding_store_path, self.embedding_model) if env.embedding_store_enabled else None
 
     def generate_embeddings(self,query,type='openai',model_path=None): 
             
             if type=='openai': # model = "deployment_name"
-                return self.client.embeddings.create(input=[query], model=self.embedding_model).data[0].embedding
+                vector = self.store.get(query, touch=False) if self.store is not None else None
+                if vector is None:
+                    vector = self.client.embeddings.create(input=[query], model=self.embedding_model).data[0].embedding
+                return vector
             elif type=='sentence_transformers':
+                # torch and sentence_transformers take seconds to import, only pay for them when a local model is used
+                import torch
+                from sentence_transformers import SentenceTransformer
                 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
                 model = SentenceTransformer(model_path, device=device)
                 return model.encode(query)
-        
-        
\ No newline at end of file
+
+    def generate_embeddings_batch(self,texts,batch_size=EMBEDDING_BATCH_SIZE,persist=False):
+        # one request per batch instead of one per text, results come back in input order; persist is for
+        # fixed texts embedded at every start (intent examples, industry categories), not for user input
+        vectors = self.store.get_many(texts, touch=persist) if self.store is not None else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            response = self.client.embeddings.create(input=[texts[i] for i in batch], model=self.embedding_model)
+            for i, item in zip(batch, sorted(response.data, key=lambda item: item.index)):
+                vectors[i] = item.embedding
+        if self.store is not None and persist and missing:
+            self.store.put_many([texts[i] for i in missing], [vectors[i] for i in missing])
+        return vectors
+
+    async def agenerate_embeddings(self,query):
+        # the store takes a file lock and reads memory-mapped files, kept off the event loop
+        vector = await asyncio.to_thread(self.store.get, query, False) if self.store is not None else None
+        if vector is None:
+            response = await self.async_client.embeddings.create(input=[query], model=self.embedding_model)
+            vector = response.data[0].embedding
+        return vector
@@ -0,0 +1,202 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+KEY_BYTES = 32
+SECONDS_PER_DAY = 86400
+
+
+def today():
+    return int(time.time() // SECONDS_PER_DAY)
+
+
+class EmbeddingStore:
+    """Embeddings on disk keyed by (deployment, sha256 of the text), so unchanged text is never embedded twice.
+
+    Each deployment has a directory of three append-only, row aligned files: keys.bin (32 byte digests),
+    vectors.f32 (a memory-mapped float32 matrix) and used.i32 (the day each row was last read, for gc).
+    Writers append under a file lock, so index builds and API workers can share one store.
+    """
+
+    def __init__(self, root, deployment):
+        self.root = root
+        self.deployment = deployment
+        self.path = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "_", deployment or "default"))
+        os.makedirs(self.path, exist_ok=True)
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.used_path = os.path.join(self.path, "used.i32")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.lock_path = os.path.join(self.path, ".lock")
+        self.dim = None
+        self.generation = 0
+        self.rows = 0
+        self.index = {}
+        self.vectors = None
+        self.used = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def key(self, text):
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def refresh(self):
+        # shared lock, so a compaction is never seen half way
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            try:
+                self._refresh()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        # picks up rows appended since the last look, by this process or another one; a compaction
+        # (new generation) renumbers the rows, so the key index is then rebuilt from the start
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        if meta.get("generation", 0) != self.generation:
+            self.generation = meta.get("generation", 0)
+            self.rows, self.index, self.vectors, self.used = 0, {}, None, None
+        key_rows = os.path.getsize(self.keys_path) // KEY_BYTES if os.path.exists(self.keys_path) else 0
+        vector_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        used_rows = os.path.getsize(self.used_path) // 4 if os.path.exists(self.used_path) else 0
+        # a writer that died part way leaves a partial row, only rows present in all three files count
+        rows = min(key_rows, vector_rows, used_rows)
+        if rows == self.rows:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self.rows * KEY_BYTES)
+            added = f.read((rows - self.rows) * KEY_BYTES)
+        for offset in range(0, len(added), KEY_BYTES):
+            self.index[added[offset:offset + KEY_BYTES]] = self.rows + offset // KEY_BYTES
+        self.rows = rows
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        self.used = np.memmap(self.used_path, dtype=np.int32, mode="r+", shape=(rows,))
+
+    def get_many(self, texts, touch=True):
+        # touch records the read day for compact(max_age_days); readers that must not write pass False
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            if any(key not in self.index for key in keys):
+                self.refresh()
+            rows = [self.index.get(key) for key in keys]
+            found = [row for row in rows if row is not None]
+            if found and touch:
+                self.used[found] = today()
+        self.hits += len(found)
+        self.misses += len(rows) - len(found)
+        # one gather and one conversion for the whole batch, row by row conversion dominates a warm rebuild
+        found_vectors = iter(self.vectors[found].tolist() if found else [])
+        return [None if row is None else next(found_vectors) for row in rows]
+
+    def get(self, text, touch=True):
+        return self.get_many([text], touch)[0]
+
+    def put_many(self, texts, vectors):
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock, open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if self.dim is None:
+                    self.dim = matrix.shape[1]
+                    self.write_meta()
+                if matrix.shape[1] != self.dim:
+                    raise ValueError(f"{self.deployment} vectors have {self.dim} dimensions, got {matrix.shape[1]}")
+                # skip texts another writer stored meanwhile, and repeats within this call
+                keys, fresh = set(), []
+                for i, text in enumerate(texts):
+                    key = self.key(text)
+                    if key not in self.index and key not in keys:
+                        keys.add(key)
+                        fresh.append((key, i))
+                if not fresh:
+                    return
+                # vectors and days first, keys last: a key on disk always has its row behind it
+                with open(self.vectors_path, "ab") as f:
+                    f.write(matrix[[i for _, i in fresh]].tobytes())
+                with open(self.used_path, "ab") as f:
+                    f.write(np.full(len(fresh), today(), dtype=np.int32).tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(key for key, _ in fresh))
+                self._refresh()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def compact(self, max_age_days=None):
+        # rewrites the files without rows unread for max_age_days (all rows are kept when it is None)
+        with self._lock, open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                before = self.rows
+                if not before:
+                    return {"rows_before": 0, "rows_after": 0, "bytes_before": 0, "bytes_after": 0}
+                bytes_before = self.size_bytes()
+                keep = np.ones(before, dtype=bool)
+                if max_age_days is not None:
+                    keep &= np.asarray(self.used) >= today() - max_age_days
+                with open(self.keys_path, "rb") as f:
+                    keys = np.frombuffer(f.read(before * KEY_BYTES), dtype=np.uint8).reshape(before, KEY_BYTES)
+                for path, data in ((self.vectors_path, np.asarray(self.vectors)[keep]),
+                                   (self.used_path, np.asarray(self.used)[keep]),
+                                   (self.keys_path, keys[keep])):
+                    with open(path + ".tmp", "wb") as f:
+                        f.write(data.tobytes())
+                for path in (self.vectors_path, self.used_path, self.keys_path):
+                    os.replace(path + ".tmp", path)
+                self.generation += 1
+                self.write_meta()
+                self.rows, self.index, self.vectors, self.used = 0, {}, None, None
+                self._refresh()
+                return {"rows_before": before, "rows_after": self.rows, "bytes_before": bytes_before, "bytes_after": self.size_bytes()}
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write_meta(self):
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump({"deployment": self.deployment, "dim": self.dim, "generation": self.generation}, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def size_bytes(self):
+        return sum(os.path.getsize(path) for path in (self.keys_path, self.vectors_path, self.used_path) if os.path.exists(path))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"rows": self.rows, "dim": self.dim, "bytes": self.size_bytes(), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+if __name__ == "__main__":
+    # python -m libs.embedding_store <store path> [--max-age-days 30]
+    # compacts every deployment in the store, dropping rows nothing has read for max-age-days
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--max-age-days", type=int, default=None)
+    args = parser.parse_args()
+    for name in sorted(os.listdir(args.path)):
+        meta_path = os.path.join(args.path, name, "meta.json")
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            deployment = json.load(f)["deployment"]
+        report = EmbeddingStore(args.path, deployment).compact(args.max_age_days)
+        print(f"{deployment:<32} rows {report['rows_before']:>9} -> {report['rows_after']:<9} "
+              f"size {report['bytes_before'] / 2**20:9.1f} MB -> {report['bytes_after'] / 2**20:9.1f} MB")
@@ -0,0 +1,112 @@
+import difflib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# same list as the UI validation (ui/validation.py)
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
+    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
+    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
+    'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
+    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
+}
+
+# abbreviations that are also words or titles written in upper case ("OK", "MD", "PA" for a physician
+# assistant, "MS"), never taken for a state
+UPPER_CASE_WORDS = {'MD', 'MS', 'OK', 'PA'}
+# abbreviations that are also common words ("IN", "OR", "ME", "HI"), not taken for a state in an all caps question
+AMBIGUOUS_ABBREVIATIONS = UPPER_CASE_WORDS | {'AL', 'CO', 'DE', 'HI', 'ID', 'IN', 'LA', 'MA', 'ME', 'OH', 'OR'}
+
+# words of industry names that say nothing on their own ("more information", "professional exemption")
+GENERIC_INDUSTRY_WORDS = {'administration', 'administrative', 'information', 'management', 'other', 'professional',
+                          'public', 'services', 'support', 'technical', 'trade'}
+
+# similarity a misspelt word needs to an industry phrase to count
+FUZZY_CUTOFF = 0.85
+
+
+def build_state_patterns():
+    # longest names first, so "West Virginia" is matched before "Virginia"
+    names = sorted(US_STATES.values(), key=len, reverse=True)
+    name_pattern = "|".join(re.escape(name).replace(r"\ ", r"\s+") for name in names)
+    # abbreviations only as standalone upper case tokens, "ga" or "Co-op" in ordinary text name no state
+    abbreviations = "|".join(sorted(US_STATES))
+    return re.compile(rf"\b(?:{name_pattern})\b", re.IGNORECASE), re.compile(rf"(?<![\w'-])(?:{abbreviations})(?![\w'-])")
+
+
+STATE_NAME_PATTERN, ABBREVIATION_PATTERN = build_state_patterns()
+STATE_NAMES_LOWER = {name.lower(): name for name in US_STATES.values()}
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def by_length(phrases):
+    lengths = {}
+    for phrase in phrases:
+        lengths.setdefault(len(phrase), []).append(phrase)
+    return lengths
+
+
+def close_match(word, phrases_by_length):
+    # only phrases of about the same length can reach the cutoff, the rest are never compared
+    slack = int(len(word) * (1 - FUZZY_CUTOFF)) + 1
+    candidates = [phrase for length in range(len(word) - slack, len(word) + slack + 1) for phrase in phrases_by_length.get(length, ())]
+    close = difflib.get_close_matches(word, candidates, n=1, cutoff=FUZZY_CUTOFF) if candidates else []
+    return close[0] if close else None
+
+
+def match_state(text):
+    """Returns the state name when the text names exactly one state, or None when the LLM should decide."""
+    found = {STATE_NAMES_LOWER[" ".join(name.lower().split())] for name in STATE_NAME_PATTERN.findall(text)}
+    skipped = AMBIGUOUS_ABBREVIATIONS if text.isupper() else UPPER_CASE_WORDS
+    found.update(US_STATES[abbreviation] for abbreviation in ABBREVIATION_PATTERN.findall(text) if abbreviation not in skipped)
+    if len(found) == 1:
+        return found.pop()
+    # several states named, or none found: a misspelt name ("Texs") or an abbreviation that may be a word
+    # is not told apart from no state at all, so "No state" is always the LLM's answer
+    return None
+
+
+class IndustryMatcher:
+    """Matches industry names, and the distinctive parts of them, in free text with a fuzzy fallback for misspellings."""
+
+    def __init__(self, industry_codes):
+        self.industry_codes = industry_codes
+        # phrase (as a tuple of words) -> industry code, e.g. ("health", "care") -> "Health Care and Social Assistance"
+        self.phrases = {}
+        for code in industry_codes:
+            for part in [code] + re.split(r",|\band\b|\(|\)", code):
+                words = tuple(WORD_PATTERN.findall(part.lower()))
+                if words and not (len(words) == 1 and words[0] in GENERIC_INDUSTRY_WORDS) and words[0] != "except":
+                    self.phrases.setdefault(words, set()).add(code)
+        self.max_words = max((len(words) for words in self.phrases), default=0)
+        # "healthcare" for "health care"
+        self.compact_phrases = {"".join(words): codes for words, codes in self.phrases.items()}
+        self.fuzzy_phrases = by_length(self.compact_phrases)
+
+    def match(self, text):
+        """Returns an industry code or None when the text names no industry unambiguously."""
+        words = WORD_PATTERN.findall(text.lower())
+        windows = [(size, "".join(words[start:start + size])) for size in range(1, self.max_words + 1)
+                   for start in range(len(words) - size + 1)]
+        found = set()
+        for _, compact in windows:
+            found |= self.compact_phrases.get(compact, set())
+        if not found:
+            # misspellings ("constrution") are looked for only once nothing matched exactly
+            for size, compact in windows:
+                if size <= 2 and len(compact) >= 6:
+                    close = close_match(compact, self.fuzzy_phrases)
+                    if close:
+                        found |= self.compact_phrases[close]
+        if len(found) == 1:
+            return found.pop()
+        # nothing matched (the question may name a job title instead) or several industries did
+        return None
@@ -1,4 +1,3 @@
-import pandas as pd
 import os
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
@@ -9,7 +8,8 @@ from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import RetrievalQA
 from langchain.chains import create_retrieval_chain
 from dotenv import load_dotenv
-from libs.answer import Answer
+from libs.answer import Answer, Sources
+from libs.streaming import RAG_ANSWER_TAG
 import uuid
 import logging
 from api.environment_variables import EnvironmentVariables
@@ -22,7 +22,7 @@ env = EnvironmentVariables.get_instance()
 
 class hrbot:
 
-    def __init__(self, prompt, config_file=None):
+    def __init__(self, prompt, config_file=None, http_client=None, async_http_client=None):
         self.openai_api_key = env.openai_api_key
         self.openai_api_version = env.openai_api_version
         self.openai_api_endpoint = env.openai_api_endpoint
@@ -30,41 +30,43 @@ class hrbot:
         self.embedding_model = env.embedding_model
         self.openai_gpt_4o_model_name = env.openai_gpt_4o_model_name
         
-        self.client = AzureOpenAI(api_key=self.openai_api_key, api_version=self.openai_api_version, azure_endpoint=self.openai_api_endpoint)
+        self.client = AzureOpenAI(api_key=self.openai_api_key, api_version=self.openai_api_version, azure_endpoint=self.openai_api_endpoint, http_client=http_client)
         self.prompt = prompt
 
-    def get_case_ids(self, response):
-        sources = pd.DataFrame()
-        logger.debug("Extracting case IDs from response")
-        for i in range(len(response["context"])):
-            metas = pd.DataFrame()
-            metas["reference_id"] = pd.DataFrame.from_dict([response["context"][i].metadata])['document_id']
-            metas["title"] = pd.DataFrame.from_dict([response["context"][i].metadata])['title']
-            metas["reference_link"] = pd.DataFrame.from_dict([response["context"][i].metadata])['reference_link']
-            sources = pd.concat([sources, metas])
-        logger.debug("Extracted sources: %s", sources)
-        return sources
-
-    def get_answer(self, query, search_index):
-        logger.info("Inside get_answer with query: %s", query)
-
-        llm = AzureChatOpenAI(
-            temperature=0.0, deployment_name=self.openai_gpt_4o_model_name, azure_endpoint=self.openai_api_endpoint, api_key=self.openai_api_key, logprobs=True, openai_api_version="2024-06-01"
+        # the llm, prompt and stuff chain do not change between turns, so they are built once per hrbot
+        self.llm = AzureChatOpenAI(
+            temperature=0.0, deployment_name=self.openai_gpt_4o_model_name, azure_endpoint=self.openai_api_endpoint, api_key=self.openai_api_key, logprobs=True, openai_api_version="2024-06-01",
+            http_client=http_client, http_async_client=async_http_client, tags=[RAG_ANSWER_TAG]
         )
-
-        prompt = ChatPromptTemplate.from_messages(
+        chat_prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", self.prompt),
                 ("human", "{input}"),
             ]
         )
-        logger.debug("Prompt created")
-
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
+        self.question_answer_chain = create_stuff_documents_chain(self.llm, chat_prompt)
         logger.debug("Question-answer chain created")
+        self.search_index = None
+        self.rag_chain = None
+
+    def get_sources(self, response):
+        # one record per document the answer was generated from, straight from the document metadata
+        sources = [Sources.from_document(document) for document in response["context"]]
+        logger.debug("Extracted sources: %s", sources)
+        return sources
 
-        rag_chain = create_retrieval_chain(search_index, question_answer_chain)
-        logger.debug("RAG chain created")
+    def get_rag_chain(self, search_index):
+        # reuse the chain as long as the same retriever is passed in
+        if self.rag_chain is None or search_index is not self.search_index:
+            self.rag_chain = create_retrieval_chain(search_index, self.question_answer_chain)
+            self.search_index = search_index
+            logger.debug("RAG chain created")
+        return self.rag_chain
+
+    def get_answer(self, query, search_index):
+        logger.info("Inside get_answer with query: %s", query)
+
+        rag_chain = self.get_rag_chain(search_index)
 
         # Define Run ID for tracing and feedback collection
         run_id = uuid.uuid4()
@@ -72,6 +74,20 @@ class hrbot:
         logger.debug("Config built with run_id: %s", run_id)
 
         response = rag_chain.invoke({"input": query}, config=config)
-        sources = self.get_case_ids(response)
+        sources = self.get_sources(response)
+        logger.debug("Sources: %s", sources)
+        return response["answer"], sources
+
+    async def aget_answer(self, query, search_index):
+        logger.info("Inside aget_answer with query: %s", query)
+
+        rag_chain = self.get_rag_chain(search_index)
+
+        run_id = uuid.uuid4()
+        config = {"run_id": run_id}
+        logger.debug("Config built with run_id: %s", run_id)
+
+        response = await rag_chain.ainvoke({"input": query}, config=config)
+        sources = self.get_sources(response)
         logger.debug("Sources: %s", sources)
-        return response["answer"], sources
\ No newline at end of file
+        return response["answer"], sources
@@ -0,0 +1,37 @@
+import logging
+import numpy as np
+from api.environment_variables import EnvironmentVariables
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+
+class IndustryShortlist:
+    """Embedded industry categories, giving the top_k closest to a question so the prompt lists only those."""
+
+    def __init__(self, embedder, industry_codes, top_k=None):
+        self.embedder = embedder
+        self.industry_codes = industry_codes
+        self.top_k = top_k or env.industry_shortlist_top_k
+        vectors = np.asarray(embedder.generate_embeddings_batch(list(industry_codes), persist=True), dtype=np.float32) if industry_codes else np.empty((0, 0), dtype=np.float32)
+        self.vectors = self.normalize(vectors)
+        logger.info("Embedded %d industry categories for the shortlist", len(industry_codes))
+
+    def normalize(self, vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def candidates(self, vector):
+        if len(self.industry_codes) <= self.top_k:
+            return list(self.industry_codes)
+        similarities = self.vectors @ self.normalize(np.asarray(vector, dtype=np.float32))
+        nearest = np.argpartition(-similarities, self.top_k - 1)[:self.top_k]
+        return [self.industry_codes[i] for i in nearest[np.argsort(-similarities[nearest])]]
+
+    def shortlist(self, question):
+        return self.candidates(self.embedder.generate_embeddings(question))
+
+    async def ashortlist(self, question):
+        return self.candidates(await self.embedder.agenerate_embeddings(question))
@@ -1,12 +1,14 @@
 import os
 import sys
+import asyncio
+import threading
 import logging
 import json
 from dotenv import load_dotenv
 from typing import Dict, TypedDict, Optional, List, Annotated
 from pydantic import BaseModel, Field
 from operator import add
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_openai import AzureChatOpenAI
 from azure.identity import DefaultAzureCredential
@@ -16,7 +18,7 @@ from io import StringIO
 from azure.keyvault.secrets import SecretClient
 from libs.hrbot import hrbot
 from libs.retriever import CustomRetriever
-from prompts.prompt_templates import general_hr_prompt
+from prompts.prompt_templates import general_hr_prompt, question_extraction_prompt
 from api.environment_variables import EnvironmentVariables
 from langchain.globals import set_debug, set_verbose
 from libs.answer import Answer, Sources
@@ -27,10 +29,20 @@ from langchain_core.tracers.context import tracing_v2_enabled
 from langsmith import Client
 import pandas as pd
 from langchain_core.prompts import ChatPromptTemplate
-from libs.models import GraphState, User_Input
-from libs.uitls import map_response, map_client_id_response, data_sources_mapping, create_dataset
+from libs.models import GraphState, User_Input, Question_Extraction
+from libs.uitls import map_response, map_client_id_response, source_fields, create_dataset, read_docx_paragraphs
+from libs.blob_cache import BlobAssetCache
 from langgraph.checkpoint.postgres import PostgresSaver
-from libs.db_connections import pool
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from libs.db_connections import pool, async_pool
+from libs.app_cache import CompiledAppCache
+from libs.components import ComponentRegistry
+from libs.semantic_cache import SemanticAnswerCache
+from libs.prompt_cache import PromptResponseCache
+from libs.intent_classifier import IntentClassifier
+from libs.gazetteer import IndustryMatcher, match_state
+from libs.industry_shortlist import IndustryShortlist
+from libs.streaming import stream_frame
 from docx import Document
 from io import BytesIO
 
@@ -46,10 +58,12 @@ load_dotenv()
 env = EnvironmentVariables.get_instance()
 
 memory = PostgresSaver(pool)
-memory.setup()
+# same checkpoint tables as memory, used by the async request path
+async_memory = AsyncPostgresSaver(async_pool)
 
 class InputGraph:
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -76,13 +90,26 @@ class InputGraph:
                 self.job_description_sample_blob_path = env.job_description_sample_blob_path
                 logger.debug("job_description_sample_blob_path: %s", self.job_description_sample_blob_path)
                 self.load_industry_codes()
-                self.llm = AzureChatOpenAI(temperature=0.0, deployment_name=openai_gpt_4o_model_name, azure_endpoint=openai_api_endpoint, api_key=openai_api_key)
+                self.read_job_description_sample()
+                components = ComponentRegistry.get_instance()
+                self.llm = AzureChatOpenAI(temperature=0.0, deployment_name=openai_gpt_4o_model_name, azure_endpoint=openai_api_endpoint, api_key=openai_api_key,
+                                           http_client=components.http_client, http_async_client=components.async_http_client)
                 config_path = "configs/hrbot_config.json"
                 with open(config_path) as f:
                     config_file = json.load(f)
                 self.categories_list = config_file['knowledge_categories']
                 self.tools_list = config_file['tools']
                 self.categories = ', '.join(self.categories_list + self.tools_list)
+                self.extraction_mode = env.extraction_mode
+                # classification and extraction run at temperature 0 with fixed templates, their answers are cached
+                self.prompt_cache = PromptResponseCache.get_instance()
+                self.use_industry_shortlist = env.industry_shortlist_enabled
+                self.prompt_cache.retain_current({"classify": self.classify_prompt, "client_state": self.client_state_prompt,
+                                                  "client_industry": self.client_industry_version_prompt})
+                self.question_extractor = self.build_question_extractor()
+                self.intent_classifier = self.build_intent_classifier()
+                self.use_gazetteer = env.gazetteer_enabled
+                self.prime_industry_shortlist()
                 self._initialized = True
             except Exception as e:
                 logger.error("Error initializing InputGraph: %s", e)
@@ -90,29 +117,124 @@ class InputGraph:
 
     @classmethod
     def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = cls()
+        # requests build the graph in worker threads, the lock keeps two first requests from both building it
+        if cls._instance is None or not cls._instance._initialized:
+            with cls._lock:
+                if cls._instance is None or not cls._instance._initialized:
+                    cls._instance = cls()
         return cls._instance
 
     def load_industry_codes(self):
         logger.debug("Loading industry categories")
         try:
-            blob_service_client = BlobServiceClient(account_url=self.account_url, credential=self.credential)
-            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=self.blob_path)
-            blob_data = blob_client.download_blob().readall().decode('utf-8')
-            df = pd.read_csv(StringIO(blob_data))
-            self.industry_codes = df[~df['NAICSLevel01'].isin(['Not Specified', 'Unclassified'])]['NAICSLevel01'].to_list()
+            BlobAssetCache.get_instance().get("industry_codes", self.blob_path, self.parse_industry_codes)
             logger.debug("Industry codes loaded")
         except Exception as e:
             logger.error("Error loading industry codes: %s", e)
             raise
 
+    def parse_industry_codes(self, path):
+        df = pd.read_csv(path)
+        return df[~df['NAICSLevel01'].isin(['Not Specified', 'Unclassified'])]['NAICSLevel01'].to_list()
+
+    @property
+    def industry_codes(self):
+        # served from memory, the blob cache swaps in a new list when the blob changes
+        return BlobAssetCache.get_instance().get("industry_codes", self.blob_path, self.parse_industry_codes)
+
+    @property
+    def industry_matcher(self):
+        # rebuilt only when the blob cache has swapped in a new industry list
+        codes = self.industry_codes
+        matcher = getattr(self, "_industry_matcher", None)
+        if matcher is None or matcher.industry_codes is not codes:
+            matcher = self._industry_matcher = IndustryMatcher(codes)
+        return matcher
+
+    def match_client_state(self, question):
+        # state names and abbreviations are a closed list, the LLM only sees text the gazetteer cannot settle
+        return match_state(question) if self.use_gazetteer else None
+
+    def match_client_industry(self, question):
+        return self.industry_matcher.match(question) if self.use_gazetteer else None
+
+    def classify_prompt(self, question):
+        return f"classify intent of given input question in specific to one of the following categories: {self.categories}.Classify questions about salary in the 'wage' category. Output just the category it fits or None if it fits none of the categories. Input: {question}"
+
+    def client_state_prompt(self, question):
+        return f"classify if the state of the client is specified in the question. Extract the state independent whether lower case  or upper case letters are used in the input. Also extract the state even if state abbreviations are used. If you find the state, extract and output that state. If not, output only 'No state'. Output just the class. Input: {question}"
+
+    def client_industry_prompt(self, question, candidates=None):
+        candidates = self.industry_codes if candidates is None else candidates
+        return f"classify if the industry of the client is specified in the question. Classify to  one of the following industry categories: {candidates} . Classify to one of the industry categories even if the client mentions a job title or profession. If so extract and output only that that industry category. If not output only 'No industry'. Output just the class. Input:{question}"
+
+    def client_industry_version_prompt(self, question):
+        # cached industry answers depend on the full list and the shortlist settings, not on the candidates one question got
+        shortlist = f" [shortlist {env.embedding_model} top {env.industry_shortlist_top_k}]" if self.use_industry_shortlist else ""
+        return self.client_industry_prompt(question) + shortlist
+
+    @property
+    def industry_shortlist(self):
+        # the industry categories are embedded once per industry list, the blob cache swaps in a new list on change
+        codes = self.industry_codes
+        shortlist = getattr(self, "_industry_shortlist", None)
+        if shortlist is None or shortlist.industry_codes is not codes:
+            shortlist = self._industry_shortlist = IndustryShortlist(ComponentRegistry.get_instance().query_embedder, codes)
+        return shortlist
+
+    def prime_industry_shortlist(self):
+        if not self.use_industry_shortlist:
+            return
+        try:
+            self.industry_shortlist
+        except Exception as e:
+            logger.warning("Could not embed the industry categories, prompts will list all of them: %s", e)
+
+    def industry_prompt(self, candidates):
+        # with no shortlist the prompt lists every industry category, as before
+        return lambda question: self.client_industry_prompt(question, candidates)
+
+    def industry_candidates(self, question):
+        if not self.use_industry_shortlist:
+            return None
+        try:
+            return self.industry_shortlist.shortlist(question)
+        except Exception as e:
+            logger.warning("Industry shortlist failed, listing all industry categories: %s", e)
+            return None
+
+    async def aindustry_candidates(self, question):
+        if not self.use_industry_shortlist:
+            return None
+        try:
+            return await self.industry_shortlist.ashortlist(question)
+        except Exception as e:
+            logger.warning("Industry shortlist failed, listing all industry categories: %s", e)
+            return None
+
+    def invoke_text(self, prompt):
+        return self.llm.invoke(prompt).content.strip()
+
+    async def ainvoke_text(self, prompt):
+        response = await self.llm.ainvoke(prompt)
+        return response.content.strip()
+
     def classify(self, question):
         logger.debug(f"Classifying question: {question}")
         try:
-            response = self.llm.invoke(f"classify intent of given input question in specific to one of the following categories: {self.categories}.Classify questions about salary in the 'wage' category. Output just the category it fits or None if it fits none of the categories. Input: {question}")
-            logger.debug(f"Classification result: {response.content.strip()}")
-            return response.content.strip()
+            response = self.prompt_cache.get_or_invoke("classify", self.classify_prompt, question, self.invoke_text, casefold=True)
+            logger.debug(f"Classification result: {response}")
+            return response
+        except Exception as e:
+            logger.error("Error classifying question: %s", e)
+            raise
+
+    async def aclassify(self, question):
+        logger.debug(f"Classifying question: {question}")
+        try:
+            response = await self.prompt_cache.aget_or_invoke("classify", self.classify_prompt, question, self.ainvoke_text, casefold=True)
+            logger.debug(f"Classification result: {response}")
+            return response
         except Exception as e:
             logger.error("Error classifying question: %s", e)
             raise
@@ -120,9 +242,19 @@ class InputGraph:
     def extract_client_state(self, question):
         logger.debug(f"Extracting client state from question: {question}")
         try:
-            response = self.llm.invoke(f"classify if the state of the client is specified in the question. Extract the state independent whether lower case  or upper case letters are used in the input. Also extract the state even if state abbreviations are used. If you find the state, extract and output that state. If not, output only 'No state'. Output just the class. Input: {question}")
-            logger.debug(f"Extracted client state: {response.content.strip()}")
-            return response.content.strip()
+            response = self.match_client_state(question) or self.prompt_cache.get_or_invoke("client_state", self.client_state_prompt, question, self.invoke_text)
+            logger.debug(f"Extracted client state: {response}")
+            return response
+        except Exception as e:
+            logger.error("Error extracting client state: %s", e)
+            raise
+
+    async def aextract_client_state(self, question):
+        logger.debug(f"Extracting client state from question: {question}")
+        try:
+            response = self.match_client_state(question) or await self.prompt_cache.aget_or_invoke("client_state", self.client_state_prompt, question, self.ainvoke_text)
+            logger.debug(f"Extracted client state: {response}")
+            return response
         except Exception as e:
             logger.error("Error extracting client state: %s", e)
             raise
@@ -130,44 +262,160 @@ class InputGraph:
     def extract_client_industry(self, question):
         logger.debug(f"Extracting client industry from question: {question}")
         try:
-            response = self.llm.invoke(f"classify if the industry of the client is specified in the question. Classify to  one of the following industry categories: {self.industry_codes} . Classify to one of the industry categories even if the client mentions a job title or profession. If so extract and output only that that industry category. If not output only 'No industry'. Output just the class. Input:{question}")
-            logger.debug(f"Extracted client industry: {response.content.strip()}")
-            return response.content.strip()
+            response = self.match_client_industry(question) or self.prompt_cache.get_or_invoke(
+                "client_industry", self.industry_prompt(self.industry_candidates(question)), question, self.invoke_text,
+                version_prompt=self.client_industry_version_prompt)
+            logger.debug(f"Extracted client industry: {response}")
+            return response
+        except Exception as e:
+            logger.error("Error extracting client industry: %s", e)
+            raise
+
+    async def aextract_client_industry(self, question):
+        logger.debug(f"Extracting client industry from question: {question}")
+        try:
+            response = self.match_client_industry(question) or await self.prompt_cache.aget_or_invoke(
+                "client_industry", self.industry_prompt(await self.aindustry_candidates(question)), question, self.ainvoke_text,
+                version_prompt=self.client_industry_version_prompt)
+            logger.debug(f"Extracted client industry: {response}")
+            return response
         except Exception as e:
             logger.error("Error extracting client industry: %s", e)
             raise
 
+    def build_intent_classifier(self):
+        if not env.intent_classifier_enabled:
+            return None
+        try:
+            return IntentClassifier(ComponentRegistry.get_instance().query_embedder, self.categories_list + self.tools_list)
+        except Exception as e:
+            # without the local classifier every question is classified by the LLM, as before
+            logger.warning("Intent classifier unavailable, classifying with the LLM only: %s", e)
+            return None
+
+    def local_intent(self, question):
+        if self.intent_classifier is None:
+            return None
+        try:
+            return self.intent_classifier.classify(question)
+        except Exception as e:
+            logger.warning("Local intent classification failed, falling back to the LLM: %s", e)
+            return None
+
+    async def alocal_intent(self, question):
+        if self.intent_classifier is None:
+            return None
+        try:
+            return await self.intent_classifier.aclassify(question)
+        except Exception as e:
+            logger.warning("Local intent classification failed, falling back to the LLM: %s", e)
+            return None
+
+    def build_question_extractor(self):
+        prompt = ChatPromptTemplate.from_messages([("system", question_extraction_prompt()), ("human", "{input}")])
+        return prompt | self.llm.with_structured_output(Question_Extraction)
+
+    def unresolved_extraction_fields(self, classification, client_state, client_industry):
+        # fields the structured call did not resolve are asked for again with the per field prompt
+        unresolved = []
+        if classification not in self.categories_list + self.tools_list + ["None"]:
+            unresolved.append("classification")
+        if not client_state:
+            unresolved.append("client_state")
+        if client_industry not in self.industry_codes + ["No industry"]:
+            unresolved.append("client_industry")
+        return unresolved
+
+    def gazetteer_fields(self, question, classification):
+        # state and industry the gazetteer settles deterministically are never asked of the LLM
+        return {"classification": classification, "client_state": self.match_client_state(question),
+                "client_industry": self.match_client_industry(question)}
+
+    def merge_extraction(self, fields, extraction):
+        for field, value in (("classification", extraction.classification), ("client_state", extraction.state), ("client_industry", extraction.industry)):
+            if fields[field] is None:
+                fields[field] = value.strip()
+
+    def extract_question(self, question, classification=None):
+        # a classification already settled by the local classifier is kept, the call then only matters for state and industry
+        logger.debug(f"Extracting classification, state and industry from question: {question}")
+        fields = self.gazetteer_fields(question, classification)
+        unresolved = [field for field, value in fields.items() if value is None]
+        if unresolved == ["classification"]:
+            # the short classification prompt is enough, the industry list is not needed
+            fields["classification"] = self.classify(question)
+        elif unresolved:
+            try:
+                # the structured prompt lists only the shortlisted industry categories, like the per field prompt
+                industries = self.industry_candidates(question) or self.industry_codes
+                extraction = self.question_extractor.invoke({"categories": self.categories, "industries": industries, "input": question})
+                self.merge_extraction(fields, extraction)
+            except Exception as e:
+                logger.warning("Structured extraction failed, falling back to per field prompts: %s", e)
+
+        fallbacks = {"classification": self.classify, "client_state": self.extract_client_state, "client_industry": self.extract_client_industry}
+        for field in self.unresolved_extraction_fields(**fields):
+            fields[field] = fallbacks[field](question)
+        logger.debug(f"Extraction result: {fields}")
+        return fields["classification"], fields["client_state"], fields["client_industry"]
+
+    async def aextract_question(self, question, classification=None):
+        logger.debug(f"Extracting classification, state and industry from question: {question}")
+        fields = self.gazetteer_fields(question, classification)
+        unresolved = [field for field, value in fields.items() if value is None]
+        if unresolved == ["classification"]:
+            fields["classification"] = await self.aclassify(question)
+        elif unresolved:
+            try:
+                industries = await self.aindustry_candidates(question) or self.industry_codes
+                extraction = await self.question_extractor.ainvoke({"categories": self.categories, "industries": industries, "input": question})
+                self.merge_extraction(fields, extraction)
+            except Exception as e:
+                logger.warning("Structured extraction failed, falling back to per field prompts: %s", e)
+
+        fallbacks = {"classification": self.aclassify, "client_state": self.aextract_client_state, "client_industry": self.aextract_client_industry}
+        unresolved = self.unresolved_extraction_fields(**fields)
+        results = await asyncio.gather(*(fallbacks[field](question) for field in unresolved))
+        fields.update(zip(unresolved, results))
+        logger.debug(f"Extraction result: {fields}")
+        return fields["classification"], fields["client_state"], fields["client_industry"]
+
     def read_job_description_sample(self):
         logger.debug("Reading job description sample")
         try:
-            blob_service_client = BlobServiceClient(account_url=self.account_url, credential=self.credential)
-            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=self.job_description_sample_blob_path)
-            blob_data = blob_client.download_blob().readall()
-            doc = Document(BytesIO(blob_data))
-            example = []
-            for paragraph in doc.paragraphs:
-                example.append(paragraph.text)
-            return example
+            return BlobAssetCache.get_instance().get("job_description_sample", self.job_description_sample_blob_path, read_docx_paragraphs)
         except Exception as e:
             logger.error("Error reading job description sample: %s", e)
             raise
 
+    def job_description_prompt(self, state, example):
+        if state.get('job_title', '').strip() != '':
+            input = state.get('question', '').strip() + " " + state.get('job_title', '').strip()
+        else:
+            input = state.get('question', '').strip()
+
+        if state.get('client_state', '').strip() != '':
+            input = input + " in state  " + state.get('client_state', '').strip()
+        if state.get('client_industry', '').strip() != '':
+            input = input + " for industry " + state.get('client_industry', '').strip()
+        logger.debug(f"Job description input: {input}")
+        return f"Produce a detailed job description using the job title and primary duties and client demographics provided in the input. Produce the job description if valid job titles or positions are found in the input. if not ask for the job title or position. Use the format and structure of the example: {example} ,Input:{input}"
+
     def produce_job_description(self, state):
         logger.debug("Producing job description")
         try:
-            if state.get('job_title', '').strip() != '':
-                input = state.get('question', '').strip() + " " + state.get('job_title', '').strip()
-            else:
-                input = state.get('question', '').strip()
-
-            if state.get('client_state', '').strip() != '':
-                input = input + " in state  " + state.get('client_state', '').strip()
-            if state.get('client_industry', '').strip() != '':
-                input = input + " for industry " + state.get('client_industry', '').strip()
-            logger.debug(f"Job description input: {input}")
+            example = self.read_job_description_sample()
+            response = self.llm.invoke(self.job_description_prompt(state, example))
+            return {"response": response.content.strip()}
+        except Exception as e:
+            logger.error("Error producing job description: %s", e)
+            raise
 
+    async def aproduce_job_description(self, state):
+        logger.debug("Producing job description")
+        try:
             example = self.read_job_description_sample()
-            response = self.llm.invoke(f"Produce a detailed job description using the job title and primary duties and client demographics provided in the input. Produce the job description if valid job titles or positions are found in the input. if not ask for the job title or position. Use the format and structure of the example: {example} ,Input:{input}")
+            response = await self.llm.ainvoke(self.job_description_prompt(state, example))
             return {"response": response.content.strip()}
         except Exception as e:
             logger.error("Error producing job description: %s", e)
@@ -177,22 +425,43 @@ class InputGraph:
         logger.debug("Extracting client demographics")
         try:
             question = state.get('question', '').strip()
-            client_state = self.extract_client_state(question)
-            if self.extract_client_state(question) != "No state" or state.get('client_state', '').strip() == '':
-                client_state = self.extract_client_state(question)
-            else:
-                logger.debug(" client_state %s ", state.get('client_state'))
-                client_state = state.get('client_state', '').strip()
-            if self.extract_client_industry(question) != "No industry" or state.get('client_industry', '').strip() == '':
-                client_industry = self.extract_client_industry(question)
-            else:
-                logger.debug(" client_industry %s ", state.get('client_industry'))
-                client_industry = state.get('client_industry', '').strip()
-            return {"client_state": client_state, "client_industry": client_industry}
+            # values already extracted by classify_input are reused, otherwise each field is asked for once
+            extracted_state = state.get('extracted_state') or self.extract_client_state(question)
+            extracted_industry = state.get('extracted_industry') or self.extract_client_industry(question)
+            return self.merge_client_dem(state, extracted_state, extracted_industry)
         except Exception as e:
             logger.error("Error extracting client demographics: %s", e)
             raise
 
+    async def aextract_client_dem(self, state):
+        logger.debug("Extracting client demographics")
+        try:
+            question = state.get('question', '').strip()
+            extracted_state, extracted_industry = await asyncio.gather(
+                self.aresolve(state.get('extracted_state'), self.aextract_client_state, question),
+                self.aresolve(state.get('extracted_industry'), self.aextract_client_industry, question),
+            )
+            return self.merge_client_dem(state, extracted_state, extracted_industry)
+        except Exception as e:
+            logger.error("Error extracting client demographics: %s", e)
+            raise
+
+    async def aresolve(self, value, extract, question):
+        return value or await extract(question)
+
+    def merge_client_dem(self, state, extracted_state, extracted_industry):
+        if extracted_state != "No state" or state.get('client_state', '').strip() == '':
+            client_state = extracted_state
+        else:
+            logger.debug(" client_state %s ", state.get('client_state'))
+            client_state = state.get('client_state', '').strip()
+        if extracted_industry != "No industry" or state.get('client_industry', '').strip() == '':
+            client_industry = extracted_industry
+        else:
+            logger.debug(" client_industry %s ", state.get('client_industry'))
+            client_industry = state.get('client_industry', '').strip()
+        return {"client_state": client_state, "client_industry": client_industry}
+
     def verify_user_input(self, state):
         logger.debug("Verifying user input")
         try:
@@ -204,16 +473,95 @@ class InputGraph:
             logger.error("Error verifying user input: %s", e)
             raise
 
+    async def averify_user_input(self, state):
+        logger.debug("Verifying user input")
+        try:
+            human_input = state.get('human_input', '').strip()
+            state, industry = await asyncio.gather(self.aextract_client_state(human_input), self.aextract_client_industry(human_input))
+            return state, industry
+        except Exception as e:
+            logger.error("Error verifying user input: %s", e)
+            raise
+
     def classify_input_node(self, state):
         logger.debug("Classifying input node")
         try:
             question = state.get('question', '').strip()
-            classification = self.classify(question)
-            return {"classification": classification}
+            # the LLM only classifies questions the nearest neighbour classifier is not confident about
+            classification = self.local_intent(question)
+            if self.extraction_mode == "structured":
+                if classification is None:
+                    classification, client_state, client_industry = self.extract_question(question)
+                    return {"classification": classification, "extracted_state": client_state, "extracted_industry": client_industry}
+                if classification not in self.categories_list:
+                    # tools and the greeting do not use the client state or industry, no LLM call at all
+                    return {"classification": classification}
+                # a knowledge question still needs the client state and industry, the LLM is asked only for those
+                classification, client_state, client_industry = self.extract_question(question, classification)
+                return {"classification": classification, "extracted_state": client_state, "extracted_industry": client_industry}
+            return {"classification": classification or self.classify(question)}
         except Exception as e:
             logger.error("Error classifying input node: %s", e)
             raise
 
+    async def aclassify_input_node(self, state):
+        logger.debug("Classifying input node")
+        try:
+            question = state.get('question', '').strip()
+            classification = await self.alocal_intent(question)
+            if self.extraction_mode == "structured":
+                if classification is None:
+                    classification, client_state, client_industry = await self.aextract_question(question)
+                    return {"classification": classification, "extracted_state": client_state, "extracted_industry": client_industry}
+                if classification not in self.categories_list:
+                    return {"classification": classification}
+                classification, client_state, client_industry = await self.aextract_question(question, classification)
+                return {"classification": classification, "extracted_state": client_state, "extracted_industry": client_industry}
+            return {"classification": classification or await self.aclassify(question)}
+        except Exception as e:
+            logger.error("Error classifying input node: %s", e)
+            raise
+
+    def extract_question_state_node(self, state):
+        logger.debug("Extracting state node")
+        try:
+            question = state.get('question', '').strip()
+            return {"extracted_state": self.extract_client_state(question)}
+        except Exception as e:
+            logger.error("Error extracting state node: %s", e)
+            raise
+
+    async def aextract_question_state_node(self, state):
+        logger.debug("Extracting state node")
+        try:
+            question = state.get('question', '').strip()
+            return {"extracted_state": await self.aextract_client_state(question)}
+        except Exception as e:
+            logger.error("Error extracting state node: %s", e)
+            raise
+
+    def extract_question_industry_node(self, state):
+        logger.debug("Extracting industry node")
+        try:
+            question = state.get('question', '').strip()
+            return {"extracted_industry": self.extract_client_industry(question)}
+        except Exception as e:
+            logger.error("Error extracting industry node: %s", e)
+            raise
+
+    async def aextract_question_industry_node(self, state):
+        logger.debug("Extracting industry node")
+        try:
+            question = state.get('question', '').strip()
+            return {"extracted_industry": await self.aextract_client_industry(question)}
+        except Exception as e:
+            logger.error("Error extracting industry node: %s", e)
+            raise
+
+    def join_input(self, state):
+        logger.debug("Joining classification and extraction branches")
+        return {}
+
     def get_client_dem(self, *args, **kwargs):
         return {"human_ask": "Hello! Could you please provide your state and industry?"}
 
@@ -230,25 +578,85 @@ class InputGraph:
             logger.error("Error checking user input: %s", e)
             raise
 
+    async def acheck_user_input(self, state):
+        logger.debug("Checking user input")
+        try:
+            client_state, client_industry = await self.averify_user_input(state)
+            return {"client_state": client_state, "client_industry": client_industry}
+        except Exception as e:
+            logger.error("Error checking user input: %s", e)
+            raise
+
+    def rag_query(self, state):
+        return state.get('question', '').strip() + " " + state.get('human_input', '').strip() + " Client State: " + state.get('client_state', '').strip() + " Client Industry: " + state.get('client_industry', '').strip()
+
+    def map_rag_response(self, state, response):
+        sources = source_fields(response[1])
+        state.update(sources)
+        logger.debug(f"RAG response with human input sources: {response[1]}")
+        return {"response": response[0], **sources}
+
     def handle_RAG_human_input(self, state):
         logger.debug("Handling RAG with human input")
         try:
-            query = state.get('question', '').strip() + " " + state.get('human_input', '').strip() + " Client State: " + state.get('client_state', '').strip() + " Client Industry: " + state.get('client_industry', '').strip()
+            query = self.rag_query(state)
+            logger.debug(f"Handling RAG with human input for query: {query}")
+            components = ComponentRegistry.get_instance()
+            response = components.hrbot.get_answer(query, components.retriever)
+            answer = self.map_rag_response(state, response)
+            # the retriever already embedded this query, so the vector comes from the query embedding cache
+            SemanticAnswerCache.get_instance().store(components.query_embedder.generate_embeddings(query), state, {**answer, "source_metadata_id": state['source_metadata_id']})
+            return answer
+        except Exception as e:
+            logger.error("Error handling RAG with human input: %s", e)
+            raise
+
+    async def ahandle_RAG_human_input(self, state):
+        logger.debug("Handling RAG with human input")
+        try:
+            query = self.rag_query(state)
             logger.debug(f"Handling RAG with human input for query: {query}")
-            retriever = CustomRetriever(nr_top_docs=3, retrieval_type='all').get_retriever()
-            hr_general_prompt = general_hr_prompt()
-            hrcoplilot = hrbot(hr_general_prompt)
-            response = hrcoplilot.get_answer(query, retriever)
-            sources = data_sources_mapping(response[1])
-            state['source_title'] = [source.title for source in sources]
-            state['source_metadata_id'] = [source.reference_id for source in sources]
-            state['source_url'] = [source.url for source in sources]
-            logger.debug(f"RAG response with human input sources: {response[1]}")
-            return {"response": response[0], "sources": response[1], "source_title": state['source_title'], "source_url": state['source_url']}
+            components = ComponentRegistry.get_instance()
+            response = await components.hrbot.aget_answer(query, components.retriever)
+            answer = self.map_rag_response(state, response)
+            SemanticAnswerCache.get_instance().store(await components.query_embedder.agenerate_embeddings(query), state, {**answer, "source_metadata_id": state['source_metadata_id']})
+            return answer
         except Exception as e:
             logger.error("Error handling RAG with human input: %s", e)
             raise
 
+    def lookup_answer_cache(self, state):
+        logger.debug("Looking up semantic answer cache")
+        try:
+            answer_cache = SemanticAnswerCache.get_instance()
+            if not answer_cache.enabled:
+                return {"answer_cache_hit": False}
+            vector = ComponentRegistry.get_instance().query_embedder.generate_embeddings(self.rag_query(state))
+            cached = answer_cache.lookup(vector, state)
+            return {"answer_cache_hit": False} if cached is None else {**cached, "answer_cache_hit": True}
+        except Exception as e:
+            logger.error("Error looking up semantic answer cache: %s", e)
+            raise
+
+    async def alookup_answer_cache(self, state):
+        logger.debug("Looking up semantic answer cache")
+        try:
+            answer_cache = SemanticAnswerCache.get_instance()
+            if not answer_cache.enabled:
+                return {"answer_cache_hit": False}
+            vector = await ComponentRegistry.get_instance().query_embedder.agenerate_embeddings(self.rag_query(state))
+            cached = answer_cache.lookup(vector, state)
+            return {"answer_cache_hit": False} if cached is None else {**cached, "answer_cache_hit": True}
+        except Exception as e:
+            logger.error("Error looking up semantic answer cache: %s", e)
+            raise
+
+    def answer_cache_route(self, state):
+        # a cached answer ends the turn without retrieval or an LLM call
+        next_node = END if state.get('answer_cache_hit') else "handle_RAG_human_input"
+        logger.debug(f"Next node: {next_node}")
+        return next_node
+
     def decide_next_node(self, state):
         logger.debug(f"Deciding next node for state: {state}")
         try:
@@ -284,22 +692,47 @@ class InputGraph:
             logger.error("Error replying human state: %s", e)
             raise
 
-    def build_graph(self):
-        logger.debug("Building graph")
+    def build_graph(self, asynchronous=False):
+        logger.debug("Building graph, asynchronous: %s", asynchronous)
         try:
+            def node(sync_node, async_node):
+                # nodes doing I/O have async variants so the async app never blocks the event loop
+                return async_node if asynchronous else sync_node
+
             workflow = StateGraph(GraphState)
-            workflow.add_node("classify_input", self.classify_input_node)
-            workflow.add_node("extract_client_dem", self.extract_client_dem)
+            workflow.add_node("classify_input", node(self.classify_input_node, self.aclassify_input_node))
+            if self.extraction_mode == "structured":
+                # a single structured call already returns classification, state and industry
+                workflow.set_entry_point("classify_input")
+                input_node = "classify_input"
+            else:
+                # the per field prompts do not depend on each other, so they run as parallel branches
+                workflow.add_node("extract_question_state", node(self.extract_question_state_node, self.aextract_question_state_node))
+                workflow.add_node("extract_question_industry", node(self.extract_question_industry_node, self.aextract_question_industry_node))
+                workflow.add_node("join_input", self.join_input)
+                for branch in ("classify_input", "extract_question_state", "extract_question_industry"):
+                    workflow.add_edge(START, branch)
+                workflow.add_edge(["classify_input", "extract_question_state", "extract_question_industry"], "join_input")
+                input_node = "join_input"
+            workflow.add_node("extract_client_dem", node(self.extract_client_dem, self.aextract_client_dem))
             workflow.add_node("get_client_dem", self.get_client_dem)
             workflow.add_node("initial_greeting", self.initial_greeting)
-            workflow.add_node("check_user_input", self.check_user_input)
-            workflow.add_node("handle_RAG_human_input", self.handle_RAG_human_input)
-            workflow.add_node("produce_job_description", self.produce_job_description)
-            workflow.set_entry_point("classify_input")
+            workflow.add_node("check_user_input", node(self.check_user_input, self.acheck_user_input))
+            workflow.add_node("lookup_answer_cache", node(self.lookup_answer_cache, self.alookup_answer_cache))
+            workflow.add_node("handle_RAG_human_input", node(self.handle_RAG_human_input, self.ahandle_RAG_human_input))
+            workflow.add_node("produce_job_description", node(self.produce_job_description, self.aproduce_job_description))
             workflow.add_edge('handle_RAG_human_input', END)
             workflow.add_edge('get_client_dem', 'check_user_input')
             workflow.add_conditional_edges(
-                "classify_input",
+                "lookup_answer_cache",
+                self.answer_cache_route,
+                {
+                    END: END,
+                    "handle_RAG_human_input": "handle_RAG_human_input"
+                }
+            )
+            workflow.add_conditional_edges(
+                input_node,
                 self.decide_next_node,
                 {
                     "extract_client_dem": "extract_client_dem",
@@ -312,7 +745,7 @@ class InputGraph:
                 self.get_client_data,
                 {
                     "get_client_dem": "get_client_dem",
-                    "handle_RAG_human_input": "handle_RAG_human_input"
+                    "handle_RAG_human_input": "lookup_answer_cache"
                 }
             )
             workflow.add_conditional_edges(
@@ -320,7 +753,7 @@ class InputGraph:
                 self.reply_human_state,
                 {
                     "get_client_dem": "get_client_dem",
-                    "handle_RAG_human_input": "handle_RAG_human_input"
+                    "handle_RAG_human_input": "lookup_answer_cache"
                 }
             )
             logger.debug("Graph built successfully")
@@ -329,23 +762,34 @@ class InputGraph:
             logger.error("Error building graph: %s", e)
             raise
 
-    def initiate_graph(self):
+    def initiate_graph(self, asynchronous=False):
         logger.debug("Initiating graph")
         try:
-            workflow = self.build_graph()
-            app = workflow.compile(checkpointer=memory)
+            workflow = self.build_graph(asynchronous)
+            app = workflow.compile(checkpointer=async_memory if asynchronous else memory)
             logger.debug("Graph initiated successfully")
             return app
         except Exception as e:
             logger.error("Error initiating graph: %s", e)
             raise
 
+    def get_app(self, asynchronous=False):
+        if asynchronous:
+            return CompiledAppCache.get_instance().get_app("input_graph_async", lambda: self.initiate_graph(asynchronous=True))
+        return CompiledAppCache.get_instance().get_app("input_graph", self.initiate_graph)
+
+    def warm_up(self):
+        return CompiledAppCache.get_instance().warm_up("input_graph", self.initiate_graph)
+
+    async def awarm_up(self):
+        return await CompiledAppCache.get_instance().awarm_up("input_graph_async", lambda: self.initiate_graph(asynchronous=True))
+
     def get_answer(self, query, user_answer, thread_id, client_state=None, client_industry=None):
         logger.info("Getting answer for query: %s", query)
 
         run_id = uuid.uuid4()
 
-        app = self.initiate_graph()
+        app = self.get_app()
 
         config = {"configurable": {"thread_id": thread_id}, "run_id": run_id, "metadata": {"user_id": "user name"}}
         logger.debug("Config: %s", config)
@@ -388,3 +832,82 @@ class InputGraph:
         except Exception as e:
             logger.error("Error getting answer: %s", e)
             return {"error": str(e)}
+
+    async def aprepare_turn(self, app, config, query, user_answer, client_state=None, client_industry=None):
+        # returns the graph input and breakpoint for this turn, shared by aget_answer and astream_answer
+        breakpoint = "check_user_input"
+        if user_answer == "":
+            current_state = await app.aget_state(config)
+            logger.debug("client_state: %s", client_state)
+            logger.debug("client_industry: %s", client_industry)
+            if current_state.metadata:
+                logger.debug("Update state to clear response from previous interation")
+                await app.aupdate_state(config=config, values={"response": None, "source_title": None, "source_metadata_id": None, "source_url": None})
+            if client_state and client_state != "":
+                return {"question": query, 'length': 0, 'client_state': client_state, 'client_industry': client_industry}, breakpoint
+            logger.debug("Asking bot to get responses for the question %s", query)
+            return {"question": query, 'length': 0}, breakpoint
+        logger.debug("Updating state to process human input %s", user_answer)
+        await app.aupdate_state(config=config, values={"human_input": user_answer})
+        logger.debug("Getting answer to the question")
+        return None, breakpoint
+
+    async def aget_answer(self, query, user_answer, thread_id, client_state=None, client_industry=None):
+        logger.info("Getting answer asynchronously for query: %s", query)
+
+        run_id = uuid.uuid4()
+
+        app = self.get_app(asynchronous=True)
+
+        config = {"configurable": {"thread_id": thread_id}, "run_id": run_id, "metadata": {"user_id": "user name"}}
+        logger.debug("Config: %s", config)
+
+        try:
+            graph_input, breakpoint = await self.aprepare_turn(app, config, query, user_answer, client_state, client_industry)
+            with tracing_v2_enabled():
+                response = await app.ainvoke(graph_input, config=config, interrupt_before=[breakpoint])
+
+            logger.debug("Response: %s", response)
+
+            answer = map_response(response, query, thread_id, run_id)
+            logger.debug("Answer: %s", answer)
+
+            logger.debug("Writing to dataset: %s", answer)
+            create_dataset(answer)
+
+            return answer
+        except Exception as e:
+            logger.error("Error getting answer: %s", e)
+            return {"error": str(e)}
+
+    async def astream_answer(self, query, user_answer, thread_id, client_state=None, client_industry=None):
+        logger.info("Streaming answer for query: %s", query)
+
+        run_id = uuid.uuid4()
+
+        app = self.get_app(asynchronous=True)
+
+        config = {"configurable": {"thread_id": thread_id}, "run_id": run_id, "metadata": {"user_id": "user name"}}
+        logger.debug("Config: %s", config)
+
+        try:
+            graph_input, breakpoint = await self.aprepare_turn(app, config, query, user_answer, client_state, client_industry)
+            with tracing_v2_enabled():
+                async for event in app.astream_events(graph_input, config=config, interrupt_before=[breakpoint], version="v2"):
+                    frame = stream_frame(event)
+                    if frame:
+                        yield frame
+
+            response = (await app.aget_state(config)).values
+            logger.debug("Response: %s", response)
+
+            answer = map_response(response, query, thread_id, run_id)
+            logger.debug("Answer: %s", answer)
+
+            logger.debug("Writing to dataset: %s", answer)
+            create_dataset(answer)
+
+            yield {"type": "answer", "response": answer}
+        except Exception as e:
+            logger.error("Error streaming answer: %s", e)
+            yield {"type": "error", "error": str(e)}
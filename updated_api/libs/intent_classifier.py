@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+from api.environment_variables import EnvironmentVariables
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+# label used by the examples for questions outside every category, decide_next_node sends those to the greeting
+NO_CATEGORY = "None"
+
+
+class IntentClassifier:
+    """Nearest neighbour intent classifier over embedded example questions, abstaining when the match is ambiguous."""
+
+    def __init__(self, embedder, labels, examples_path=None, top_k=None, threshold=None, margin=None, cache_dir=None):
+        self.embedder = embedder
+        self.examples_path = examples_path or env.intent_examples_path
+        self.cache_dir = cache_dir or env.intent_cache_dir
+        self.top_k = top_k or env.intent_classifier_top_k
+        self.threshold = env.intent_classifier_threshold if threshold is None else threshold
+        self.margin = env.intent_classifier_margin if margin is None else margin
+        # examples for a category that is no longer configured are ignored rather than routed to a missing node
+        self.labels = [label for label in labels if label != NO_CATEGORY] + [NO_CATEGORY]
+        self.hits = 0
+        self.abstentions = 0
+        self.load()
+
+    def load(self):
+        with open(self.examples_path) as f:
+            examples = json.load(f)
+        questions, label_ids = [], []
+        for label_id, label in enumerate(self.labels):
+            for question in examples.get(label, []):
+                questions.append(question)
+                label_ids.append(label_id)
+        missing = [label for label in self.labels if not examples.get(label)]
+        if missing:
+            logger.warning("No intent examples for %s, those questions will go to the LLM", missing)
+        self.example_labels = np.asarray(label_ids, dtype=np.int64)
+        self.example_vectors = self.embed_examples(questions)
+        logger.info("Intent classifier loaded %d examples for %d labels", len(questions), len(self.labels))
+
+    def embed_examples(self, questions):
+        # the example embeddings are kept in the cache directory and only recomputed when the
+        # examples, the labels or the embedding deployment change
+        fingerprint = hashlib.sha256(json.dumps([getattr(self.embedder, "embedding_model", ""), self.labels, questions]).encode("utf-8")).hexdigest()
+        cache_path = os.path.join(self.cache_dir, os.path.splitext(os.path.basename(self.examples_path))[0] + ".embeddings.npz")
+        try:
+            cached = np.load(cache_path)
+            if str(cached["fingerprint"]) == fingerprint:
+                return cached["vectors"]
+        except (OSError, KeyError, ValueError):
+            pass
+        vectors = self.normalize(np.asarray(self.embedder.generate_embeddings_batch(questions, persist=True), dtype=np.float32))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(cache_path, fingerprint=np.asarray(fingerprint), vectors=vectors)
+        except OSError as e:
+            logger.warning("Could not save intent example embeddings to %s: %s", cache_path, e)
+        return vectors
+
+    def normalize(self, vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def predict(self, vector):
+        # returns (label, best similarity, margin over the runner up label); label is None when the
+        # neighbours do not agree confidently enough and the LLM should decide
+        if not len(self.example_labels):
+            return None, 0.0, 0.0
+        similarities = self.example_vectors @ self.normalize(np.asarray(vector, dtype=np.float32))
+        k = min(self.top_k, len(similarities))
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        votes = np.zeros(len(self.labels), dtype=np.float32)
+        np.add.at(votes, self.example_labels[nearest], similarities[nearest])
+        ranked = np.argsort(-votes)
+        best = float(similarities[nearest][self.example_labels[nearest] == ranked[0]].max())
+        runner_up = similarities[nearest][self.example_labels[nearest] == ranked[1]] if len(ranked) > 1 else []
+        margin = best - float(runner_up.max()) if len(runner_up) else best
+        if best < self.threshold or margin < self.margin:
+            self.abstentions += 1
+            return None, best, margin
+        self.hits += 1
+        return self.labels[ranked[0]], best, margin
+
+    def classify(self, question):
+        label, similarity, margin = self.predict(self.embedder.generate_embeddings(question))
+        logger.debug("Local intent %s (similarity %.3f, margin %.3f): %s", label, similarity, margin, self.stats())
+        return label
+
+    async def aclassify(self, question):
+        label, similarity, margin = self.predict(await self.embedder.agenerate_embeddings(question))
+        logger.debug("Local intent %s (similarity %.3f, margin %.3f): %s", label, similarity, margin, self.stats())
+        return label
+
+    def stats(self):
+        lookups = self.hits + self.abstentions
+        return {"hits": self.hits, "abstentions": self.abstentions, "local_rate": self.hits / lookups if lookups else 0.0}
@@ -20,6 +20,7 @@ from prompts.prompt_templates import general_hr_prompt
 from api.environment_variables import EnvironmentVariables
 from langchain.globals import set_debug, set_verbose
 from libs.answer import Answer, Sources
+from libs.telemetry import DatasetWriter
 import pprint
 import uuid
 from langsmith import traceable
@@ -320,12 +321,12 @@ class InputGraph:
         hr_general_prompt = general_hr_prompt()
         hrcoplilot = hrbot(hr_general_prompt)
         response = hrcoplilot.get_answer(query, retriever)
-        sources = self.data_sources_mapping(response[1])
+        sources = response[1]
         state['source_title'] = [source.title for source in sources]
         state['source_metadata_id'] = [source.reference_id for source in sources]
         state['source_url'] = [source.url for source in sources]
         logger.debug(f"RAG response with human input sources: {response[1]}")
-        return {"response": response[0],"sources":response[1],"source_title":state['source_title'],"source_url":state['source_url']}
+        return {"response": response[0],"source_title":state['source_title'],"source_metadata_id":state['source_metadata_id'],"source_url":state['source_url']}
 
     def decide_next_node(self, state):
         logger.debug(f"Deciding next node for state: {state}")
@@ -424,22 +425,9 @@ class InputGraph:
         
         return answer
 
-    def data_sources_mapping(self, dataframe_sources):
-        logger.debug("Mapping dataframe sources to Sources objects")
-        sources = []
-        for _, row in dataframe_sources.iterrows():
-            source = Sources(
-                reference_id=row['reference_id'],
-                title=row['title'],
-                url=row['reference_link']
-            )
-            sources.append(source)
-        return sources
-
     def create_dataset(self, answer):
         logger.debug("Writing to dataset: create_dataset %s", answer)
-        client = Client()
-        client.create_example(inputs={"question": answer.question}, outputs={"response": answer.answer}, dataset_id="93570a3b-c2ed-41c3-b526-bd3cba38da80")
+        DatasetWriter.get_instance().enqueue(answer)
 
     def get_answer(self, query, user_answer, thread_id,client_state=None,client_industry=None):
         logger.info("Getting answer for query: %s", query)
@@ -0,0 +1,34 @@
+# Creates or upgrades the LangGraph checkpoint tables, the checkpoint retention index and the prompt response cache table. Runs from the API lifespan when RUN_DB_MIGRATIONS is true,
+# or once per deployment with:
+#   python -m libs.migrations
+import logging
+from langgraph.checkpoint.postgres import PostgresSaver
+from api.environment_variables import EnvironmentVariables
+from libs.checkpoint_retention import CheckpointRetention
+from libs.prompt_cache import PromptResponseCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+from libs.db_connections import pool
+
+
+def run_migrations():
+    logger.info("Running checkpoint migrations")
+    pool.wait()
+    PostgresSaver(pool).setup()
+    with pool.connection() as conn:
+        PromptResponseCache.get_instance().setup(conn)
+        CheckpointRetention.get_instance().setup(conn)
+    logger.info("Checkpoint migrations done")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    pool.open(wait=True)
+    try:
+        run_migrations()
+    finally:
+        pool.close()
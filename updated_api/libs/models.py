@@ -15,6 +15,8 @@ class GraphState(TypedDict):
     client_state: Optional[str] = None
     client_name: Optional[str] = None
     client_industry: Optional[str] = None
+    extracted_state: Optional[str] = None
+    extracted_industry: Optional[str] = None
     job_title: Optional[str] = None
     response: Optional[str] = None
     human_ask: Optional[str] = None
@@ -22,8 +24,15 @@ class GraphState(TypedDict):
     source_title: Optional[List[str]] = None
     source_metadata_id: Optional[List[str]] = None
     source_url: Optional[List[str]] = None
+    answer_cache_hit: Optional[bool] = None
 
 class User_Input(BaseModel):
     """Valid United States state name and industry name"""
     state: str = Field(description="US State name")
-    industry: str = Field(description="Industry name")
\ No newline at end of file
+    industry: str = Field(description="Industry name")
+
+class Question_Extraction(User_Input):
+    """Intent category, United States state name and industry name found in a single question"""
+    classification: str = Field(description="Category the question fits, or 'None' if it fits none of the categories")
+    state: str = Field(description="US State name mentioned in the question, or 'No state'")
+    industry: str = Field(description="Industry category the question refers to, or 'No industry'")
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import defaultdict
+from api.environment_variables import EnvironmentVariables
+from libs.cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+from libs.db_connections import pool, async_pool
+
+CREATE_PROMPT_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS prompt_response_cache (
+    cache_key TEXT PRIMARY KEY,
+    prompt_name TEXT NOT NULL,
+    deployment TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+CREATE_PROMPT_CACHE_INDEX = """
+CREATE INDEX IF NOT EXISTS prompt_response_cache_prompt_idx ON prompt_response_cache (prompt_name, template_version)
+"""
+
+SELECT_RESPONSE = """
+SELECT response FROM prompt_response_cache
+WHERE cache_key = %(cache_key)s AND created_at > now() - make_interval(secs => %(ttl_seconds)s)
+"""
+
+UPSERT_RESPONSE = """
+INSERT INTO prompt_response_cache (cache_key, prompt_name, deployment, template_version, response)
+VALUES (%(cache_key)s, %(prompt_name)s, %(deployment)s, %(template_version)s, %(response)s)
+ON CONFLICT (cache_key) DO UPDATE SET response = EXCLUDED.response, created_at = now()
+"""
+
+DELETE_STALE_VERSIONS = """
+DELETE FROM prompt_response_cache WHERE prompt_name = %(prompt_name)s AND template_version <> %(template_version)s
+"""
+
+# stands in for the question when a template is hashed, so the version covers the template text and
+# everything interpolated into it (hrbot_config.json categories, industry codes) but not the input
+TEMPLATE_PLACEHOLDER = "\x00question\x00"
+
+
+class PromptResponseCache:
+    """Responses of deterministic prompts keyed by deployment, template version and normalized input, in Postgres behind an in-process LRU."""
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(PromptResponseCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            logger.debug("Initializing PromptResponseCache instance")
+            self.enabled = env.prompt_cache_enabled
+            self.deployment = env.openai_gpt_4o_model_name
+            self.ttl_seconds = env.prompt_cache_ttl_hours * 3600
+            self.memory = LRUTTLCache(maxsize=env.prompt_cache_size, ttl_seconds=self.ttl_seconds)
+            # per prompt counters: memory hits, database hits and misses that went to the model
+            self.counters = defaultdict(lambda: {"memory_hits": 0, "db_hits": 0, "misses": 0, "errors": 0})
+            self._counter_lock = threading.Lock()
+            self._initialized = True
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def setup(self, conn):
+        # one statement per execute: with prepare_threshold 0 every query is a prepared statement, which takes only one command
+        conn.execute(CREATE_PROMPT_CACHE_TABLE)
+        conn.execute(CREATE_PROMPT_CACHE_INDEX)
+
+    def template_version(self, build_prompt):
+        return hashlib.sha256(build_prompt(TEMPLATE_PLACEHOLDER).encode("utf-8")).hexdigest()[:16]
+
+    def normalize(self, text, casefold):
+        text = re.sub(r"\s+", " ", text or "").strip()
+        return text.casefold() if casefold else text
+
+    def cache_key(self, prompt_name, template_version, question, casefold):
+        raw = "\x1f".join([self.deployment or "", prompt_name, template_version, self.normalize(question, casefold)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def count(self, prompt_name, outcome):
+        with self._counter_lock:
+            self.counters[prompt_name][outcome] += 1
+
+    def get_or_invoke(self, prompt_name, build_prompt, question, invoke, casefold=False, version_prompt=None):
+        # invoke takes the rendered prompt and returns the response text; version_prompt, when the prompt
+        # text varies by question beyond the question itself, renders what the cached answers depend on
+        if not self.enabled:
+            return invoke(build_prompt(question))
+        version = self.template_version(version_prompt or build_prompt)
+        key = self.cache_key(prompt_name, version, question, casefold)
+        response = self.memory.get(key)
+        if response is not None:
+            self.count(prompt_name, "memory_hits")
+            return response
+        try:
+            with pool.connection() as conn:
+                row = conn.execute(SELECT_RESPONSE, {"cache_key": key, "ttl_seconds": self.ttl_seconds}).fetchone()
+        except Exception as e:
+            self.count(prompt_name, "errors")
+            logger.warning("Prompt cache lookup for %s failed, calling the model: %s", prompt_name, e)
+            row = None
+        if row is not None:
+            self.count(prompt_name, "db_hits")
+            self.memory.put(key, row[0])
+            return row[0]
+        self.count(prompt_name, "misses")
+        response = invoke(build_prompt(question))
+        self.memory.put(key, response)
+        try:
+            with pool.connection() as conn:
+                conn.execute(UPSERT_RESPONSE, self.row(key, prompt_name, version, response))
+        except Exception as e:
+            self.count(prompt_name, "errors")
+            logger.warning("Prompt cache write for %s failed: %s", prompt_name, e)
+        return response
+
+    async def aget_or_invoke(self, prompt_name, build_prompt, question, ainvoke, casefold=False, version_prompt=None):
+        if not self.enabled:
+            return await ainvoke(build_prompt(question))
+        version = self.template_version(version_prompt or build_prompt)
+        key = self.cache_key(prompt_name, version, question, casefold)
+        response = self.memory.get(key)
+        if response is not None:
+            self.count(prompt_name, "memory_hits")
+            return response
+        try:
+            async with async_pool.connection() as conn:
+                cursor = await conn.execute(SELECT_RESPONSE, {"cache_key": key, "ttl_seconds": self.ttl_seconds})
+                row = await cursor.fetchone()
+        except Exception as e:
+            self.count(prompt_name, "errors")
+            logger.warning("Prompt cache lookup for %s failed, calling the model: %s", prompt_name, e)
+            row = None
+        if row is not None:
+            self.count(prompt_name, "db_hits")
+            self.memory.put(key, row[0])
+            return row[0]
+        self.count(prompt_name, "misses")
+        response = await ainvoke(build_prompt(question))
+        self.memory.put(key, response)
+        try:
+            async with async_pool.connection() as conn:
+                await conn.execute(UPSERT_RESPONSE, self.row(key, prompt_name, version, response))
+        except Exception as e:
+            self.count(prompt_name, "errors")
+            logger.warning("Prompt cache write for %s failed: %s", prompt_name, e)
+        return response
+
+    def row(self, key, prompt_name, version, response):
+        return {"cache_key": key, "prompt_name": prompt_name, "deployment": self.deployment,
+                "template_version": version, "response": response}
+
+    def retain_current(self, build_prompts):
+        # called when the prompt inputs are (re)loaded; rows written under an older template version,
+        # e.g. before the hrbot_config.json categories changed, can never be hit again and are dropped
+        self.memory.clear()
+        try:
+            with pool.connection() as conn:
+                for prompt_name, build_prompt in build_prompts.items():
+                    deleted = conn.execute(DELETE_STALE_VERSIONS, {"prompt_name": prompt_name,
+                                                                   "template_version": self.template_version(build_prompt)}).rowcount
+                    if deleted:
+                        logger.info("Dropped %d cached %s responses from older template versions", deleted, prompt_name)
+        except Exception as e:
+            logger.warning("Could not drop stale prompt cache rows: %s", e)
+
+    def stats(self):
+        with self._counter_lock:
+            prompts = {}
+            for prompt_name, counts in self.counters.items():
+                lookups = counts["memory_hits"] + counts["db_hits"] + counts["misses"]
+                hits = counts["memory_hits"] + counts["db_hits"]
+                prompts[prompt_name] = {**counts, "hit_rate": hits / lookups if lookups else 0.0}
+        return {"memory": self.memory.stats(), "prompts": prompts}
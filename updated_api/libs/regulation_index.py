@@ -1,10 +1,50 @@
+import asyncio
+import time
 import pandas as pd
 import re 
-import uuid
-from azure.core.exceptions import ResourceNotFoundError
+from collections import defaultdict
+from urllib.parse import urlsplit
+import httpx
 from azure.search.documents.indexes.models import SearchIndex, SimpleField, SearchableField, HnswAlgorithmConfiguration, VectorSearch, VectorSearchProfile, SearchFieldDataType, SearchField, SemanticConfiguration, SemanticPrioritizedFields, SemanticField, SemanticSearch
-from libs.web_scraper import WebScraper
-from libs.aisearch_index import AISearchIndex
+from libs.chunker import TokenChunker
+from libs.web_scraper import WebScraper, USER_AGENT
+from libs.aisearch_index import AISearchIndex, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, UPLOAD_BATCH_SIZE, MAX_RETRIES, RETRY_BACKOFF_SECONDS
+
+# embedding model tokens per chunk, and shared between consecutive chunks of a page
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+# pages fetched at once overall, and from any one host (most links point at a handful of .gov sites)
+FETCH_CONCURRENCY = 32
+PER_HOST_CONCURRENCY = 4
+FETCH_TIMEOUT_SECONDS = 30
+# embed + upload batches in flight while pages are still being fetched
+UPLOAD_CONCURRENCY = 2
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class StageStats:
+    """Items per pipeline stage and the span from a stage's first to its last piece of work, which is what its rate is measured over."""
+
+    def __init__(self):
+        self.items = defaultdict(int)
+        self.failed = defaultdict(int)
+        self.first = {}
+        self.last = {}
+        self.started = time.perf_counter()
+
+    def record(self, stage, items, start):
+        self.items[stage] += items
+        self.first[stage] = min(self.first.get(stage, start), start)
+        self.last[stage] = max(self.last.get(stage, start), time.perf_counter())
+
+    def report(self):
+        wall = time.perf_counter() - self.started
+        for stage in ("fetch", "chunk", "embed", "upload"):
+            seconds = self.last.get(stage, 0.0) - self.first.get(stage, 0.0)
+            rate = self.items[stage] / seconds if seconds else 0.0
+            print(f"{stage:<7} {self.items[stage]:7d} items  {self.failed[stage]:5d} failed  "
+                  f"{seconds:8.1f}s  {rate:9.1f} items/s")
+        print(f"total   {wall:8.1f}s wall")
 
 
 class RegulationIndex(AISearchIndex):
@@ -14,6 +54,7 @@ class RegulationIndex(AISearchIndex):
                          openai_api_version, openai_api_endpoint, openai_embedding_model)
         self.vector_length = vector_length
         self.data = data
+        self.chunker = TokenChunker(max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
 
 
     def create_index(self):
@@ -23,17 +64,16 @@ class RegulationIndex(AISearchIndex):
                             searchable=True, retrievable=True, filterable=True),
             SearchableField(name="hrbp_document_id", type="Edm.String",
                         searchable=True, retrievable=True, filterable=False),
-            SearchableField(name="is_federal", typoe="Edm.Boolean", searchable=False, retrievalbe=True, filterable=True),
+            SimpleField(name="is_federal", type="Edm.Boolean", retrievable=True, filterable=True),
             SearchableField(name="state", type="Edm.String",
                             searchable=True, retrievable=True, filterable=True),         
-            SearchableField(name="title", type="Edm.String",
-                            searchable=True, retrievable=True, filterable=True),  
             SearchableField(name="regulation_link", type="Edm.String",
                             searchable=True, retrievable=True, filterable=True),
             SearchableField(name="chunk_position", type="Edm.String",
                             searchable=True, retrievable=True, filterable=False),
             SearchableField(name="chunk_text", type="Edm.String",
                             searchable=True, retrievable=True, filterable=False),
+            SimpleField(name="content_hash", type="Edm.String", retrievable=True, filterable=False),
             
             SearchField(name="chunk_text_vector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
                         searchable=True, vector_search_dimensions=self.vector_length, vector_search_profile_name="regulation-vector-config-Profile")
@@ -76,18 +116,7 @@ class RegulationIndex(AISearchIndex):
         index = SearchIndex(name=self.index_name, fields=fields, vector_search=vector_search, semantic_search=semantic_search)
 
 
-        # Check if the index exists
-        try:
-            self.index_client.get_index(self.index_name)
-            # If the index exists, delete it
-            self.index_client.delete_index(self.index_name)
-            print(f"Index '{self.index_name}' deleted.")
-        except ResourceNotFoundError:
-            print(f"Index '{self.index_name}' does not exist. Creating a new one.")
-
-        # Create the index
-        self.index_client.create_index(index)
-        print(f"Index '{self.index_name}' created.")
+        self.deploy_index(index)
 
 
     def extract_urls(self, text): 
@@ -112,46 +141,131 @@ class RegulationIndex(AISearchIndex):
         url_df = pd.DataFrame(results)
         return url_df
     
-    def chunk_text(self, text, max_chunk_size=512):
-        sentences = re.split(r'(?<=[.!?]) +', text)  # Split by sentences
-        chunks = []
-        current_chunk = []
-
-        for sentence in sentences:
-            if len(" ".join(current_chunk + [sentence]).split()) <= max_chunk_size:
-                current_chunk.append(sentence)
-            else:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sentence]
-
-        if current_chunk:  # Add the last chunk
-            chunks.append(" ".join(current_chunk))
-
-        return chunks
-
-
-    def populate_index(self, data):
-        for i in range(len(data)):
-            url = data.loc[i, "url"]
-            scraper = WebScraper(url)
-
-            try:
-                full_text = scraper.extract_main_text()
-                chunks = self.chunk_text(full_text)
-
-                for chunk_position, chunk_text in enumerate(chunks):
-                    new_row = {
-                        "id": str(uuid.uuid4()),
-                        "hrbp_document_id": data.loc[i, "id"],
-                        "regulation_link": url,
-                        "chunk_position": str(chunk_position),
-                        "chunk_text": chunk_text,
-                        "chunk_text_vector": self.generate_embeddings_oai(chunk_text)  
-                    }
-                    self.search_client.upload_documents(new_row)
-
-            except Exception as e:
-                print(f"Error processing {url}: {e}")
-        
+    def chunk_text(self, text):
+        return self.chunker.chunk(text)
+
+
+    def unique_urls(self, url_df):
+        # prep_url_df repeats a link for every row and column citing it; each page is fetched and indexed
+        # once, under the first row that cites it
+        return url_df.drop_duplicates(subset="url", keep="first").reset_index(drop=True)
+
+    async def fetch_page(self, client, url, global_limit, host_limits, stats):
+        host_limit = host_limits[urlsplit(url).netloc]
+        for attempt in range(MAX_RETRIES):
+            async with global_limit, host_limit:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    status, error = response.status_code, f"HTTP {response.status_code}"
+                except httpx.TransportError as e:
+                    status, error = None, e
+                stats.record("fetch", 0, start)
+            if status is not None and status not in RETRYABLE_STATUS:
+                if status >= 400:
+                    break
+                stats.items["fetch"] += 1
+                return response.text
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        stats.failed["fetch"] += 1
+        print(f"Error fetching {url}: {error}")
+        return None
+
+    def chunk_page(self, row, html, stats):
+        start = time.perf_counter()
+        try:
+            full_text = WebScraper(row["url"], html=html).extract_main_text()
+        except Exception as e:
+            stats.failed["chunk"] += 1
+            print(f"Error processing {row['url']}: {e}")
+            return None
+        documents = [{
+            "id": self.document_key(row["url"], chunk_position),
+            "hrbp_document_id": str(row["id"]),
+            "regulation_link": row["url"],
+            "chunk_position": str(chunk_position),
+            "chunk_text": chunk_text,
+        } for chunk_position, chunk_text in enumerate(self.chunk_text(full_text)) if chunk_text.strip()]
+        for document in documents:
+            document["content_hash"] = self.content_hash(document)
+        stats.record("chunk", len(documents), start)
+        return documents
+
+    def embed_and_upload(self, documents, embedding_batch_size, max_concurrency, stats):
+        start = time.perf_counter()
+        vectors = self.embed_texts([document["chunk_text"] for document in documents],
+                                   batch_size=embedding_batch_size, max_concurrency=max_concurrency)
+        for document, vector in zip(documents, vectors):
+            document["chunk_text_vector"] = vector
+        stats.record("embed", len(documents), start)
+        start = time.perf_counter()
+        self.upload_batch(documents)
+        stats.record("upload", len(documents), start)
+
+    async def apopulate_index(self, data, fetch_concurrency=FETCH_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY,
+                              batch_size=UPLOAD_BATCH_SIZE, embedding_batch_size=EMBEDDING_BATCH_SIZE,
+                              max_concurrency=EMBEDDING_CONCURRENCY):
+        # fetch -> chunk -> embed -> upload; pages are chunked as they arrive and full batches are embedded
+        # and uploaded in worker threads while the remaining pages are still being fetched. Chunks whose
+        # content is already in the index are skipped, chunks of pages that are gone are deleted; chunks
+        # of pages that failed to fetch this time are left as they are
+        rows = self.unique_urls(data).to_dict("records")
+        print(f"Indexing {len(rows)} unique regulation links (of {len(data)} cited) into '{self.index_name}'.")
+        existing = await asyncio.to_thread(self.existing_documents, ("id", "content_hash", "regulation_link"))
+        counts = {"added": 0, "updated": 0, "skipped": 0}
+        seen, failed_links = set(), set()
+        stats = StageStats()
+        global_limit = asyncio.Semaphore(fetch_concurrency)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(per_host_concurrency))
+        upload_limit = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        uploads, pending = [], []
+
+        async def upload(documents):
+            async with upload_limit:
+                try:
+                    await asyncio.to_thread(self.embed_and_upload, documents, embedding_batch_size, max_concurrency, stats)
+                except Exception as e:
+                    stats.failed["upload"] += len(documents)
+                    print(f"Error uploading {len(documents)} chunks: {e}")
+
+        async def fetch(client, row):
+            return row, await self.fetch_page(client, row["url"], global_limit, host_limits, stats)
 
+        async with httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, timeout=FETCH_TIMEOUT_SECONDS, follow_redirects=True,
+                                     limits=httpx.Limits(max_connections=fetch_concurrency)) as client:
+            for fetched in asyncio.as_completed([fetch(client, row) for row in rows]):
+                row, html = await fetched
+                documents = None if html is None else self.chunk_page(row, html, stats)
+                if documents is None:
+                    failed_links.add(row["url"])
+                    continue
+                for document in documents:
+                    seen.add(document["id"])
+                    previous = existing.get(document["id"])
+                    if previous is not None and previous["content_hash"] == document["content_hash"]:
+                        counts["skipped"] += 1
+                        continue
+                    counts["updated" if previous is not None else "added"] += 1
+                    pending.append(document)
+                while len(pending) >= batch_size:
+                    uploads.append(asyncio.create_task(upload(pending[:batch_size])))
+                    pending = pending[batch_size:]
+        if pending:
+            uploads.append(asyncio.create_task(upload(pending)))
+        await asyncio.gather(*uploads)
+        removed = [key for key, document in existing.items() if key not in seen and document["regulation_link"] not in failed_links]
+        counts["deleted"] = await asyncio.to_thread(self.delete_documents, removed)
+        stats.report()
+        if stats.failed["upload"]:
+            print(f"{stats.failed['upload']} chunks failed to upload, '{self.index_name}' is left as it was; rerun to finish.")
+            if self.live_index_name == self.physical_index_name:
+                # the chunks that did upload went to the live index, its content version has to follow
+                self.publish_version()
+        else:
+            self.publish_index()
+        self.report(counts)
+        return counts
 
+    def populate_index(self, data, **kwargs):
+        return asyncio.run(self.apopulate_index(data, **kwargs))
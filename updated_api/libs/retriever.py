@@ -1,15 +1,24 @@
 import os
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from api.environment_variables import EnvironmentVariables
 from langchain.docstore.document import Document
 from langchain_core.retrievers import BaseRetriever
 from langchain.retrievers import EnsembleRetriever
+from langchain_core.runnables.config import patch_config
 from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
 from azure.search.documents.models import VectorizedQuery
 from libs.embedder import EmbeddingModel
+from libs.cache import LRUTTLCache
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
 from azure.core.credentials import AzureKeyCredential
-from typing import ClassVar
+from typing import Any, ClassVar
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,16 +36,115 @@ azure_hrcopilot_search_api_key = env.azure_hrcopilot_search_api_key
 
 azure_hrcopilot_search_credential = AzureKeyCredential(azure_hrcopilot_search_api_key)
 
+# threads used to query the internal and external indexes at the same time on the sync path
+search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="index-search")
+
+
+@functools.lru_cache(maxsize=None)
+def get_search_client(index_name):
+    # built on first search instead of at import, so workers that never search do not pay for it
+    return SearchClient(endpoint=azure_search_endpoint, index_name=index_name, credential=azure_hrcopilot_search_credential)
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_search_client(index_name):
+    return AsyncSearchClient(endpoint=azure_search_endpoint, index_name=index_name, credential=azure_hrcopilot_search_credential)
+
+class QueryEmbeddingCache():
+    """Embeds each distinct query once and shares the vector between the internal and external retrievers."""
+
+    def __init__(self, embedder, maxsize=1024, ttl_seconds=3600):
+        self.embedder = embedder
+        self.cache = LRUTTLCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._async_pending = {}
+
+    @property
+    def embedding_model(self):
+        return self.embedder.embedding_model
+
+    def cache_key(self, query):
+        return (self.embedder.embedding_model, " ".join(query.lower().split()))
+
+    def generate_embeddings_batch(self, texts, persist=False):
+        # batches are not cached, they are only used for one off work such as embedding intent examples
+        return self.embedder.generate_embeddings_batch(texts, persist=persist)
+
+    def generate_embeddings(self, query):
+        key = self.cache_key(query)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return self.record_hit(vector)
+
+        # when both retrievers ask for the same query at once, only the first one calls the embedding API
+        with self._pending_lock:
+            computed = self._pending.get(key)
+            owner = computed is None
+            if owner:
+                computed = self._pending[key] = threading.Event()
+        if not owner:
+            computed.wait()
+            vector = self.cache.get(key)
+            if vector is not None:
+                return self.record_hit(vector)
+            return self.embedder.generate_embeddings(query)
+        try:
+            vector = self.embedder.generate_embeddings(query)
+            self.cache.put(key, vector)
+            return self.record_miss(vector)
+        finally:
+            with self._pending_lock:
+                self._pending.pop(key, None)
+            computed.set()
+
+    async def agenerate_embeddings(self, query):
+        key = self.cache_key(query)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return self.record_hit(vector)
+
+        task = self._async_pending.get(key)
+        if task is not None:
+            # shielded so a cancelled caller does not cancel the embedding the other retriever is waiting on
+            return self.record_hit(await asyncio.shield(task))
+        task = asyncio.ensure_future(self._aembed(key, query))
+        self._async_pending[key] = task
+        task.add_done_callback(lambda _: self._async_pending.pop(key, None))
+        return self.record_miss(await asyncio.shield(task))
+
+    async def _aembed(self, key, query):
+        vector = await self.embedder.agenerate_embeddings(query)
+        self.cache.put(key, vector)
+        return vector
+
+    def record_hit(self, vector):
+        self.hits += 1
+        logger.debug("Query embedding cache hit: %s", self.stats())
+        return vector
+
+    def record_miss(self, vector):
+        self.misses += 1
+        logger.debug("Query embedding cache miss: %s", self.stats())
+        return vector
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.cache), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
 class InternalGuidelinesRetriever(BaseRetriever):
     nr_top_docs: int
-    search_client: ClassVar = None
-    search_client = SearchClient(endpoint=azure_search_endpoint, index_name=internal_guidelines_index_name, credential=azure_hrcopilot_search_credential)
+    embedder: Any = None
+    index_name: ClassVar[str] = internal_guidelines_index_name
 
     def search_query(self, query):
         logger.debug("Performing search query for internal guidelines")
-        embedder = EmbeddingModel(type='openai')
+        embedder = self.embedder or EmbeddingModel(type='openai')
         v = VectorizedQuery(vector=embedder.generate_embeddings(query), k_nearest_neighbors=3, fields="title_vector,content_vector")
-        search_results = self.search_client.search(
+        search_results = get_search_client(self.index_name).search(
             search_text=query,
             search_fields=["title", "content"],
             vector_queries=[v],
@@ -50,6 +158,26 @@ class InternalGuidelinesRetriever(BaseRetriever):
         logger.debug("Search results retrieved: %s", search_results)
         return search_results
 
+    async def asearch_query(self, query):
+        logger.debug("Performing async search query for internal guidelines")
+        embedder = self.embedder or EmbeddingModel(type='openai')
+        v = VectorizedQuery(vector=await embedder.agenerate_embeddings(query), k_nearest_neighbors=3, fields="title_vector,content_vector")
+        search_results = await get_async_search_client(self.index_name).search(
+            search_text=query,
+            search_fields=["title", "content"],
+            vector_queries=[v],
+            select=["document_id", "title", "content", "reference_link", "main_topics"],
+            query_type="semantic",
+            semantic_configuration_name="curated-semantic-config",
+            query_caption="extractive",
+            query_answer="extractive",
+            top=self.nr_top_docs
+        )
+        # the async pager has to be drained inside the event loop
+        search_results = [result async for result in search_results]
+        logger.debug("Async search results retrieved: %s", search_results)
+        return search_results
+
     def create_content_list(self, search_results):
         logger.debug("Creating content list from search results")
         content_list = []
@@ -71,16 +199,23 @@ class InternalGuidelinesRetriever(BaseRetriever):
         logger.debug("Relevant documents retrieved: %s", initial_list)
         return initial_list
 
+    async def _aget_relevant_documents(self, query):
+        logger.debug("Getting relevant documents asynchronously for query: %s", query)
+        search_results = await self.asearch_query(query)
+        initial_list = self.create_content_list(search_results)
+        logger.debug("Relevant documents retrieved: %s", initial_list)
+        return initial_list
+
 class ExternalRegulationsRetriever(BaseRetriever):
     nr_top_docs: int
-    search_client: ClassVar = None
-    search_client = SearchClient(endpoint=azure_search_endpoint, index_name=external_regulations_index_name, credential=azure_hrcopilot_search_credential)
+    embedder: Any = None
+    index_name: ClassVar[str] = external_regulations_index_name
 
     def search_query(self, query):
         logger.debug("Performing search query for external regulations")
-        embedder = EmbeddingModel(type='openai')
+        embedder = self.embedder or EmbeddingModel(type='openai')
         v = VectorizedQuery(vector=embedder.generate_embeddings(query), k_nearest_neighbors=3, fields="title_vector,content_vector")
-        search_results = self.search_client.search(
+        search_results = get_search_client(self.index_name).search(
             search_text=query,
             search_fields=["title", "content"],
             vector_queries=[v],
@@ -94,6 +229,26 @@ class ExternalRegulationsRetriever(BaseRetriever):
         logger.debug("Search results retrieved: %s", search_results)
         return search_results
 
+    async def asearch_query(self, query):
+        logger.debug("Performing async search query for external regulations")
+        embedder = self.embedder or EmbeddingModel(type='openai')
+        v = VectorizedQuery(vector=await embedder.agenerate_embeddings(query), k_nearest_neighbors=3, fields="title_vector,content_vector")
+        search_results = await get_async_search_client(self.index_name).search(
+            search_text=query,
+            search_fields=["title", "content"],
+            vector_queries=[v],
+            select=["document_id", "title", "content", "reference_link"],
+            query_type="semantic",
+            semantic_configuration_name="regulation-semantic-config",
+            query_caption="extractive",
+            query_answer="extractive",
+            top=self.nr_top_docs
+        )
+        # the async pager has to be drained inside the event loop
+        search_results = [result async for result in search_results]
+        logger.debug("Async search results retrieved: %s", search_results)
+        return search_results
+
     def create_content_list(self, search_results):
         logger.debug("Creating content list from search results")
         content_list = []
@@ -115,8 +270,49 @@ class ExternalRegulationsRetriever(BaseRetriever):
         logger.debug("Relevant documents retrieved: %s", initial_list)
         return initial_list
 
+    async def _aget_relevant_documents(self, query):
+        logger.debug("Getting relevant documents asynchronously for query: %s", query)
+        search_results = await self.asearch_query(query)
+        initial_list = self.create_content_list(search_results)
+        logger.debug("Relevant documents retrieved: %s", initial_list)
+        return initial_list
+
+class ParallelEnsembleRetriever(EnsembleRetriever):
+    """EnsembleRetriever that queries every index at once and drops an index that does not answer within index_timeout_seconds."""
+    index_timeout_seconds: float = 10.0
+
+    def rank_fusion(self, query, run_manager, *, config=None):
+        futures = [
+            search_executor.submit(copy_context().run, retriever.invoke, query,
+                                   patch_config(config, callbacks=run_manager.get_child(tag=f"retriever_{i + 1}")))
+            for i, retriever in enumerate(self.retrievers)
+        ]
+        # the indexes are searched concurrently, so every index gets the same deadline
+        deadline = time.monotonic() + self.index_timeout_seconds
+        retriever_docs = []
+        for retriever, future in zip(self.retrievers, futures):
+            try:
+                retriever_docs.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except Exception as e:
+                logger.warning("%s failed or timed out, continuing with partial results: %r", type(retriever).__name__, e)
+                retriever_docs.append([])
+        return self.weighted_reciprocal_rank(retriever_docs)
+
+    async def arank_fusion(self, query, run_manager, *, config=None):
+        async def search(i, retriever):
+            try:
+                return await asyncio.wait_for(
+                    retriever.ainvoke(query, patch_config(config, callbacks=run_manager.get_child(tag=f"retriever_{i + 1}"))),
+                    timeout=self.index_timeout_seconds)
+            except Exception as e:
+                logger.warning("%s failed or timed out, continuing with partial results: %r", type(retriever).__name__, e)
+                return []
+
+        retriever_docs = await asyncio.gather(*(search(i, retriever) for i, retriever in enumerate(self.retrievers)))
+        return self.weighted_reciprocal_rank(list(retriever_docs))
+
 class CustomRetriever():
-    def __init__(self, nr_top_docs, retrieval_type='all', weights=[0.5, 0.5], filter_state=None, filter_industry=None):
+    def __init__(self, nr_top_docs, retrieval_type='all', weights=[0.5, 0.5], filter_state=None, filter_industry=None, embedder=None, index_timeout_seconds=10.0):
         self.retrieval_type = retrieval_type
         self.nr_top_docs = nr_top_docs
         self.filter_state = filter_state
@@ -124,11 +320,11 @@ class CustomRetriever():
 
         logger.debug("Initializing CustomRetriever with type: %s", retrieval_type)
         if retrieval_type == 'internal':
-            self.retriever = InternalGuidelinesRetriever(nr_top_docs=nr_top_docs)
+            self.retriever = InternalGuidelinesRetriever(nr_top_docs=nr_top_docs, embedder=embedder)
         elif retrieval_type == 'external':
-            self.retriever = ExternalRegulationsRetriever(nr_top_docs=nr_top_docs)
+            self.retriever = ExternalRegulationsRetriever(nr_top_docs=nr_top_docs, embedder=embedder)
         elif retrieval_type == "all":
-            self.retriever = EnsembleRetriever(retrievers=[InternalGuidelinesRetriever(nr_top_docs=nr_top_docs), ExternalRegulationsRetriever(nr_top_docs=nr_top_docs)], weights=weights)
+            self.retriever = ParallelEnsembleRetriever(retrievers=[InternalGuidelinesRetriever(nr_top_docs=nr_top_docs, embedder=embedder), ExternalRegulationsRetriever(nr_top_docs=nr_top_docs, embedder=embedder)], weights=weights, index_timeout_seconds=index_timeout_seconds)
         else:
             logger.error("Invalid retrieval type specified: %s", retrieval_type)
             raise ValueError('Please specify the correct type of search (internal, external, all)')
@@ -0,0 +1,163 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ResourceNotFoundError
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from api.environment_variables import EnvironmentVariables
+from libs.aisearch_index import INDEX_VERSION_KEY
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+
+class SemanticAnswerCache:
+    """Answers keyed by query embedding within a (client_state, client_industry, classification) partition."""
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(SemanticAnswerCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            logger.debug("Initializing SemanticAnswerCache instance")
+            self.enabled = env.semantic_cache_enabled
+            self.similarity_threshold = env.semantic_cache_threshold
+            self.maxsize = env.semantic_cache_size
+            self.ttl_seconds = env.semantic_cache_ttl_seconds
+            self.index_check_seconds = env.semantic_cache_index_check_seconds
+            self.index_names = [env.internal_guidelines_index_name, env.external_regulations_index_name]
+            self.hits = 0
+            self.misses = 0
+            self._entries = OrderedDict()
+            self._partitions = {}
+            self._ids = itertools.count()
+            self._lock = threading.Lock()
+            self._index_fingerprint = None
+            self._watch_stop = threading.Event()
+            self._watch_thread = None
+            self._initialized = True
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def partition_key(self, state):
+        return (state.get('client_state') or '').strip().lower(), (state.get('client_industry') or '').strip().lower(), (state.get('classification') or '').strip().lower()
+
+    def lookup(self, vector, state):
+        if not self.enabled:
+            return None
+        partition = self.partition_key(state)
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, -1.0
+            for entry_id in list(self._partitions.get(partition, ())):
+                entry = self._entries[entry_id]
+                if entry["expires_at"] < now:
+                    self._remove(entry_id)
+                    continue
+                score = float(np.dot(query, entry["vector"]))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None or best_score < self.similarity_threshold:
+                self.misses += 1
+                logger.debug("Semantic answer cache miss (best similarity %.4f): %s", best_score, self.stats())
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            logger.debug("Semantic answer cache hit (similarity %.4f): %s", best_score, self.stats())
+            return dict(self._entries[best_id]["answer"])
+
+    def store(self, vector, state, answer):
+        if not self.enabled:
+            return
+        partition = self.partition_key(state)
+        cached_answer = {key: answer.get(key) for key in ("response", "source_title", "source_metadata_id", "source_url")}
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {"partition": partition, "vector": self._normalize(vector), "answer": cached_answer,
+                                       "expires_at": time.monotonic() + self.ttl_seconds}
+            self._partitions.setdefault(partition, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, reason=""):
+        with self._lock:
+            logger.info("Invalidating semantic answer cache (%d entries): %s", len(self._entries), reason)
+            self._entries.clear()
+            self._partitions.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        ids = self._partitions.get(entry["partition"])
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._partitions[entry["partition"]]
+
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def index_fingerprint(self):
+        # the index names are aliases: a rebuild moves the alias to a new index, an incremental update
+        # publishes a new content version in the index it updated
+        credential = AzureKeyCredential(env.azure_hrcopilot_search_api_key)
+        index_client = SearchIndexClient(endpoint=env.azure_search_endpoint, credential=credential)
+        fingerprint = []
+        for index_name in self.index_names:
+            try:
+                physical_index_name = index_client.get_alias(index_name).indexes[0]
+            except ResourceNotFoundError:
+                # an index built before aliases were used
+                physical_index_name = index_name
+            search_client = SearchClient(endpoint=env.azure_search_endpoint, index_name=physical_index_name, credential=credential)
+            try:
+                version = search_client.get_document(INDEX_VERSION_KEY, selected_fields=["content_hash"])["content_hash"]
+            except ResourceNotFoundError:
+                # no build has published a version yet, the document count is all there is to go on
+                version = None
+            fingerprint.append((index_name, physical_index_name, version, search_client.get_document_count()))
+        return tuple(fingerprint)
+
+    def check_indexes(self):
+        try:
+            fingerprint = self.index_fingerprint()
+        except Exception as e:
+            logger.warning("Could not read the search index fingerprint: %s", e)
+            return
+        if self._index_fingerprint is not None and fingerprint != self._index_fingerprint:
+            self.invalidate(f"search indexes changed: {fingerprint}")
+        self._index_fingerprint = fingerprint
+
+    def start_index_watch(self):
+        if not self.enabled or self._watch_thread is not None:
+            return
+        def watch():
+            self.check_indexes()
+            while not self._watch_stop.wait(self.index_check_seconds):
+                self.check_indexes()
+        self._watch_thread = threading.Thread(target=watch, name="semantic-cache-index-watch", daemon=True)
+        self._watch_thread.start()
+
+    def stop_index_watch(self):
+        self._watch_stop.set()
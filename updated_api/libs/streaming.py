@@ -0,0 +1,19 @@
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# only the llm answering the RAG question carries this tag, classification and extraction calls are not streamed
+RAG_ANSWER_TAG = "rag_answer"
+
+
+def stream_frame(event):
+    # maps an astream_events (v2) event to a frame for the client, or None when it should not be sent
+    if event["event"] == "on_chain_start" and event["name"] == event.get("metadata", {}).get("langgraph_node"):
+        return {"type": "node", "node": event["name"]}
+    if event["event"] == "on_chat_model_stream" and RAG_ANSWER_TAG in event.get("tags", []):
+        content = event["data"]["chunk"].content
+        if content:
+            return {"type": "token", "content": content}
+    return None
+
@@ -0,0 +1,123 @@
+import logging
+import queue
+import threading
+import time
+from langsmith import Client
+from api.environment_variables import EnvironmentVariables
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+env = EnvironmentVariables.get_instance()
+
+
+class DatasetWriter:
+    """Writes LangSmith dataset examples in batches from a background thread so no turn waits on LangSmith."""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(DatasetWriter, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            logger.debug("Initializing DatasetWriter instance")
+            self.dataset_id = env.langsmith_dataset_id
+            self.batch_size = env.telemetry_batch_size
+            self.flush_interval_seconds = env.telemetry_flush_interval_seconds
+            self.max_retries = env.telemetry_max_retries
+            self.written = 0
+            self.dropped = 0
+            self._queue = queue.Queue(maxsize=env.telemetry_queue_size)
+            self._client = None
+            self._stop = threading.Event()
+            self._thread = None
+            self._initialized = True
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None or not cls._instance._initialized:
+            with cls._lock:
+                if cls._instance is None or not cls._instance._initialized:
+                    cls._instance = cls()
+        return cls._instance
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="dataset-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, answer):
+        self.start()
+        example = ({"question": answer.question}, {"response": answer.answer})
+        # never block the caller: when LangSmith falls behind the oldest queued example is dropped
+        while True:
+            try:
+                self._queue.put_nowait(example)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                    logger.warning("Telemetry queue full, dropped the oldest example (%d dropped so far)", self.dropped)
+                except queue.Empty:
+                    pass
+
+    def close(self, timeout=None):
+        # drains what is queued before returning, called from the FastAPI lifespan shutdown
+        if self._thread is None:
+            return
+        logger.info("Flushing %d queued dataset examples", self._queue.qsize())
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Dataset writer did not finish within %s seconds, %d examples left", timeout, self._queue.qsize())
+        self._thread = None
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stop.is_set():
+                return
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            try:
+                if self._stop.is_set():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if self._client is None:
+                    self._client = Client()
+                self._client.create_examples(inputs=[inputs for inputs, _ in batch], outputs=[outputs for _, outputs in batch], dataset_id=self.dataset_id)
+                self.written += len(batch)
+                logger.debug("Wrote %d dataset examples: %s", len(batch), self.stats())
+                return
+            except Exception as e:
+                logger.warning("Writing %d dataset examples failed (attempt %d/%d): %s", len(batch), attempt, self.max_retries, e)
+                if attempt < self.max_retries:
+                    time.sleep(min(2 ** attempt, 30))
+        self.dropped += len(batch)
+        logger.error("Dropped %d dataset examples after %d attempts", len(batch), self.max_retries)
@@ -0,0 +1,57 @@
+import logging
+from docx import Document
+from libs.answer import Answer, Sources
+from libs.telemetry import DatasetWriter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+def map_response(response, query, thread_id, run_id):
+    logger.debug("Mapping response")
+
+    if "response" in response and response['response'] is not None:
+        logger.debug("Does not require human response")
+        answer = Answer(answer=response['response'], additional_info_needed=False, sources=[], question=query, run_id=run_id, thread_id=thread_id,
+                        client_industry=response['client_industry'] if 'client_industry' in response else None,
+                        client_state=response['client_state'] if 'client_state' in response else None,
+                        classification=response.get('classification'))
+    else:
+        logger.debug("Requires human response")
+        answer = Answer(answer=response.get('human_ask'), additional_info_needed=True, sources=[], question=query, run_id=run_id, thread_id=thread_id,
+                        client_industry=None, client_state=None, classification=response.get('classification'))
+
+    if response.get("source_title") and response.get("source_url"):
+        logger.debug("Mapping sources from response")
+        reference_ids = response.get("source_metadata_id") or [""] * len(response["source_title"])
+        answer.sources = [Sources(reference_id=reference_id, title=title, url=url)
+                          for reference_id, title, url in zip(reference_ids, response["source_title"], response["source_url"])]
+
+    return answer
+
+
+def map_client_id_response(response, query, thread_id, run_id):
+    logger.debug("Mapping map_client_id_response")
+
+    answer = Answer(answer=response['response'], additional_info_needed=False, sources=[], question=query, run_id=run_id, thread_id=thread_id,
+                    client_industry=response['client_industry'] if 'client_industry' in response else None,
+                    client_state=response['client_state'] if 'client_state' in response else None)
+
+    return answer
+
+
+def source_fields(sources):
+    # graph state keeps the sources as parallel lists, map_response turns them back into Sources
+    return {"source_title": [source.title for source in sources],
+            "source_metadata_id": [source.reference_id for source in sources],
+            "source_url": [source.url for source in sources]}
+
+
+def create_dataset(answer):
+    # queued for the background writer, the turn never waits on LangSmith
+    logger.debug("Queueing dataset example: %s", answer)
+    DatasetWriter.get_instance().enqueue(answer)
+
+
+def read_docx_paragraphs(path):
+    return [paragraph.text for paragraph in Document(path).paragraphs]
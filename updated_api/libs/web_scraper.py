@@ -0,0 +1,78 @@
+import re
+from html.parser import HTMLParser
+import httpx
+
+USER_AGENT = "hrbp-regulation-indexer/1.0"
+# elements whose text is page furniture rather than regulation content
+SKIPPED_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "button", "iframe"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th", "br",
+              "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt"}
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "area", "base", "col", "embed", "source", "track", "wbr"}
+
+
+class MainTextParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+        self.in_main = 0
+        self.main_parts = []
+
+    def emit(self, text):
+        self.parts.append(text)
+        if self.in_main:
+            self.main_parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == "br":
+                self.emit("\n")
+            return
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in ("main", "article"):
+            self.in_main += 1
+        if tag in BLOCK_TAGS:
+            self.emit("\n")
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in ("main", "article"):
+            self.in_main = max(0, self.in_main - 1)
+        if tag in BLOCK_TAGS:
+            self.emit("\n")
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self.emit(data)
+
+
+class WebScraper:
+    """Main text of a regulation page; the html can be passed in when it was fetched elsewhere (e.g. concurrently)."""
+
+    def __init__(self, url, html=None, timeout=30):
+        self.url = url
+        self.html = html
+        self.timeout = timeout
+
+    def fetch(self):
+        response = httpx.get(self.url, headers={"User-Agent": USER_AGENT}, timeout=self.timeout, follow_redirects=True)
+        response.raise_for_status()
+        self.html = response.text
+        return self.html
+
+    def extract_main_text(self):
+        if self.html is None:
+            self.fetch()
+        parser = MainTextParser()
+        parser.feed(self.html)
+        parser.close()
+        # a <main>/<article> element, when the page has one with real content, is the regulation text
+        main_text = "".join(parser.main_parts)
+        text = main_text if len(main_text.split()) >= 50 else "".join(parser.parts)
+        lines = (re.sub(r"\s+", " ", line).strip() for line in text.split("\n"))
+        return "\n".join(line for line in lines if line)
@@ -51,4 +51,17 @@ def general_hr_prompt():
             "\n\n"
             "{context}"
         )
-    return hr_general_prompt
\ No newline at end of file
+    return hr_general_prompt
+
+def question_extraction_prompt():
+
+    extraction_prompt = (
+            "Extract three fields from the input question. "
+            "classification: classify intent of the question in specific to one of the following categories: {categories}. "
+            "Classify questions about salary in the 'wage' category. Output just the category it fits or None if it fits none of the categories. "
+            "state: classify if the state of the client is specified in the question. Extract the state independent whether lower case or upper case letters are used in the input. "
+            "Also extract the state even if state abbreviations are used. If you find the state, output that state. If not, output only 'No state'. "
+            "industry: classify if the industry of the client is specified in the question. Classify to one of the following industry categories: {industries} . "
+            "Classify to one of the industry categories even if the client mentions a job title or profession. If not output only 'No industry'."
+        )
+    return extraction_prompt
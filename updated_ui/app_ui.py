@@ -4,7 +4,7 @@ import requests
 import logging
 import json
 from environment_variables import EnvironmentVariables
-from assistant_api import chatbot_request, validate_client_id
+from assistant_api import chatbot_stream_request, validate_client_id
 from utils import end_chat, load_sidebar, user_feedback
 from langsmith import Client
 from validations import is_valid_us_state
@@ -224,6 +224,36 @@ def handle_user_input():
     if user_input:
         submit_request_to_backend(user_input)
 
+# Progress messages shown while the graph runs, keyed by node name
+NODE_STATUS = {
+    "classify_input": "Understanding your question...",
+    "extract_client_dem": "Looking up state and industry...",
+    "verify_client_id": "Checking your client ID...",
+    "lookup_answer_cache": "Searching HR guidelines...",
+    "handle_RAG_human_input": "Searching HR guidelines...",
+    "produce_job_description": "Writing the job description...",
+}
+
+# Render the answer as it streams in and return the final answer frame
+def stream_chat_response(*request_args):
+    logger.debug("stream_chat_response")
+    placeholder = st.empty()
+    streamed_text = ""
+    chat_response = None
+    for frame in chatbot_stream_request(*request_args):
+        if frame.get("type") == "node" and frame.get("node") in NODE_STATUS and not streamed_text:
+            placeholder.markdown(f"*{NODE_STATUS[frame['node']]}*")
+        elif frame.get("type") == "token":
+            streamed_text += frame["content"]
+            placeholder.markdown(streamed_text + "▌")
+        elif frame.get("type") == "answer":
+            chat_response = frame["response"]
+    # the full answer is rendered with its sources by display_chat_history
+    placeholder.empty()
+    if chat_response is None:
+        raise requests.exceptions.RequestException("Stream ended without an answer")
+    return chat_response
+
 # Submit request to backend
 def submit_request_to_backend(user_input):
     logger.debug("submit_request_to_backend")
@@ -233,7 +263,7 @@ def submit_request_to_backend(user_input):
         logger.info("Sending chat request with user_input: %s, new_chat: %s, thread_id: %s, scope: %s, username: %s",
                     user_input, st.session_state.new_chat, st.session_state.thread_id, st.session_state.scope, st.session_state.username)
 
-        chat_response = chatbot_request(
+        chat_response = stream_chat_response(
             user_input,
             st.session_state.new_chat,
             st.session_state.thread_id if 'thread_id' in st.session_state else "",
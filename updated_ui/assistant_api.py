@@ -1,6 +1,6 @@
 import requests
 import logging
-from ui_utils import make_authenticated_request
+from ui_utils import make_authenticated_request, make_authenticated_stream_request
 import pprint
 from environment_variables import EnvironmentVariables
 
@@ -38,6 +38,31 @@ def chatbot_request(user_input, new_chat, thread_id: str, scope: str, username:
     response.raise_for_status()
     return response.json().get('response')
 
+def chatbot_stream_request(user_input, new_chat, thread_id: str, scope: str, username: str, additional_info: bool, client_state: str, client_industry: str, client_id: str):
+    logger.info("Streaming user input to chatbot API")
+
+    json_str = {
+        "message": "" if additional_info else user_input,
+        "new_chat": new_chat,
+        "thread_id": thread_id,
+        "scope": scope,
+        "username": username,
+        "user_answer": user_input if additional_info else "",
+        "client_state": client_state,
+        "client_industry": client_industry,
+        "client_id": client_id if client_id else ""
+    }
+
+    logger.debug(f"Request payload: {json_str}")
+
+    endpoint = "chat_with_client_id_stream" if client_id else "chat_stream"
+    # yields node and token frames while the graph runs, the last frame carries the answer and its sources
+    for frame in make_authenticated_stream_request(f"{CHATBOT_API_URL}/{endpoint}", json_str, {"scope": scope, "username": username}):
+        logger.debug(f"Frame: {frame}")
+        if frame.get("type") == "error":
+            raise requests.exceptions.RequestException(frame.get("error"))
+        yield frame
+
 def validate_client_id(client_id, scope, username):
     logger.info("Sending client ID to chatbot API for validation")
 
@@ -1,4 +1,5 @@
 import requests
+import json
 from jwt_utils import create_jwt_token
 import logging
 import pprint
@@ -36,4 +37,27 @@ def make_authenticated_request(url, method, json_data, user_data):
         raise
     except Exception as err:
         logger.error(f"An error occurred: {err}")
-        raise
\ No newline at end of file
+        raise
+
+def make_authenticated_stream_request(url, json_data, user_data):
+    logger.info("Making authenticated streaming request to API")
+
+    token = generate_jwt_token(user_data)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    logger.debug(f"json_data: {json_data}")
+
+    try:
+        with requests.post(url, json=json_data, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            # the API sends one JSON frame per line as soon as it is produced
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+    except requests.exceptions.HTTPError as http_err:
+        logger.error(f"HTTP error occurred: {http_err}")
+        raise
+    except Exception as err:
+        logger.error(f"An error occurred: {err}")
+        raise